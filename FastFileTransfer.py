@@ -3,6 +3,8 @@
 
 # Comment on 240115: TryAndCatch needed, as many single files are corrupted
 # Solution: Temporarily copy the previous functional file and log the replacement in a log-file
+# Corrupt files are now found up front by a header-only scan (tif_integrity.py), so they are
+# replaced as they come up instead of surfacing as copy errors partway through the run
 
 
 import os
@@ -11,6 +13,7 @@ import time
 import datetime
 from ProcessLogger import log_init
 import logging
+from tif_integrity import TIFF_SUFFIXES, scan_tif_files
 
 def copy_files_with_substring(source_folder, destination_folder, substring):
     """
@@ -34,12 +37,22 @@ def copy_files_with_substring(source_folder, destination_folder, substring):
     logging.info("run performed at {}".format(str(datetime.datetime.now())))
     logging.info("Source-folder = {}, Destination-folder = {}".format(source_folder, destination_folder))
     logging.info("FORMAT: corrupt 'file1' replaced by healthy 'file2': 'file1',file2'")
-    for filename in os.listdir(source_folder):
+    filenames = os.listdir(source_folder)
+    corrupt = scan_tif_files(
+        os.path.join(source_folder, filename)
+        for filename in filenames
+        if substring in filename and filename.lower().endswith(TIFF_SUFFIXES)
+    )
+    logging.info("Integrity scan found {} corrupt files after {} seconds".format(len(corrupt), time.time() - t))
+    print("Integrity scan found {} corrupt files".format(len(corrupt)))
+    for filename in filenames:
         if substring in filename:
             count += 1
             try:
                 source_file = os.path.join(source_folder, filename)
                 destination_file = os.path.join(destination_folder, filename)
+                if source_file in corrupt:
+                    raise ValueError(corrupt[source_file])
                 shutil.copy2(source_file, destination_file)
                 # cache the last non-corrupted file
                 if "000001" in filename:
@@ -7,15 +7,24 @@ by shifting even rows (0-based) by an integer pixel offset on TIFF time stacks
 
 Load ChanA and ChanB TIFF stacks directly. They may live in different folders
 or processing stages; ChanB is chosen after ChanA with a best-effort path guess.
+A folder of Thorlabs per-frame TIFFs can also be opened as virtual ChanA/ChanB
+stacks without generating ChanX_stk.tif first.
 
 Preview can use a chosen stack frame or a Z-average for tuning the offset.
 Export always applies the offset to every frame individually, writing
-<stem>_phase.tif beside each source file."""
+<stem>_phase.tif beside each source file.
+
+Loading (including the Z-average) and export run in worker threads, both
+channels concurrently; progress is shown in the status panel and the window
+stays responsive."""
 
 from __future__ import annotations
 
 import argparse
+import threading
 import tkinter as tk
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 from tkinter import filedialog, messagebox
 
@@ -24,6 +33,21 @@ import matplotlib.widgets as widgets
 import numpy as np
 import tifffile
 
+from stack_io import (
+    DEFAULT_FRAME_CACHE_BYTES,
+    FrameCache,
+    LazyStack,
+    add_codec_arguments,
+    codec_options_from_args,
+    cached_stack_statistics,
+    iter_frame_blocks,
+    open_tif_stack,
+    stack_write_options,
+    thorlabs_channels,
+    thorlabs_frame_files,
+    write_stack_frames,
+)
+
 PHASE_SUFFIX = "_phase"
 LOG_FILE_NAME = "log.txt"
 DEFAULT_OFFSET_RANGE = 40
@@ -37,19 +61,13 @@ PREVIEW_SOURCES = ("Frame", "Average")
 DEFAULT_PREVIEW_SOURCE = "Frame"
 PERCENTILE_LOW = 1.0
 PERCENTILE_HIGH = 99.0
+EXPORT_BLOCK_BYTES = 32 * 1024 * 1024
+JOB_POLL_MS = 100
 
 
-def load_tif_stack(path: str | Path) -> np.ndarray:
-    """Load a TIFF stack as (frames, height, width)."""
-    with tifffile.TiffFile(path) as tif:
-        stack = tif.asarray()
-
-    if stack.ndim == 2:
-        stack = stack[np.newaxis, ...]
-    elif stack.ndim != 3:
-        raise ValueError(f"Expected 2D or 3D stack, got shape {stack.shape}")
-
-    return stack
+def load_tif_stack(path: str | Path, channel: str | None = None) -> LazyStack:
+    """Open a TIFF stack (or Thorlabs per-frame folder) lazily as (frames, height, width)."""
+    return open_tif_stack(path, channel)
 
 
 def percentile_normalize(
@@ -91,42 +109,95 @@ def prepare_preview_image(image: np.ndarray, mode: str) -> tuple[np.ndarray, str
     return stretched, "gray"
 
 
-def shift_even_rows(image: np.ndarray, offset: int) -> np.ndarray:
-    """Shift even rows of a 2D image by ``offset`` pixels (positive = right)."""
-    if offset == 0:
-        return np.asarray(image).copy()
+def shift_even_rows(image: np.ndarray, offset: int, out: np.ndarray | None = None) -> np.ndarray:
+    """Shift even rows of an image by ``offset`` pixels (positive = right).
 
-    result = np.asarray(image).copy()
-    height, width = result.shape[:2]
-    even = result[0:height:2].copy()
+    Works on a single (Y, X) frame or a (frames, Y, X) block; the result is
+    written into ``out`` when given (it must not share memory with ``image``).
+    """
+    image = np.asarray(image)
+    result = np.empty_like(image) if out is None else out
+    result[...] = image
+    if offset == 0:
+        return result
 
+    width = image.shape[-1]
+    shift = min(abs(int(offset)), width)
     if offset > 0:
-        shift = min(int(offset), width)
-        even[:, shift:] = even[:, : width - shift]
-        even[:, :shift] = 0
+        result[..., 0::2, shift:] = image[..., 0::2, : width - shift]
+        result[..., 0::2, :shift] = 0
     else:
-        shift = min(int(-offset), width)
-        even[:, : width - shift] = even[:, shift:]
-        even[:, width - shift :] = 0
-
-    result[0:height:2] = even
+        result[..., 0::2, : width - shift] = image[..., 0::2, shift:]
+        result[..., 0::2, width - shift :] = 0
     return result
 
 
-def stack_z_average(stack: np.ndarray) -> np.ndarray:
-    """Return the mean image across the frame axis."""
-    return np.mean(stack, axis=0)
+def iter_even_row_shifted_frames(
+    stack,
+    offset: int,
+    block_bytes: int = EXPORT_BLOCK_BYTES,
+    progress: Callable[[float], None] | None = None,
+) -> Iterator[np.ndarray]:
+    """Yield shifted frames in order, reading and correcting the stack in bounded blocks."""
+    n_frames = stack.shape[0]
+    shifted = None
+    for start, block in iter_frame_blocks(stack, block_bytes):
+        if shifted is None or shifted.shape != block.shape:
+            shifted = np.empty_like(block)
+        shift_even_rows(block, offset, out=shifted)
+        yield from shifted
+        if progress is not None:
+            progress((start + block.shape[0]) / max(1, n_frames))
+
+
+def export_even_row_shifted_stack(
+    stack,
+    offset: int,
+    out_path: Path,
+    progress: Callable[[float], None] | None = None,
+    codec: dict | None = None,
+) -> None:
+    """Stream the phase-corrected stack to ``out_path`` without holding it in memory.
+
+    ``codec`` holds ``stack_write_options`` keywords (compression, level, tile, rowsperstrip).
+    """
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    part_path = out_path.with_name(out_path.name + ".part")
+    nbytes = int(np.prod(stack.shape)) * np.dtype(stack.dtype).itemsize
+    # Same BigTIFF threshold tifffile.imwrite uses for in-memory data
+    with tifffile.TiffWriter(part_path, bigtiff=nbytes > 2**32 - 2**25) as writer:
+        write_stack_frames(
+            writer,
+            iter_even_row_shifted_frames(stack, offset, progress=progress),
+            stack.shape,
+            stack.dtype,
+            stack_write_options(stack.dtype, **(codec or {})),
+        )
+    part_path.replace(out_path)
 
 
-def apply_even_row_shift_to_stack(stack: np.ndarray, offset: int) -> np.ndarray:
-    """Apply even-row shift to every frame of a (T, Y, X) stack."""
-    if offset == 0:
-        return np.asarray(stack).copy()
-
-    corrected = np.empty_like(stack)
-    for frame_index, frame in enumerate(stack):
-        corrected[frame_index] = shift_even_rows(frame, offset)
-    return corrected
+def export_phase_channel(
+    stack,
+    offset: int,
+    out_path: Path,
+    *,
+    source_path: Path,
+    tuning_source: str,
+    reference_frame: int | None,
+    progress: Callable[[float], None] | None = None,
+    codec: dict | None = None,
+) -> Path:
+    """Export one phase-corrected channel plus its log.txt; returns the log path."""
+    export_even_row_shifted_stack(stack, offset, out_path, progress=progress, codec=codec)
+    return write_phase_log(
+        out_path.parent,
+        offset=offset,
+        source_path=source_path,
+        export_path=out_path,
+        tuning_source=tuning_source,
+        reference_frame=reference_frame,
+    )
 
 
 def phase_export_path(source_path: Path) -> Path:
@@ -167,6 +238,8 @@ def write_phase_log(
 def suggest_chan_b_path(chan_a_path: Path) -> Path | None:
     """Guess a ChanB stack path from a selected ChanA path."""
     path = chan_a_path.resolve()
+    if path.is_dir():
+        return path if thorlabs_frame_files(path, "ChanB") else None
     path_str = str(path)
     replacements = (
         ("SUPPORT_ChanA", "SUPPORT_ChanB"),
@@ -186,6 +259,31 @@ def suggest_chan_b_path(chan_a_path: Path) -> Path | None:
     return None
 
 
+def folder_channel(path: Path, default: str) -> str | None:
+    """Channel to read from a Thorlabs per-frame folder, or None for stack files."""
+    if not path.is_dir():
+        return None
+    channels = thorlabs_channels(path)
+    if default in channels or not channels:
+        return default
+    return channels[0]
+
+
+def pick_stack_folder(title: str, *, initial_dir: Path | None = None) -> Path | None:
+    """Open a directory picker for a Thorlabs per-frame TIFF folder."""
+    root = tk.Tk()
+    root.withdraw()
+    root.attributes("-topmost", True)
+    kwargs: dict[str, object] = {"title": title, "mustexist": True}
+    if initial_dir is not None:
+        kwargs["initialdir"] = str(initial_dir)
+    selected = filedialog.askdirectory(**kwargs)
+    root.destroy()
+    if not selected:
+        return None
+    return Path(selected).resolve()
+
+
 def pick_stack_file(
     title: str,
     *,
@@ -213,20 +311,38 @@ class PhaseAlignerApp:
         self,
         initial_chan_a: str | Path | None = None,
         initial_chan_b: str | Path | None = None,
+        frame_cache_bytes: int = DEFAULT_FRAME_CACHE_BYTES,
+        codec: dict | None = None,
     ) -> None:
         self.chan_a_path: Path | None = None
         self.chan_b_path: Path | None = None
-        self.stack_a: np.ndarray | None = None
-        self.stack_b: np.ndarray | None = None
+        self.stack_a: LazyStack | None = None
+        self.stack_b: LazyStack | None = None
+        self._z_averages: dict[str, np.ndarray] = {}
+        # Per-channel frame caches with read-ahead, so slider scrubbing stays interactive
+        self.frame_cache_bytes = int(frame_cache_bytes)
+        self.codec = codec or {}
+        self._frame_caches: dict[str, FrameCache] = {}
         self.offset = 0
         self.frame_index = 0
         self.n_frames = 1
         self.display_mode = DEFAULT_DISPLAY_MODE
         self.preview_source = DEFAULT_PREVIEW_SOURCE
         self._updating_frame_slider = False
+        # Background jobs: workers only touch _progress (under its lock); completion
+        # callbacks run on the GUI thread from the poll timer.
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="phase-aligner")
+        self._jobs: list[tuple[Future, Callable[[Future], None]]] = []
+        self._progress: dict[str, str] = {}
+        self._progress_lock = threading.Lock()
+        self._load_tokens = {"A": 0, "B": 0}
+        self._exporting = False
 
         self.fig = plt.figure(figsize=(14, 7.8))
         self.fig.canvas.manager.set_window_title("Phase Aligner")
+        self._poll_timer = self.fig.canvas.new_timer(interval=JOB_POLL_MS)
+        self._poll_timer.add_callback(self._poll_jobs)
+        self.fig.canvas.mpl_connect("close_event", self._on_close)
 
         gs = self.fig.add_gridspec(
             1,
@@ -304,8 +420,12 @@ class PhaseAlignerApp:
         self.btn_chan_b = widgets.Button(ax_chan_b, "ChanB…")
         self.btn_chan_b.on_clicked(self._on_pick_chan_b)
 
+        ax_folder = self.fig.add_axes([0.27, 0.055, 0.10, 0.045])
+        self.btn_folder = widgets.Button(ax_folder, "Frame folder…")
+        self.btn_folder.on_clicked(self._on_pick_frame_folder)
+
         self.status_text = self.fig.text(
-            0.28,
+            0.39,
             0.075,
             "Load ChanA, then ChanB",
             fontsize=9,
@@ -331,6 +451,47 @@ class PhaseAlignerApp:
         self.status_text.set_text(message)
         self.fig.canvas.draw_idle()
 
+    def _set_progress(self, label: str, message: str) -> None:
+        """Record a job's progress line; safe to call from worker threads."""
+        with self._progress_lock:
+            self._progress[label] = message
+
+    def _clear_progress(self, label: str) -> None:
+        with self._progress_lock:
+            self._progress.pop(label, None)
+
+    def _submit(self, on_done: Callable[[Future], None], fn, *args, **kwargs) -> Future:
+        """Run ``fn`` in a worker thread and call ``on_done(future)`` on the GUI thread."""
+        future = self._executor.submit(fn, *args, **kwargs)
+        self._jobs.append((future, on_done))
+        self._poll_timer.start()
+        return future
+
+    def _poll_jobs(self) -> None:
+        finished = [job for job in self._jobs if job[0].done()]
+        self._jobs = [job for job in self._jobs if not job[0].done()]
+        status_before = self.status_text.get_text()
+        for future, on_done in finished:
+            on_done(future)
+        with self._progress_lock:
+            lines = list(self._progress.values())
+        if lines:
+            self._set_status("\n".join(lines))
+        elif finished and self.status_text.get_text() == status_before:
+            # Last job done and its callback left the progress text up
+            self._refresh_status()
+        if not self._jobs:
+            self._poll_timer.stop()
+
+    def _loading(self, channel: str) -> bool:
+        return f"Chan{channel}" in self._progress
+
+    def _on_close(self, _event) -> None:
+        self._poll_timer.stop()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        for cache in self._frame_caches.values():
+            cache.close()
+
     def _refresh_status(self) -> None:
         if self.chan_a_path is None and self.chan_b_path is None:
             self._set_status("Load ChanA, then ChanB")
@@ -376,8 +537,25 @@ class PhaseAlignerApp:
         if path is not None:
             self.load_chan_a(path, prompt_for_chan_b=True)
 
+    def _on_pick_frame_folder(self, _event) -> None:
+        initial_dir = self.chan_a_path.parent if self.chan_a_path else None
+        folder = pick_stack_folder("Select Thorlabs per-frame TIFF folder", initial_dir=initial_dir)
+        if folder is not None:
+            self.load_frame_folder(folder)
+
+    def load_frame_folder(self, folder: str | Path) -> None:
+        """Load ChanA and ChanB as virtual stacks straight from a per-frame TIFF folder."""
+        folder = Path(folder).resolve()
+        channels = thorlabs_channels(folder)
+        if not channels:
+            messagebox.showerror("Phase Aligner", f"No ChanA/ChanB frame files in:\n{folder}")
+            return
+        self.load_chan_a(folder)
+        if "ChanB" in channels:
+            self.load_chan_b(folder)
+
     def _on_pick_chan_b(self, _event) -> None:
-        if self.chan_a_path is None:
+        if self.chan_a_path is None and not self._loading("A"):
             messagebox.showinfo(
                 "Phase Aligner",
                 "Select the ChanA stack first.",
@@ -385,8 +563,9 @@ class PhaseAlignerApp:
             return
         self._prompt_for_chan_b()
 
-    def _prompt_for_chan_b(self) -> None:
-        suggested = suggest_chan_b_path(self.chan_a_path) if self.chan_a_path else None
+    def _prompt_for_chan_b(self, chan_a_path: Path | None = None) -> None:
+        chan_a_path = chan_a_path or self.chan_a_path
+        suggested = suggest_chan_b_path(chan_a_path) if chan_a_path else None
         if suggested is not None and messagebox.askyesno(
             "Phase Aligner",
             f"Use suggested ChanB stack?\n\n{suggested}",
@@ -394,7 +573,7 @@ class PhaseAlignerApp:
             self.load_chan_b(suggested)
             return
 
-        initial_dir = self.chan_a_path.parent if self.chan_a_path else None
+        initial_dir = chan_a_path.parent if chan_a_path else None
         path = pick_stack_file(
             "Select ChanB TIFF stack",
             initial_dir=initial_dir,
@@ -422,70 +601,111 @@ class PhaseAlignerApp:
         prompt_for_chan_b: bool = False,
     ) -> None:
         chan_a = Path(path).resolve()
-        if not chan_a.is_file():
+        if not chan_a.exists():
             messagebox.showerror("Phase Aligner", f"ChanA stack not found:\n{chan_a}")
             return
 
-        try:
-            self._set_status(f"Loading ChanA…\n{chan_a}")
-            self.fig.canvas.flush_events()
-            stack_a = load_tif_stack(chan_a)
-        except Exception as exc:
-            messagebox.showerror("Phase Aligner", f"Failed to load ChanA stack:\n{exc}")
-            return
-
-        self.chan_a_path = chan_a
-        self.stack_a = stack_a
-        if self.stack_b is None:
-            self.offset = 0
-            self.frame_index = 0
-            self.slider_offset.set_val(0)
-            self._configure_frame_slider(stack_a.shape[0])
-
-        self._refresh_status()
-        if self.stack_b is not None:
-            self._update_previews()
-        else:
-            self._show_empty_panels()
-
+        self._start_load("A", chan_a)
         if prompt_for_chan_b:
-            self._prompt_for_chan_b()
+            # ChanB is picked (and loads) while ChanA is still loading
+            self._prompt_for_chan_b(chan_a)
 
     def load_chan_b(self, path: str | Path) -> None:
         chan_b = Path(path).resolve()
-        if not chan_b.is_file():
+        if not chan_b.exists():
             messagebox.showerror("Phase Aligner", f"ChanB stack not found:\n{chan_b}")
             return
 
-        try:
-            self._set_status(f"Loading ChanB…\n{chan_b}")
-            self.fig.canvas.flush_events()
-            stack_b = load_tif_stack(chan_b)
-        except Exception as exc:
-            messagebox.showerror("Phase Aligner", f"Failed to load ChanB stack:\n{exc}")
+        self._start_load("B", chan_b)
+
+    def _start_load(self, channel: str, path: Path) -> None:
+        """Open the channel's stack in a worker; a newer load of the same channel wins."""
+        if self._exporting:
+            messagebox.showinfo("Phase Aligner", "Wait for the export to finish.")
             return
+        label = f"Chan{channel}"
+        self._load_tokens[channel] += 1
+        token = self._load_tokens[channel]
+        self._set_progress(label, f"Loading {label}…  {path}")
+        self._set_status(f"Loading {label}…\n{path}")
+        self._submit(
+            lambda future: self._finish_load(channel, path, token, future),
+            load_tif_stack,
+            path,
+            folder_channel(path, label),
+        )
 
-        if self.stack_a is not None and stack_b.shape[0] != self.stack_a.shape[0]:
+    def _finish_load(self, channel: str, path: Path, token: int, future: Future) -> None:
+        label = f"Chan{channel}"
+        if token != self._load_tokens[channel]:
+            if future.exception() is None:
+                future.result().close()
+            return
+        self._clear_progress(label)
+        if future.exception() is not None:
+            messagebox.showerror("Phase Aligner", f"Failed to load {label} stack:\n{future.exception()}")
+            return
+        stack = future.result()
+
+        other = self.stack_b if channel == "A" else self.stack_a
+        if other is not None and other.shape[0] != stack.shape[0]:
+            n_a, n_b = (stack.shape[0], other.shape[0]) if channel == "A" else (other.shape[0], stack.shape[0])
             messagebox.showwarning(
                 "Phase Aligner",
                 "ChanA and ChanB have different frame counts.\n"
-                f"A={self.stack_a.shape[0]}, B={stack_b.shape[0]}.\n"
+                f"A={n_a}, B={n_b}.\n"
                 "Using the shorter length for the frame slider.",
             )
 
-        self.chan_b_path = chan_b
-        self.stack_b = stack_b
-        self.offset = 0
-        self.frame_index = 0
-        self.slider_offset.set_val(0)
-
-        n_frames = stack_b.shape[0]
-        if self.stack_a is not None:
-            n_frames = min(self.stack_a.shape[0], stack_b.shape[0])
+        if channel == "A":
+            if self.stack_a is not None:
+                self.stack_a.close()
+            self.chan_a_path = path
+            self.stack_a = stack
+        else:
+            if self.stack_b is not None:
+                self.stack_b.close()
+            self.chan_b_path = path
+            self.stack_b = stack
+        self._z_averages.pop(channel, None)
+        if channel in self._frame_caches:
+            self._frame_caches.pop(channel).close()
+        self._frame_caches[channel] = FrameCache(stack, self.frame_cache_bytes)
+        self._start_z_average(channel, stack)
+
+        if channel == "B" or self.stack_b is None:
+            self.offset = 0
+            self.frame_index = 0
+            self.slider_offset.set_val(0)
+        n_frames = min(s.shape[0] for s in (self.stack_a, self.stack_b) if s is not None)
         self._configure_frame_slider(n_frames)
 
         self._refresh_status()
-        self._update_previews()
+        if self.stack_a is not None and self.stack_b is not None:
+            self._update_previews()
+        else:
+            self._show_empty_panels()
+
+    def _start_z_average(self, channel: str, stack: LazyStack) -> None:
+        """Compute (or load from the sidecar cache) the channel's Z-average in a worker."""
+        label = f"Chan{channel} Z-average"
+        self._set_progress(label, f"{label}…")
+
+        def report(fraction: float) -> None:
+            self._set_progress(label, f"{label}… {fraction * 100:.0f}%")
+
+        def done(future: Future) -> None:
+            self._clear_progress(label)
+            if stack is not (self.stack_a if channel == "A" else self.stack_b):
+                return
+            if future.exception() is not None:
+                messagebox.showerror("Phase Aligner", f"{label} failed:\n{future.exception()}")
+                return
+            self._z_averages[channel] = future.result()["z_average"]
+            if self.preview_source == "Average":
+                self._update_previews()
+
+        self._submit(done, cached_stack_statistics, stack, progress=report)
 
     def _on_frame_changed(self, value) -> None:
         if self._updating_frame_slider:
@@ -505,8 +725,10 @@ class PhaseAlignerApp:
         if self.stack_a is None or self.stack_b is None:
             return None
         if self.preview_source == "Average":
-            image_a = stack_z_average(self.stack_a)
-            image_b = stack_z_average(self.stack_b)
+            if "A" not in self._z_averages or "B" not in self._z_averages:
+                return None  # still computing; previews update when it finishes
+            image_a = self._z_averages["A"]
+            image_b = self._z_averages["B"]
             label_a = "ChanA Z-average"
             label_b = "ChanB Z-average"
         else:
@@ -515,8 +737,8 @@ class PhaseAlignerApp:
                 self.stack_a.shape[0] - 1,
                 self.stack_b.shape[0] - 1,
             )
-            image_a = self.stack_a[index]
-            image_b = self.stack_b[index]
+            image_a = self._frame_caches["A"].get(index)
+            image_b = self._frame_caches["B"].get(index)
             label_a = f"ChanA frame {index}"
             label_b = f"ChanB frame {index}"
         return image_a, image_b, label_a, label_b
@@ -597,8 +819,12 @@ class PhaseAlignerApp:
         ):
             messagebox.showinfo("Phase Aligner", "Load ChanA and ChanB stacks first.")
             return
-        out_a = phase_export_path(self.chan_a_path)
-        out_b = phase_export_path(self.chan_b_path)
+        if self._exporting or self._loading("A") or self._loading("B"):
+            messagebox.showinfo("Phase Aligner", "Wait for loading / export to finish.")
+            return
+        # Folder-backed stacks export next to their DATA/<chan>/<chan>_stk.tif location.
+        out_a = phase_export_path(self.stack_a.path)
+        out_b = phase_export_path(self.stack_b.path)
         if self.preview_source == "Average":
             tune_note = "Z-average preview"
         else:
@@ -611,38 +837,57 @@ class PhaseAlignerApp:
         ):
             return
 
-        try:
-            self._set_status("Exporting ChanA…")
-            self.fig.canvas.flush_events()
-            corrected_a = apply_even_row_shift_to_stack(self.stack_a, self.offset)
-            tifffile.imwrite(out_a, corrected_a)
-            log_a = write_phase_log(
-                self.chan_a_path.parent,
-                offset=self.offset,
-                source_path=self.chan_a_path,
-                export_path=out_a,
-                tuning_source=self.preview_source,
-                reference_frame=self.frame_index if self.preview_source == "Frame" else None,
+        # Both channels are exported concurrently with the settings captured now.
+        offset = self.offset
+        settings = {
+            "codec": self.codec,
+            "tuning_source": self.preview_source,
+            "reference_frame": self.frame_index if self.preview_source == "Frame" else None,
+        }
+        jobs = [
+            ("ChanA", self.stack_a, self.chan_a_path, out_a),
+            ("ChanB", self.stack_b, self.chan_b_path, out_b),
+        ]
+        results: dict[str, Path | BaseException] = {}
+        self._exporting = True
+
+        def done(label: str, future: Future) -> None:
+            self._clear_progress(f"{label} export")
+            results[label] = future.exception() or future.result()
+            if len(results) == len(jobs):
+                self._finish_export(offset, out_a, out_b, results)
+
+        for label, stack, source_path, out_path in jobs:
+            progress_label = f"{label} export"
+            self._set_progress(progress_label, f"Exporting {label}…")
+            self._submit(
+                lambda future, label=label: done(label, future),
+                export_phase_channel,
+                stack,
+                offset,
+                out_path,
+                source_path=source_path,
+                progress=lambda fraction, label=label, progress_label=progress_label: self._set_progress(
+                    progress_label, f"Exporting {label}… {fraction * 100:.0f}%"
+                ),
+                **settings,
             )
 
-            self._set_status("Exporting ChanB…")
-            self.fig.canvas.flush_events()
-            corrected_b = apply_even_row_shift_to_stack(self.stack_b, self.offset)
-            tifffile.imwrite(out_b, corrected_b)
-            log_b = write_phase_log(
-                self.chan_b_path.parent,
-                offset=self.offset,
-                source_path=self.chan_b_path,
-                export_path=out_b,
-                tuning_source=self.preview_source,
-                reference_frame=self.frame_index if self.preview_source == "Frame" else None,
-            )
-        except Exception as exc:
-            messagebox.showerror("Phase Aligner", f"Export failed:\n{exc}")
+    def _finish_export(
+        self,
+        offset: int,
+        out_a: Path,
+        out_b: Path,
+        results: dict[str, Path | BaseException],
+    ) -> None:
+        self._exporting = False
+        errors = [f"{label}: {result}" for label, result in results.items() if isinstance(result, BaseException)]
+        if errors:
+            messagebox.showerror("Phase Aligner", "Export failed:\n" + "\n".join(errors))
             return
-
+        log_a, log_b = results["ChanA"], results["ChanB"]
         self._set_status(
-            f"Exported offset={self.offset} px\n{out_a}\n{out_b}\n{log_a}\n{log_b}"
+            f"Exported offset={offset} px\n{out_a}\n{out_b}\n{log_a}\n{log_b}"
         )
         messagebox.showinfo(
             "Phase Aligner",
@@ -657,19 +902,31 @@ def main() -> None:
     parser.add_argument(
         "chan_a",
         nargs="?",
-        help="Optional path to the ChanA TIFF stack",
+        help="Optional path to the ChanA TIFF stack (or a Thorlabs per-frame folder)",
     )
     parser.add_argument(
         "chan_b",
         nargs="?",
-        help="Optional path to the ChanB TIFF stack",
+        help="Optional path to the ChanB TIFF stack (or a Thorlabs per-frame folder)",
     )
+    parser.add_argument(
+        "--frame-cache-mb",
+        type=float,
+        default=DEFAULT_FRAME_CACHE_BYTES / 2**20,
+        help="Memory budget per channel for cached / read-ahead frames (default: %(default)g MB)",
+    )
+    add_codec_arguments(parser)
     args = parser.parse_args()
 
     initial_a = Path(args.chan_a).resolve() if args.chan_a else None
     initial_b = Path(args.chan_b).resolve() if args.chan_b else None
 
-    PhaseAlignerApp(initial_chan_a=initial_a, initial_chan_b=initial_b)
+    PhaseAlignerApp(
+        initial_chan_a=initial_a,
+        initial_chan_b=initial_b,
+        frame_cache_bytes=int(args.frame_cache_mb * 2**20),
+        codec=codec_options_from_args(args),
+    )
     plt.show()
 
 if __name__ == "__main__":
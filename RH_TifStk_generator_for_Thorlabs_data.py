@@ -10,78 +10,299 @@
 # Function is checking if the target folder is available, and if not,it leaves it with a message.
 # This avoids any overwriting or data-mixing.
 
-# Average of several measures indicate a speed of 11 frames/s total on a basic CPU system.
-# Not set up for parallel processing yet.
+# Frames are decoded concurrently on a thread pool and streamed, in order, by a single
+# writer into a BigTIFF. Only a bounded window of decoded frames is held in memory, so
+# memory use is independent of the number of frames. (The original serial version
+# measured ~11 frames/s on a basic CPU system.)
+
+# Every stack gets a small manifest (DATA/ChanX/ChanX_stk_manifest.json) listing the
+# source frames it contains. With --incremental, existing stacks are extended with only
+# the frames that are not in the manifest yet (a running acquisition, or a run that died
+# halfway); frames are appended in batches and the manifest is rewritten after each one,
+# so an interrupted run resumes from the last complete batch.
+
+# Before decoding, all source frames get a header-only integrity scan (tif_integrity.py).
+# Damaged frames are stood in for by the previous healthy frame, as FastFileTransfer
+# does, so frame numbering and timing stay intact; damaged frames before the first
+# healthy one are written as zeros. The substitutions are listed in the manifest under
+# "replaced" (stand-in file name, or "<zero frame>"). With --incremental, damaged frames
+# at the end of the list may still be being written: they are left for the next run.
+
+# --compression zlib|lzma (optionally --level, --tile, --rowsperstrip) writes losslessly
+# compressed stacks, which helps when the target drive is the bottleneck; compare codecs
+# on a given drive with benchmark_stack_codecs.py.
 
 # Folder selection
 import tkinter as tk
 from tkinter import filedialog
+import argparse
+import json
 import os
+import struct
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 # Image-reading
-import tifffile
 import numpy as np
+import tifffile
 import time
-import re
 
-def stack_tif_images(root, chan):
+from stack_io import (
+    add_codec_arguments,
+    codec_options_from_args,
+    stack_write_options,
+    thorlabs_frame_files,
+    write_stack_frames,
+)
+from tif_integrity import scan_tif_files
+
+DECODE_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+FRAMES_IN_FLIGHT_PER_WORKER = 4
+APPEND_BATCH_FRAMES = 1000
+ZERO_FRAME = "<zero frame>"  # stand-in for damaged frames with no healthy frame before them
+MANIFEST_VERSION = 1
+
+
+def read_frame(path, image_shape, dtype=None):
+    if path == ZERO_FRAME:
+        return np.zeros(image_shape, dtype=dtype)
+    image = tifffile.imread(path, key=0)  # Read the first page
+    if image.shape != image_shape:
+        raise ValueError(f"Image format mismatch for {os.path.basename(path)}: {image.shape} != {image_shape}")
+    return image
+
+
+def iter_decoded_frames(paths, image_shape, workers=DECODE_WORKERS, dtype=None):
+    # Decode frames on a thread pool and yield them in order; at most
+    # workers * FRAMES_IN_FLIGHT_PER_WORKER frames are decoded ahead of the writer.
+    window = max(1, workers * FRAMES_IN_FLIGHT_PER_WORKER)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        next_index = 0
+        while pending or next_index < len(paths):
+            while next_index < len(paths) and len(pending) < window:
+                pending.append(pool.submit(read_frame, paths[next_index], image_shape, dtype))
+                next_index += 1
+            yield pending.popleft().result()
+
+
+def healthy_frame_sources(tif_files, workers=DECODE_WORKERS, previous=None, hold_trailing=False):
+    # Scan frame headers up front and map every damaged frame onto the last healthy one
+    # before it (``previous``: the source of the last frame already in the stack), or onto
+    # ZERO_FRAME when there is none. With ``hold_trailing`` (appending while an acquisition
+    # may still be running), damaged frames at the end of the list are left out instead,
+    # so the returned sources can be shorter than ``tif_files``. Returns the per-frame
+    # sources and {damaged name: stand-in name or ZERO_FRAME}.
+    report = scan_tif_files(tif_files, workers)
+    if not report:
+        return list(tif_files), {}
+    n_frames = len(tif_files)
+    if hold_trailing:
+        while n_frames and tif_files[n_frames - 1] in report:
+            n_frames -= 1
+        if n_frames < len(tif_files):
+            print(f"Leaving {len(tif_files) - n_frames} damaged frame(s) at the end for the next run")
+    elif len(report) == n_frames:
+        raise ValueError(f"All {n_frames} frames are damaged")
+    sources = []
+    replaced = {}
+    for path in tif_files[:n_frames]:
+        if path in report:
+            stand_in = previous if previous is not None else ZERO_FRAME
+            print(f"Damaged frame {os.path.basename(path)} ({report[path]}); using {os.path.basename(stand_in)}")
+            replaced[os.path.basename(path)] = os.path.basename(stand_in)
+            sources.append(stand_in)
+        else:
+            previous = path
+            sources.append(path)
+    return sources, replaced
+
+
+def stack_tif_images(root, chan, workers=DECODE_WORKERS, codec=None):
+    # codec: keyword arguments for stack_write_options (compression, level, tile, rowsperstrip)
 
     # root = "C:\\Users\\svw191\\PythonFiles\\PythonTrial\\LED +APs 240926\\240926_pl100_pc001_LED+APs500microW_ex01\\"
     # chan = "ChanA"
 
-    # Get a list of .tif files containing the search string
-    tif_files = [f for f in os.listdir(root) if (f.endswith('.tif') or f.endswith('.ti')) and chan in f and 'Preview' not in f]
+    # Channel-specific .tif files in natural (acquisition) order, Preview files excluded
+    tif_files = thorlabs_frame_files(root, chan)
+    sources, replaced = healthy_frame_sources(tif_files, workers)
 
-    first_image = tifffile.imread(os.path.join(root, tif_files[0]), key=0)  # Read the first page
+    first_image = tifffile.imread(next(s for s in sources if s != ZERO_FRAME), key=0)  # Read the first page
     image_shape = first_image.shape
+    stack_shape = (len(tif_files), *image_shape)
 
-    # # # Ensure consistent image format
-    for file in files:
-        image = tifffile.imread(os.path.join(root, tif_files[0]), key=0)
-        if image.shape != image_shape:
-            print(f"Warning: Image format mismatch for {file}")
-            # Implement conversion logic here (optional)
+    out_dir = os.path.join(root, "DATA", chan)
+    os.makedirs(out_dir, exist_ok=True)
+    out_path = os.path.join(out_dir, f"{chan}_stk.tif")
+    part_path = out_path + ".part"
 
-    # SOLVE PADDING ISSUE AND CHRONOLOGY FOR TIFS
+    # Stream the frames into a BigTIFF; the stack only gets its final name once complete.
+    # metadata=None lets --incremental runs append pages to the same uniform series.
+    options = {**stack_write_options(first_image.dtype, **(codec or {})), "metadata": None}
+    with tifffile.TiffWriter(part_path, bigtiff=True) as writer:
+        write_stack_frames(
+            writer,
+            iter_decoded_frames(sources, image_shape, workers, first_image.dtype),
+            stack_shape,
+            first_image.dtype,
+            options,
+        )
+    os.replace(part_path, out_path)
+    save_manifest(out_path, chan, tif_files, image_shape, first_image.dtype, replaced)
 
-    # Pad the smaller indices to match the longest one
-    file_nums = []
-    for file in tif_files:
-        match = re.search(r"([^_\.]+)(\.[^.]+)$", file)
-        file_num = match.group(1)
-        file_nums.append(file_num)   
+    print(f"Shape of stack is: {stack_shape}")
+    return len(tif_files)
 
-    longest_string = max(file_nums, key=len)
-    max_len = len(longest_string)
 
-    pad_files = []
-    for file in tif_files:
-        match = re.search(r"([^_\.]+)(\.[^.]+)$", file)
-        file_num = match.group(1)
-        file_num_pad = file_num.zfill(max_len)
-        file = re.sub(rf"{re.escape(file_num)}\.", f"{file_num_pad}.", file)
-        pad_files.append(file)
+def manifest_path(stack_path):
+    return os.path.splitext(stack_path)[0] + "_manifest.json"
 
-    indices = np.argsort(pad_files)
 
-    sorted_files = []
-    for i in range(len(indices)):
-        sorted_files.append(tif_files[indices[i]])
+def last_ifd_pointer(stack_path):
+    # File offset of the "next IFD" field of the last page; appending links new pages there.
+    # The entry count is read from the file in the stack's own layout (classic TIFF or BigTIFF).
+    with tifffile.TiffFile(stack_path) as tif:
+        layout = tif.tiff
+        offset = tif.pages[-1].offset
+        tif.filehandle.seek(offset)
+        (n_tags,) = struct.unpack(layout.tagnoformat, tif.filehandle.read(layout.tagnosize))
+        return offset + layout.tagnosize + layout.tagsize * n_tags
 
-    # Create an empty stack with correct data type
-    image_stack = np.zeros((len(tif_files), *image_shape), dtype=first_image.dtype)
 
-    # # # Iterate over the sorted files and add them to the stack
-    for i, file in enumerate(tif_files):
-        image = tifffile.imread(os.path.join(root,tif_files[indices[i]]), key=0)
-        image_stack[i] = image
+def ifd_pointer_size(stack_path):
+    # Size of an IFD offset: 4 bytes in classic TIFF, 8 in BigTIFF
+    with tifffile.TiffFile(stack_path) as tif:
+        return tif.tiff.offsetsize
+
+
+def save_manifest(stack_path, chan, tif_files, image_shape, dtype, replaced=None):
+    names = [os.path.basename(path) for path in tif_files]
+    listed = set(names)
+    replaced = {name: stand_in for name, stand_in in (replaced or {}).items() if name in listed}
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "channel": chan,
+        "frame_shape": list(image_shape),
+        "dtype": str(dtype),
+        "frames": names,
+        "replaced": replaced,
+        "stack_bytes": os.path.getsize(stack_path),
+        "last_ifd_pointer": last_ifd_pointer(stack_path),
+    }
+    tmp_path = manifest_path(stack_path) + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, manifest_path(stack_path))
+
+
+def load_manifest(stack_path, chan, tif_files):
+    path = manifest_path(stack_path)
+    if os.path.exists(path):
+        with open(path) as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    # Stack written before manifests existed: assume it holds the first N source frames
+    with tifffile.TiffFile(stack_path) as tif:
+        n_frames = len(tif.pages)
+        page = tif.pages[0]
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "channel": chan,
+            "frame_shape": list(page.shape),
+            "dtype": str(page.dtype),
+            "frames": [os.path.basename(path) for path in tif_files[:n_frames]],
+            "stack_bytes": os.path.getsize(stack_path),
+            "last_ifd_pointer": last_ifd_pointer(stack_path),
+        }
+    print(f"No manifest for {stack_path}; assuming it holds the first {n_frames} frames")
+    return manifest
+
+
+def discard_partial_batch(stack_path, manifest):
+    # Cut off anything written after the last complete batch and unlink it from the IFD chain
+    if os.path.getsize(stack_path) == manifest["stack_bytes"]:
+        return
+    print(f"Discarding incomplete batch at the end of {stack_path}")
+    pointer_size = ifd_pointer_size(stack_path)
+    with open(stack_path, "r+b") as f:
+        f.truncate(manifest["stack_bytes"])
+        f.seek(manifest["last_ifd_pointer"])
+        f.write(bytes(pointer_size))
+
+
+def append_tif_images(root, chan, workers=DECODE_WORKERS, batch_frames=APPEND_BATCH_FRAMES, codec=None):
+    # Extend (or start) the channel stack with the source frames not listed in its manifest.
+    # Returns the number of frames appended.
+    tif_files = thorlabs_frame_files(root, chan)
+
+    out_dir = os.path.join(root, "DATA", chan)
+    os.makedirs(out_dir, exist_ok=True)
+    out_path = os.path.join(out_dir, f"{chan}_stk.tif")
+
+    if os.path.exists(out_path):
+        manifest = load_manifest(out_path, chan, tif_files)
+        done = manifest["frames"]
+        if [os.path.basename(path) for path in tif_files[:len(done)]] != done:
+            raise ValueError(
+                f"Source frames of {out_path} no longer match its manifest; "
+                "remove the stack to regenerate it"
+            )
+        discard_partial_batch(out_path, manifest)
+        image_shape = tuple(manifest["frame_shape"])
+        dtype = manifest["dtype"]
+        replaced = dict(manifest.get("replaced", {}))
+    else:
+        done = []
+        replaced = {}
+        if not tif_files:
+            return 0
+
+    new_files = tif_files[len(done):]
+    previous = None
+    if done:
+        stand_in = replaced.get(done[-1], done[-1])
+        previous = stand_in if stand_in == ZERO_FRAME else os.path.join(root, stand_in)
+    sources, new_replaced = healthy_frame_sources(new_files, workers, previous, hold_trailing=True)
+    replaced.update(new_replaced)
+    new_files = new_files[:len(sources)]
+    if not done:
+        healthy = [source for source in sources if source != ZERO_FRAME]
+        if not healthy:
+            return 0
+        first_image = tifffile.imread(healthy[0], key=0)
+        image_shape = first_image.shape
+        dtype = first_image.dtype
+    options = {**stack_write_options(dtype, **(codec or {})), "metadata": None}
+    for start in range(0, len(new_files), batch_frames):
+        batch = sources[start:start + batch_frames]
+        with tifffile.TiffWriter(out_path, bigtiff=True, append=True) as writer:
+            write_stack_frames(
+                writer,
+                iter_decoded_frames(batch, image_shape, workers, dtype),
+                (len(batch), *image_shape),
+                dtype,
+                options,
+            )
+        save_manifest(out_path, chan, tif_files[:len(done) + start + len(batch)], image_shape, dtype, replaced)
+        print(f"Appended {start + len(batch)}/{len(new_files)} new frames to {out_path}")
+
+    print(f"Shape of stack is: {(len(done) + len(new_files), *image_shape)}")
+    return len(new_files)
 
-    print(f"Shape of stack is: {np.shape(image_stack)}")
 
-    # Write the stacked image to a new .tif file
-    tifffile.imwrite(os.path.join(root, "Data", chan, f"{chan}_stk.tif"), image_stack)
-    
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build ChanX_stk.tif stacks from Thorlabs frame folders.")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="append new frames to existing stacks instead of skipping them",
+    )
+    add_codec_arguments(parser)
+    args = parser.parse_args()
+    codec = codec_options_from_args(args)
+
     # define the variables to look for:
     chans = ['ChanA','ChanB'] # make it applicable for both 1- and 2-color imaging
     
@@ -106,19 +327,26 @@ if __name__ == "__main__":
                     print(f"Generating {chandir}")
                     os.makedirs(chandir)                                                              
                     
-                # check if stack has been made:
-                if not len(os.listdir(chandir)) == 0:
-                    print(f"{chandir} is not empty, skipping to avoid overwriting")
-                if len(os.listdir(chandir)) == 0:
-                    print(f"{chandir} is empty")
-                    
-                    start_time = time.time()
-                    
-                    stack_tif_images(root, chan)
+                # check if stack has been made (analysis sidecars from opening the
+                # frame folder as a virtual stack may already live here):
+                stack_file = os.path.join(chandir, f"{chan}_stk.tif")
+                if os.path.exists(stack_file) and not args.incremental:
+                    print(f"{stack_file} exists, skipping to avoid overwriting")
+                    continue
+                if not os.path.exists(stack_file):
+                    print(f"{stack_file} not generated yet")
+
+                start_time = time.time()
+
+                if args.incremental:
+                    n_frames = append_tif_images(root, chan, codec=codec)
+                    print(f"Stack is up to date ({n_frames} new frames)")
+                else:
+                    n_frames = stack_tif_images(root, chan, codec=codec)
                     print("Stack has been completed")
-                    
-                    end_time = time.time()
-                    
-                    elapsed_time = end_time - start_time
-                    print("Elapsed time:", elapsed_time, "seconds")
-                
+
+                end_time = time.time()
+
+                elapsed_time = end_time - start_time
+                print("Elapsed time:", elapsed_time, "seconds")
+                print(f"Throughput: {n_frames / max(elapsed_time, 1e-9):.1f} frames/s")
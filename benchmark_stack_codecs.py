@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Benchmark lossless TIFF codecs for stack writing on a given drive.
+
+Writes a sample stack with each codec into ``--out-dir`` (put it on the drive
+you want to test), reads it back frame by frame through stack_io, checks the
+round trip is lossless and reports write MB/s, read MB/s and compression ratio.
+Rates are per MB of uncompressed data. Read-back usually comes from the OS file
+cache right after writing, so the read column is an upper bound for cold reads."""
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import tifffile
+
+from stack_io import STACK_CODECS, open_tif_stack, stack_write_options, write_stack_frames
+
+
+def synthetic_stack(n_frames: int, height: int = 512, width: int = 512, seed: int = 0) -> np.ndarray:
+    """Shot-noise-like uint16 frames over a smooth background, roughly like 2P recordings."""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width]
+    background = 200 + 150 * np.sin(xx / 37.0) * np.cos(yy / 53.0) + 0.2 * xx
+    return rng.poisson(np.maximum(background, 1.0), size=(n_frames, height, width)).astype(np.uint16)
+
+
+def load_sample(path: str | None, n_frames: int) -> np.ndarray:
+    if path is None:
+        return synthetic_stack(n_frames)
+    with open_tif_stack(path) as stack:
+        return np.asarray(stack[: min(n_frames, stack.shape[0])])
+
+
+def benchmark_codec(sample: np.ndarray, out_path: Path, codec: dict) -> dict:
+    options = stack_write_options(sample.dtype, **codec)
+    start = time.perf_counter()
+    with tifffile.TiffWriter(out_path, bigtiff=True) as writer:
+        write_stack_frames(writer, iter(sample), sample.shape, sample.dtype, options)
+    with open(out_path, "rb+") as handle:
+        os.fsync(handle.fileno())
+    write_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    lossless = True
+    with open_tif_stack(out_path) as stack:
+        for index, frame in enumerate(stack):
+            lossless &= np.array_equal(frame, sample[index])
+    read_seconds = time.perf_counter() - start
+
+    megabytes = sample.nbytes / 1e6
+    return {
+        "write_mb_s": megabytes / max(write_seconds, 1e-9),
+        "read_mb_s": megabytes / max(read_seconds, 1e-9),
+        "ratio": sample.nbytes / os.path.getsize(out_path),
+        "lossless": lossless,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark lossless TIFF codecs for stack writing")
+    parser.add_argument("sample", nargs="?", help="Sample stack (.tif or Thorlabs frame folder); default: synthetic")
+    parser.add_argument("--frames", type=int, default=200, help="Frames of the sample to use (default: %(default)s)")
+    parser.add_argument("--out-dir", default=None, help="Directory on the drive to test (default: system temp)")
+    parser.add_argument("--codecs", nargs="+", choices=STACK_CODECS, default=list(STACK_CODECS))
+    parser.add_argument("--levels", nargs="+", type=int, default=[None], help="Compression levels to try")
+    parser.add_argument("--tile", type=int, default=None, help="Square tile size (default: strips)")
+    parser.add_argument("--rowsperstrip", type=int, default=None)
+    args = parser.parse_args()
+
+    sample = load_sample(args.sample, args.frames)
+    print(f"Sample: {sample.shape} {sample.dtype}, {sample.nbytes / 1e6:.1f} MB")
+    print(f"{'codec':<12} {'level':>5} {'write MB/s':>11} {'read MB/s':>10} {'ratio':>7}  lossless")
+
+    with tempfile.TemporaryDirectory(dir=args.out_dir, prefix="codec_bench_") as tmp_dir:
+        for codec in args.codecs:
+            for level in args.levels if codec != "none" else [None]:
+                out_path = Path(tmp_dir) / f"bench_{codec}_{level}.tif"
+                result = benchmark_codec(
+                    sample,
+                    out_path,
+                    {"codec": codec, "level": level, "tile": args.tile, "rowsperstrip": args.rowsperstrip},
+                )
+                print(
+                    f"{codec:<12} {level if level is not None else '-':>5} "
+                    f"{result['write_mb_s']:>11.1f} {result['read_mb_s']:>10.1f} "
+                    f"{result['ratio']:>7.2f}  {'yes' if result['lossless'] else 'NO'}"
+                )
+                out_path.unlink()
+
+
+if __name__ == "__main__":
+    main()
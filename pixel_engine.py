@@ -0,0 +1,318 @@
+"""Per-pixel segment-trace kernel for the Stack Analyzer heatmap, and its process-pool driver.
+
+``box_mean_traces`` turns one pixel box of a stack into mean baseline-normalized
+segment traces, and ``box_smoothed_frames`` into the smoothed frames of chosen
+ranges (for the smoothed-frame cache); stack_analyzer.py runs them over row
+bands on one core, or hands tile-sized boxes to a ``BoxPool``. Pool workers read the stack from
+its time-major pixel-tile sidecar (memory-mapped ``.npy`` files), reopen an
+uncompressed TIFF by path (``MappedStackFile``), or read a ``SharedArray``
+copy of other stacks up to ``POOL_MAX_COPY_SAMPLES``; they write their boxes
+straight into a shared output array, so no pixel data is pickled between
+processes. The pool's processes are started once and reused, and only jobs of
+at least ``POOL_MIN_WORK`` pixel-frames on a multi-core machine are worth
+sending to it. Both limits count samples (pixel-frames), whatever the dtype.
+
+A trace plan is a dict with:
+
+- ``chunks``: ``(lo, hi)`` frame ranges read and smoothed as one piece
+- ``savgol``: ``(window, polyorder)``, or None to skip smoothing
+- ``segments``: ``(start, seg_start, seg_stop)`` per segment, inside one chunk
+- ``baseline_len``, ``total_len``: segment geometry
+- ``dtype``: working precision
+- ``keep`` (optional): ``(lo, hi)`` frame ranges, each inside one chunk; when
+  present, boxes produce those smoothed frames instead of mean traces
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+from collections import OrderedDict
+from collections.abc import Callable
+from multiprocessing import shared_memory
+
+import numpy as np
+from scipy.signal import savgol_filter
+
+from stack_io import MappedStackFile, PixelTileStore, read_pixel_box
+
+POOL_WORKERS = os.cpu_count() or 1
+# Seconds between ``on_done`` calls while no box finishes (keeps cancellation prompt).
+POOL_POLL_SECONDS = 0.1
+# Smallest job (frames read x pixels) sent to the pool; below it, starting workers costs more than it saves
+POOL_MIN_WORK = 256 * 1024 * 1024
+# Largest stack (samples) copied into shared memory for the pool when workers cannot read it from disk
+POOL_MAX_COPY_SAMPLES = 4 * POOL_MIN_WORK
+# Shared-memory segments a pool worker keeps attached between boxes
+WORKER_ATTACHED_SEGMENTS = 4
+
+
+class SharedArray:
+    """A numpy array in ``multiprocessing.shared_memory``.
+
+    Pickles by segment name, so pool workers attach to the same memory instead
+    of receiving a copy. The creating process must ``close()`` and ``unlink()`` it.
+    """
+
+    def __init__(self, shape: tuple[int, ...], dtype, name: str | None = None) -> None:
+        self.shape = tuple(int(n) for n in shape)
+        self.dtype = np.dtype(dtype)
+        nbytes = max(1, int(np.prod(self.shape)) * self.dtype.itemsize)
+        if name is None:
+            self._shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        else:
+            self._shm = _attached_segment(name)
+        self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=self._shm.buf)
+
+    @classmethod
+    def from_array(cls, data) -> SharedArray:
+        shared = cls(data.shape, data.dtype)
+        shared.array[...] = data
+        return shared
+
+    def __getstate__(self) -> tuple:
+        return self._shm.name, self.shape, self.dtype.str
+
+    def __setstate__(self, state: tuple) -> None:
+        name, shape, dtype = state
+        self.__init__(shape, dtype, name=name)
+
+    def close(self) -> None:
+        self.array = None
+        if _attached_segments.get(self._shm.name) is not self._shm:
+            self._shm.close()
+
+    def unlink(self) -> None:
+        self._shm.unlink()
+
+
+# Segments attached by name in this process (pool workers), most recent last
+_attached_segments: OrderedDict[str, shared_memory.SharedMemory] = OrderedDict()
+
+
+def _attached_segment(name: str) -> shared_memory.SharedMemory:
+    """Attach to a segment once per process; boxes of one run then share the mapping."""
+    segment = _attached_segments.pop(name, None)
+    if segment is None:
+        segment = shared_memory.SharedMemory(name=name)
+    _attached_segments[name] = segment
+    while len(_attached_segments) > WORKER_ATTACHED_SEGMENTS:
+        _name, oldest = _attached_segments.popitem(last=False)
+        try:
+            oldest.close()
+        except BufferError:
+            pass  # still viewed by a live array; the mapping goes with it
+    return segment
+
+
+def smooth_pixel_chunk(source, r0: int, r1: int, c0: int, c1: int, lo: int, hi: int, plan: dict) -> np.ndarray:
+    """Pixels ``[r0:r1, c0:c1]`` over frames ``[lo, hi)`` as (frames, pixels), smoothed along time."""
+    pixels = read_pixel_box(source, r0, r1, c0, c1, slice(lo, hi))
+    pixels = pixels.reshape(hi - lo, -1).astype(plan["dtype"])
+    if plan["savgol"] is not None:
+        window, poly = plan["savgol"]
+        pixels = savgol_filter(pixels, window_length=window, polyorder=poly, axis=0)
+    return pixels
+
+
+def segment_mean_traces(smoothed_chunks: list[np.ndarray], plan: dict) -> np.ndarray:
+    """NaN-aware mean of the baseline-normalized segments, shape (total_len, pixels).
+
+    Equivalent to ``nanmean`` over the stacked segments; NaN where no segment
+    covers a frame.
+    """
+    chunks, dtype = plan["chunks"], plan["dtype"]
+    baseline_len, total_len = plan["baseline_len"], plan["total_len"]
+    n_pixels = smoothed_chunks[0].shape[1]
+    total = np.zeros((total_len, n_pixels), dtype=dtype)
+    count = np.zeros((total_len, n_pixels), dtype=dtype)
+    for start, seg_start, seg_stop in plan["segments"]:
+        chunk_index = next(i for i, (lo, hi) in enumerate(chunks) if lo <= seg_start and seg_stop <= hi)
+        chunk_start = chunks[chunk_index][0]
+        raw = smoothed_chunks[chunk_index][seg_start - chunk_start : seg_stop - chunk_start, :]
+        available_baseline = start - seg_start
+        baseline_mean = raw[:available_baseline, :].mean(axis=0)
+        baseline_mean = np.where(baseline_mean == 0, 1.0, baseline_mean).astype(dtype)
+
+        offset = baseline_len - available_baseline
+        normalized = raw / baseline_mean[np.newaxis, :]
+        finite = ~np.isnan(normalized)
+        total[offset : offset + raw.shape[0], :] += np.where(finite, normalized, 0)
+        count[offset : offset + raw.shape[0], :] += finite
+
+    with np.errstate(invalid="ignore"):
+        return total / count
+
+
+def box_mean_traces(
+    source, r0: int, r1: int, c0: int, c1: int, plan: dict, check: Callable[[], None] | None = None
+) -> np.ndarray:
+    """Mean segment traces of pixels ``[r0:r1, c0:c1]``, shape (total_len, r1 - r0, c1 - c0).
+
+    ``check`` is called before each chunk read (e.g. to raise on cancellation).
+    """
+    smoothed = []
+    for lo, hi in plan["chunks"]:
+        if check is not None:
+            check()
+        smoothed.append(smooth_pixel_chunk(source, r0, r1, c0, c1, lo, hi, plan))
+    return segment_mean_traces(smoothed, plan).reshape(plan["total_len"], r1 - r0, c1 - c0)
+
+
+def box_smoothed_frames(
+    source, r0: int, r1: int, c0: int, c1: int, plan: dict, check: Callable[[], None] | None = None
+) -> np.ndarray:
+    """Smoothed pixels ``[r0:r1, c0:c1]`` over the ``keep`` ranges, concatenated: (frames, rows, columns)."""
+    pieces = []
+    for lo, hi in plan["chunks"]:
+        kept = [(k0, k1) for k0, k1 in plan["keep"] if lo <= k0 and k1 <= hi]
+        if not kept:
+            continue
+        if check is not None:
+            check()
+        smoothed = smooth_pixel_chunk(source, r0, r1, c0, c1, lo, hi, plan)
+        pieces.extend(smoothed[k0 - lo : k1 - lo] for k0, k1 in kept)
+    return np.concatenate(pieces).reshape(-1, r1 - r0, c1 - c0)
+
+
+def box_kernel(plan: dict) -> Callable[..., np.ndarray]:
+    """``box_smoothed_frames`` for plans with ``keep`` ranges, else ``box_mean_traces``."""
+    return box_smoothed_frames if "keep" in plan else box_mean_traces
+
+
+def plan_output_frames(plan: dict) -> int:
+    """Length of the frame axis the plan's boxes produce."""
+    if "keep" in plan:
+        return sum(hi - lo for lo, hi in plan["keep"])
+    return plan["total_len"]
+
+
+def pool_source(stack, max_copy_samples: int = POOL_MAX_COPY_SAMPLES):
+    """What pool workers read ``stack`` from, or None when it cannot be shared cheaply.
+
+    The pixel-tile sidecar is used when attached, then the stack's file when it
+    is memory-mapped (workers reopen it by path); otherwise stacks of up to
+    ``max_copy_samples`` samples are copied once into shared memory (a ``SharedArray``).
+    """
+    tiles = getattr(stack, "pixel_tiles", None)
+    if isinstance(tiles, PixelTileStore):
+        return tiles
+    mapped_file = getattr(stack, "mapped_file", None)
+    mapped = mapped_file() if mapped_file is not None else None
+    if mapped is not None:
+        return mapped
+    if int(np.prod(stack.shape)) > max_copy_samples:
+        return None
+    return SharedArray.from_array(np.asarray(stack[:]))
+
+
+def _run_box(task: tuple) -> None:
+    source, output, plan, (r0, r1, c0, c1) = task
+    if isinstance(source, SharedArray):
+        data = source.array
+    elif isinstance(source, MappedStackFile):
+        data = source.open()
+    else:
+        data = source
+    output.array[:, r0:r1, c0:c1] = box_kernel(plan)(data, r0, r1, c0, c1, plan)
+
+
+class BoxPool:
+    """Worker processes for pixel boxes, started on first use and kept for later runs.
+
+    Also keeps the shared-memory copy of the last small stack it was asked to
+    share (``source_for``), so repeated heatmaps of one stack copy it once.
+    A run that raises (e.g. on cancellation) terminates the workers; the next
+    run starts new ones. Use from one thread at a time; ``close()`` when done.
+    """
+
+    def __init__(self, workers: int = POOL_WORKERS, min_work: int = POOL_MIN_WORK) -> None:
+        self.workers = max(1, int(workers))
+        self.min_work = int(min_work)
+        self._pool = None
+        self._source_stack = None
+        self._source = None
+
+    def worth_using(self, n_boxes: int, work: int) -> bool:
+        """Whether ``n_boxes`` boxes over ``work`` pixel-frames are faster on the pool than serially."""
+        cores = os.cpu_count() or 1
+        return self.workers > 1 and cores > 1 and n_boxes > 1 and work >= self.min_work
+
+    def source_for(self, stack):
+        """``pool_source(stack)``, reusing the shared copy made for the same stack last time."""
+        if self._source_stack is stack and self._source is not None:
+            return self._source
+        self.release_source()
+        source = pool_source(stack)
+        if isinstance(source, SharedArray):
+            self._source_stack, self._source = stack, source
+        return source
+
+    def release_source(self) -> None:
+        """Free the shared copy of the last stack."""
+        if self._source is not None:
+            self._source.close()
+            self._source.unlink()
+        self._source_stack = self._source = None
+
+    def run(
+        self,
+        source,
+        output: SharedArray,
+        boxes: list[tuple[int, int, int, int]],
+        plan: dict,
+        on_done: Callable[[float], None] | None = None,
+    ) -> None:
+        """Fill ``output[:, r0:r1, c0:c1]`` with the plan's box kernel for every box.
+
+        ``on_done`` is called in this process with the fraction of boxes finished,
+        at least every ``POOL_POLL_SECONDS``; an exception it raises (e.g. a
+        cancellation) terminates the workers, running boxes included, and is re-raised.
+        """
+        if self._pool is None:
+            # Spawned workers: forking a process that runs GUI and worker threads is unsafe.
+            self._pool = multiprocessing.get_context("spawn").Pool(processes=self.workers)
+        try:
+            results = self._pool.imap_unordered(_run_box, [(source, output, plan, box) for box in boxes])
+            done = 0
+            while done < len(boxes):
+                try:
+                    results.next(timeout=POOL_POLL_SECONDS)
+                    done += 1
+                except multiprocessing.TimeoutError:
+                    pass
+                if on_done is not None:
+                    on_done(done / len(boxes))
+        except BaseException:
+            self._terminate()
+            raise
+
+    def _terminate(self) -> None:
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def close(self) -> None:
+        """Stop the workers and free the shared stack copy."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        self.release_source()
+
+
+def run_box_pool(
+    source,
+    output: SharedArray,
+    boxes: list[tuple[int, int, int, int]],
+    plan: dict,
+    workers: int = POOL_WORKERS,
+    on_done: Callable[[float], None] | None = None,
+) -> None:
+    """``BoxPool.run`` on a pool of up to ``workers`` processes that is closed afterwards."""
+    pool = BoxPool(min(workers, len(boxes)))
+    try:
+        pool.run(source, output, boxes, plan, on_done)
+    finally:
+        pool.close()
@@ -0,0 +1,110 @@
+"""Columnar ``.npz`` bundles of ROI quantification results.
+
+A bundle holds one experiment's quantification (the rows of one
+``ROI_quant pickle.pkl``) as plain numeric arrays: one entry per row along the
+first axis, variable-length fields NaN- (or -1-) padded with a companion
+``n_*`` length array, and no Python objects. Members are stored uncompressed,
+so ``load_quant_bundle(path, mmap_mode="r")`` memory-maps each array straight
+from the ``.npz`` without reading or unpickling anything.
+
+Only numpy is needed to read a bundle; stack_analyzer.py builds them from the
+pickle (``export_quant_bundle`` / ``--export-bundle``).
+"""
+
+from __future__ import annotations
+
+import os
+import struct
+import zipfile
+from collections.abc import Sequence
+from pathlib import Path
+
+import numpy as np
+
+QUANT_BUNDLE_NAME = "ROI_quant bundle.npz"
+QUANT_BUNDLE_VERSION = 1
+ZIP_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+
+
+def pad_rows(
+    values: Sequence,
+    fill=np.nan,
+    dtype=np.float64,
+    inner_shape: tuple[int, ...] = (),
+) -> tuple[np.ndarray, np.ndarray]:
+    """Stack variable-length arrays along a new first axis.
+
+    Returns ``(padded, lengths)``: ``padded[i, :lengths[i]]`` is ``values[i]``
+    (None counts as length 0); each element has shape ``inner_shape``.
+    """
+    arrays = [None if value is None else np.asarray(value, dtype=dtype) for value in values]
+    lengths = np.array([0 if arr is None else len(arr) for arr in arrays], dtype=np.int64)
+    inner = tuple(inner_shape)
+    width = int(lengths.max(initial=0))
+    padded = np.full((len(arrays), width, *inner), fill, dtype=dtype)
+    for index, arr in enumerate(arrays):
+        if arr is not None and len(arr):
+            padded[index, : len(arr)] = arr.reshape(len(arr), *inner)
+    return padded, lengths
+
+
+def save_quant_bundle(path: str | Path, arrays: dict) -> None:
+    """Write ``arrays`` as an uncompressed ``.npz`` (so it can be memory-mapped)."""
+    path = Path(path)
+    for name, value in arrays.items():
+        if np.asarray(value).dtype == object:
+            raise ValueError(f"Bundle field {name!r} is not a plain array")
+    tmp_path = path.with_name(path.name + ".tmp")
+    with tmp_path.open("wb") as handle:
+        np.savez(handle, bundle_version=np.int64(QUANT_BUNDLE_VERSION), **arrays)
+    os.replace(tmp_path, path)
+
+
+def _stored_member_array(handle, info: zipfile.ZipInfo, path: Path, mmap_mode: str) -> np.ndarray | None:
+    handle.seek(info.header_offset)
+    header = ZIP_LOCAL_HEADER.unpack(handle.read(ZIP_LOCAL_HEADER.size))
+    name_length, extra_length = header[-2], header[-1]
+    handle.seek(info.header_offset + ZIP_LOCAL_HEADER.size + name_length + extra_length)
+    version = np.lib.format.read_magic(handle)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(handle)
+    elif version == (2, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(handle)
+    else:
+        return None
+    if dtype.hasobject:
+        return None
+    if int(np.prod(shape)) == 0:
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(
+        path,
+        dtype=dtype,
+        mode=mmap_mode,
+        offset=handle.tell(),
+        shape=shape,
+        order="F" if fortran_order else "C",
+    )
+
+
+def load_quant_bundle(path: str | Path, mmap_mode: str | None = None) -> dict:
+    """Load a bundle as ``{name: array}``.
+
+    With ``mmap_mode`` (``"r"``, ``"c"``), every uncompressed member is returned
+    as a ``np.memmap`` into the ``.npz`` file; otherwise arrays are read into memory.
+    """
+    path = Path(path)
+    if mmap_mode is None:
+        with np.load(path, allow_pickle=False) as data:
+            return {name: data[name] for name in data.files}
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, path.open("rb") as handle:
+        for info in archive.infolist():
+            name = info.filename[:-4] if info.filename.endswith(".npy") else info.filename
+            array = None
+            if info.compress_type == zipfile.ZIP_STORED:
+                array = _stored_member_array(handle, info, path, mmap_mode)
+            if array is None:
+                with archive.open(info) as member:
+                    array = np.lib.format.read_array(member, allow_pickle=False)
+            arrays[name] = array
+    return arrays
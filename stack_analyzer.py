@@ -4,12 +4,17 @@
 from __future__ import annotations
 
 import argparse
+import hashlib
+import json
 import os
 import pickle
+import threading
+import warnings
 import tkinter as tk
+from collections import OrderedDict
 from collections.abc import Callable
 from pathlib import Path
-from tkinter import filedialog, messagebox, ttk
+from tkinter import filedialog, messagebox, simpledialog, ttk
 
 import matplotlib.pyplot as plt
 import matplotlib.widgets as widgets
@@ -20,11 +25,38 @@ import numpy as np
 import tifffile
 from matplotlib.path import Path as MplPath
 from matplotlib.patches import Polygon, Rectangle
-from scipy.integrate import trapezoid
 from scipy.optimize import curve_fit
 from scipy.signal import savgol_filter
 
+from pixel_engine import (
+    POOL_WORKERS,
+    BoxPool,
+    SharedArray,
+    box_kernel,
+    plan_output_frames,
+    segment_mean_traces,
+)
 from portable_paths import directory_matches, resolve_directory
+from quant_bundle import QUANT_BUNDLE_NAME, pad_rows, save_quant_bundle
+from stack_io import (
+    DEFAULT_BLOCK_BYTES,
+    PIXEL_TILE_SIZE,
+    LazyStack,
+    PixelStridedStack,
+    base_stack,
+    bin_stack,
+    cached_pixel_tiles,
+    cached_stack_statistics,
+    open_tif_stack,
+    parse_crop,
+    parse_frame_range,
+    read_pixel_box,
+    row_bands,
+    stack_masked_mean_trace,
+    stack_mean_image,
+    sub_stack,
+    thorlabs_channels,
+)
 
 SEGMENT_COLORS = plt.cm.tab10.colors
 HANDLE_RADIUS = 14
@@ -34,6 +66,25 @@ MAX_EDIT_VERTICES = 64
 DEFAULT_STARTS = "896, 1050, 1205, 1359, 1513"
 DEFAULT_ACQ_FPS = 20.548
 DEFAULT_AVR = 4
+# Coarser display levels are built until the short image side drops below this size.
+DISPLAY_PYRAMID_MIN_SIZE = 256
+# Working precision of the per-pixel heatmap pipeline; ROI traces and fits stay float64.
+PRECISION_DTYPES = {"float32": np.float32, "float64": np.float64}
+DEFAULT_PRECISION = "float32"
+# How often the GUI checks a background heatmap computation for progress / results.
+HEATMAP_POLL_MS = 50
+# Heatmap results kept per parameter set: in memory, then spilled to <stack>_heatmap_cache/
+HEATMAP_CACHE_BYTES = 1024 * 1024 * 1024
+HEATMAP_DISK_CACHE_BYTES = 4 * 1024 * 1024 * 1024
+HEATMAP_CACHE_SUFFIX = "_heatmap_cache"
+HEATMAP_CACHE_VERSION = 1
+# Smoothed frames around segment windows, reused while only starts / extension / baseline change
+SMOOTHED_CACHE_BYTES = 1024 * 1024 * 1024
+# Progressive heatmap: area maps of spatially binned pixels shown before the full-resolution one
+HEATMAP_PREVIEW_BINS = (16, 8)
+HEATMAP_PREVIEW_MIN_SIZE = 16
+# Per-pixel maps the heatmap can show, all from the same pixel mean traces (see pixel_metric_maps)
+HEATMAP_METRICS = ("Area", "Peak", "Time to peak", "FWHM")
 ROI_QUANT_PICKLE_NAME = "ROI_quant pickle.pkl"
 
 QUANT_COLUMNS = [
@@ -57,12 +108,18 @@ QUANT_COLUMNS = [
     "Man. Adj.",
     "Marked events",
     "BC-corr. Norm-Trc",
+    "source frames",
+    "source crop",
 ]
 
 MARKED_EVENTS_COLUMN = "Marked events"
 BC_CORR_NORM_TRC_COLUMN = "BC-corr. Norm-Trc"
 FIT_PARAMS_COLUMN = "fit params"
 BC_AUTO_SHIFT_COLUMN = "BC auto shift"
+# "start:stop:bin" source frames behind a row's traces; its "starts" are source frame numbers
+SOURCE_FRAMES_COLUMN = "source frames"
+# "x,y,w,h" full-frame box behind a row's traces (the whole frame unless a crop was loaded)
+SOURCE_CROP_COLUMN = "source crop"
 
 
 def quant_pickle_path_for_stack(stack_path: str) -> Path:
@@ -125,6 +182,60 @@ def format_stack_size(width: int, height: int, n_frames: int) -> str:
     return f"{width}x{height}x{n_frames}"
 
 
+def parse_stack_size(text: str) -> tuple[int, int, int]:
+    parts = [p.strip() for p in str(text).lower().split("x")]
+    if len(parts) != 3:
+        raise ValueError(f"Invalid size field: {text!r}")
+    width, height, n_frames = (int(p) for p in parts)
+    return width, height, n_frames
+
+
+def format_source_frames(start: int, stop: int, bin_factor: int) -> str:
+    return f"{int(start)}:{int(stop)}:{int(bin_factor)}"
+
+
+def parse_source_frames(text) -> tuple[int, int, int]:
+    """``"start:stop:bin"`` -> (start, stop, bin); rows without the field map 1:1 from frame 0."""
+    if text is None or not str(text).strip():
+        return 0, -1, 1
+    parts = [p.strip() for p in str(text).split(":")]
+    if len(parts) != 3:
+        raise ValueError(f"Invalid source frames field: {text!r}")
+    start, stop, bin_factor = (int(p) for p in parts)
+    return start, stop, max(1, bin_factor)
+
+
+def format_source_crop(x: int, y: int, width: int, height: int) -> str:
+    return f"{int(x)},{int(y)},{int(width)},{int(height)}"
+
+
+def parse_source_crop(text) -> tuple[int, int, int, int]:
+    """``"x,y,w,h"`` -> (x, y, w, h); raises ``ValueError`` for a missing or malformed field."""
+    crop = parse_crop("" if text is None else str(text))
+    if crop is None:
+        raise ValueError("No source crop")
+    return crop
+
+
+def starts_to_source(starts: list[int], start: int, bin_factor: int) -> list[int]:
+    """Loaded (possibly partial / binned) frame numbers -> source frame numbers."""
+    return [start + int(frame) * bin_factor for frame in starts]
+
+
+def starts_from_source(starts: list[int], start: int, bin_factor: int, n_frames: int) -> list[int]:
+    """Source frame numbers -> loaded frame numbers; starts outside the loaded frames are dropped."""
+    frames = [(int(frame) - start) // bin_factor for frame in starts if int(frame) >= start]
+    frames = [frame for frame in frames if frame < n_frames]
+    return frames or [0]
+
+
+def row_trace_starts(row: dict, n_frames: int) -> list[int]:
+    """A row's starts in the frames of its own traces (see ``SOURCE_FRAMES_COLUMN``)."""
+    start, _stop, bin_factor = _parsed_or(parse_source_frames, row.get(SOURCE_FRAMES_COLUMN), (0, -1, 1))
+    source_starts = parse_start_frames(str(row.get("starts", "")), start + n_frames * bin_factor)
+    return starts_from_source(source_starts, start, bin_factor, n_frames)
+
+
 def parse_freq_avr_field(text: str) -> tuple[float, float]:
     parts = [p.strip() for p in str(text).split(",") if p.strip()]
     if len(parts) < 2:
@@ -556,7 +667,7 @@ def draw_row_event_spans(
         extension = int(float(row.get("extension", "50")))
     except (TypeError, ValueError):
         extension = 50
-    starts = parse_start_frames(str(row.get("starts", "")), n_frames)
+    starts = row_trace_starts(row, n_frames)
     for idx, start in enumerate(starts):
         if start + extension > n_frames:
             continue
@@ -876,41 +987,259 @@ def open_quant_pickle_inspector(
     window.protocol("WM_DELETE_WINDOW", on_close)
 
 
-def load_tif_stack(path: str) -> np.ndarray:
-    """Load a TIFF stack as (frames, height, width)."""
-    with tifffile.TiffFile(path) as tif:
-        stack = tif.asarray()
+# Bundle array name -> pickle column for the per-row trace columns
+QUANT_BUNDLE_TRACES = {
+    "roi_trc": "ROI trc",
+    "bg_trc": "BG trc",
+    "bleach_correct": "bleach correct",
+    "bc_baseline": "BC baseline",
+    "bc_corr_norm_trc": BC_CORR_NORM_TRC_COLUMN,
+}
 
-    if stack.ndim == 2:
-        stack = stack[np.newaxis, ...]
-    elif stack.ndim != 3:
-        raise ValueError(f"Expected 2D or 3D stack, got shape {stack.shape}")
 
-    return stack
+def _parsed_or(parse, value, default):
+    try:
+        return parse(value)
+    except (TypeError, ValueError, KeyError):
+        return default
 
 
-def compute_z_average(stack: np.ndarray) -> np.ndarray:
-    return stack.mean(axis=0)
+def quant_bundle_arrays(
+    store: dict,
+    area_map: np.ndarray | None = None,
+    area_map_size: str | None = None,
+    area_map_origin: tuple[int, int] = (0, 0),
+) -> dict:
+    """Quant-store rows as numeric columns (see quant_bundle.py); unparsable fields become NaN / -1."""
+    rows = store.get("rows", [])
 
+    def starts_of(text) -> list[int]:
+        return [int(float(p)) for p in str(text).replace(";", ",").split(",") if p.strip()]
+
+    freq_avr = [_parsed_or(parse_freq_avr_field, row.get("freq + avr"), (np.nan, np.nan)) for row in rows]
+    sg = [_parsed_or(parse_sg_field, row.get("SG window and order"), (-1, -1)) for row in rows]
+    area_lr = [_parsed_or(parse_area_lr_field, row.get("Area L+R"), (-1, -1)) for row in rows]
+    fit = [parse_fit_params(row.get(FIT_PARAMS_COLUMN)) for row in rows]
+
+    arrays = {
+        "directory": np.array([str(row.get("directory") or "") for row in rows], dtype=str),
+        "stack_size": np.array(
+            [_parsed_or(parse_stack_size, row.get("size"), (-1, -1, -1)) for row in rows], dtype=np.int64
+        ).reshape(-1, 3),
+        "acq_fps": np.array([value[0] for value in freq_avr], dtype=np.float64),
+        "avr_factor": np.array([value[1] for value in freq_avr], dtype=np.float64),
+        "sg_window": np.array([value[0] for value in sg], dtype=np.int64),
+        "sg_poly": np.array([value[1] for value in sg], dtype=np.int64),
+        "extension": np.array(
+            [_parsed_or(lambda v: int(float(v)), row.get("extension"), -1) for row in rows], dtype=np.int64
+        ),
+        "area_left": np.array([value[0] for value in area_lr], dtype=np.int64),
+        "area_right": np.array([value[1] for value in area_lr], dtype=np.int64),
+        "area": np.array([_parsed_or(float, row.get("Area"), np.nan) for row in rows], dtype=np.float64),
+        "man_adj": np.array([parse_man_adj(row.get("Man. Adj.")) for row in rows], dtype=np.float64),
+        "bc_auto_shift": np.array(
+            [parse_bc_auto_shift(row.get(BC_AUTO_SHIFT_COLUMN)) for row in rows], dtype=bool
+        ),
+        "fit_params": np.array(
+            [(np.nan,) * 5 if params is None else params for params in fit], dtype=np.float64
+        ).reshape(-1, 5),
+    }
+    arrays["source_frames"] = np.array(
+        [_parsed_or(parse_source_frames, row.get(SOURCE_FRAMES_COLUMN), (-1, -1, -1)) for row in rows],
+        dtype=np.int64,
+    ).reshape(-1, 3)
+    arrays["source_crop"] = np.array(
+        [_parsed_or(parse_source_crop, row.get(SOURCE_CROP_COLUMN), (-1, -1, -1, -1)) for row in rows],
+        dtype=np.int64,
+    ).reshape(-1, 4)
+    arrays["starts"], arrays["n_starts"] = pad_rows(
+        [_parsed_or(starts_of, row.get("starts"), []) for row in rows], fill=-1, dtype=np.int64
+    )
+    for name, column in (("roi_vertices", "ROI pixels"), ("bg_vertices", "BG pixels")):
+        arrays[name], arrays[f"n_{name}"] = pad_rows(
+            [row.get(column) for row in rows], inner_shape=(2,)
+        )
+    for name, column in QUANT_BUNDLE_TRACES.items():
+        arrays[name], arrays[f"n_{name}"] = pad_rows([row.get(column) for row in rows])
+    arrays["max_vals"], arrays["n_max_vals"] = pad_rows([row.get("max vals") for row in rows])
+    arrays["marked_events"], arrays["n_marked_events"] = pad_rows(
+        [parse_marked_events(row.get(MARKED_EVENTS_COLUMN)) for row in rows],
+        fill=-1,
+        dtype=np.int64,
+        inner_shape=(2,),
+    )
+    if area_map is not None:
+        arrays["area_map"] = np.asarray(area_map, dtype=np.float64)
+        arrays["area_map_stack_size"] = np.array(
+            _parsed_or(parse_stack_size, area_map_size, (-1, -1, -1)), dtype=np.int64
+        )
+        arrays["area_map_origin"] = np.array(area_map_origin, dtype=np.int64)
+    return arrays
+
+
+def export_quant_bundle(
+    pickle_path: str | Path,
+    out_path: str | Path | None = None,
+    **area_map_fields,
+) -> Path:
+    """Write the pickle's rows as a ``ROI_quant bundle.npz`` (next to the pickle by default)."""
+    pickle_path = Path(pickle_path)
+    out_path = pickle_path.with_name(QUANT_BUNDLE_NAME) if out_path is None else Path(out_path)
+    save_quant_bundle(out_path, quant_bundle_arrays(load_quant_store(pickle_path), **area_map_fields))
+    return out_path
+
+
+def load_tif_stack(
+    path: str,
+    channel: str | None = None,
+    bin_factor: int = 1,
+    crop: tuple[int, int, int, int] | None = None,
+    frames: tuple[int, int] | None = None,
+) -> LazyStack:
+    """Open a TIFF stack (or Thorlabs per-frame folder) lazily as (frames, height, width).
+
+    ``crop`` (x, y, w, h) and ``frames`` (start, stop) restrict the load to a box
+    and a source frame range. With ``bin_factor`` > 1, the selected frames are
+    streamed as means over ``bin_factor`` source frames.
+    """
+    return bin_stack(sub_stack(open_tif_stack(path, channel), frames, crop), bin_factor)
+
+
+def parse_partial_load(text: str) -> tuple[tuple[int, int, int, int] | None, tuple[int, int] | None]:
+    """``"x,y,w,h; start:stop"`` (either part optional) -> (crop, frames)."""
+    crop = frames = None
+    for part in (p.strip() for p in str(text).split(";")):
+        if not part:
+            continue
+        if ":" in part:
+            frames = parse_frame_range(part)
+        else:
+            crop = parse_crop(part)
+    return crop, frames
+
+
+def compute_z_average(stack) -> np.ndarray:
+    return stack_mean_image(stack)
 
-def compute_raw_trace(stack: np.ndarray, mask: np.ndarray | None) -> np.ndarray | None:
+
+def compute_raw_trace(stack, mask: np.ndarray | None) -> np.ndarray | None:
     if mask is None or not np.any(mask):
         return None
 
-    return stack[:, mask].mean(axis=1)
+    return stack_masked_mean_trace(stack, mask)
 
 
-def apply_savgol(trace: np.ndarray, window: int, polyorder: int, axis: int = 0) -> np.ndarray:
+def savgol_params(length: int, window: int, polyorder: int) -> tuple[int, int] | None:
+    """Window and order ``apply_savgol`` uses on ``length`` samples; None means no smoothing."""
     window = int(window)
     if window % 2 == 0:
         window += 1
-    length = trace.shape[axis]
     max_window = length - 1 if length % 2 == 0 else length
     window = max(3, min(window, max_window))
     polyorder = min(int(polyorder), window - 1)
     if window < 3 or polyorder < 1:
+        return None
+    return window, polyorder
+
+
+def apply_savgol(trace: np.ndarray, window: int, polyorder: int, axis: int = 0) -> np.ndarray:
+    params = savgol_params(trace.shape[axis], window, polyorder)
+    if params is None:
         return trace.copy()
-    return savgol_filter(trace, window_length=window, polyorder=polyorder, axis=axis)
+    return savgol_filter(trace, window_length=params[0], polyorder=params[1], axis=axis)
+
+
+def savgol_chunks(length: int, intervals: list[tuple[int, int]], window: int) -> list[tuple[int, int]]:
+    """Merged frame ranges whose Savitzky-Golay output matches full-length smoothing on ``intervals``.
+
+    Each interval gets half a window of context on both sides. Near either end
+    of the recording, savgol_filter fits a polynomial to the outermost
+    ``window`` samples, so an interval within half a window of an end extends
+    to that end and spans at least one full window.
+    """
+    half = window // 2
+    expanded = []
+    for start, stop in intervals:
+        lo, hi = start - half, stop + half
+        if lo <= 0:
+            lo, hi = 0, max(hi, window)
+        if hi >= length:
+            lo, hi = min(lo, length - window), length
+        expanded.append((max(0, lo), min(length, hi)))
+    chunks: list[tuple[int, int]] = []
+    for lo, hi in sorted(expanded):
+        if chunks and lo <= chunks[-1][1]:
+            chunks[-1] = (chunks[-1][0], max(chunks[-1][1], hi))
+        else:
+            chunks.append((lo, hi))
+    return chunks
+
+
+class CumulativeArea:
+    """Cumulative trapezoid of ``mean_values - baseline_level`` over ``rel_x``, per column.
+
+    Built once per pixel-trace cache; ``area(f_left, f_right)`` then costs two
+    table rows plus the fractional end pieces, instead of a trapezoid over the
+    whole window. Results match ``trapezoid`` over the samples in
+    ``[f_left, f_right]`` with linearly interpolated (edge-clamped) end points;
+    a column is NaN when any sample the integral touches is NaN.
+    """
+
+    def __init__(self, rel_x: np.ndarray, mean_values: np.ndarray, baseline_level: float = 1.0) -> None:
+        self.x = np.asarray(rel_x, dtype=np.float64)
+        self.source = mean_values
+        self.values = mean_values.reshape(mean_values.shape[0], -1)
+        self.baseline_level = float(baseline_level)
+        dtype = np.result_type(self.values.dtype, np.float32)
+        self.table = np.zeros(self.values.shape, dtype=dtype)
+        self.nan_prefix: np.ndarray | None = None
+        if len(self.x) < 2:
+            return
+        widths = np.diff(self.x).astype(dtype)[:, np.newaxis]
+        pieces = np.add(self.values[1:], self.values[:-1], dtype=dtype)
+        pieces -= 2 * self.baseline_level
+        pieces *= widths / 2
+        nan_pieces = np.isnan(pieces)
+        if nan_pieces.any():
+            pieces[nan_pieces] = 0
+            self.nan_prefix = np.zeros(self.values.shape, dtype=np.int32)
+            for index, piece in enumerate(nan_pieces, start=1):
+                np.add(self.nan_prefix[index - 1], piece, out=self.nan_prefix[index])
+        # Row-by-row running sum: contiguous rows are much faster than cumsum(axis=0).
+        for index, piece in enumerate(pieces, start=1):
+            np.add(self.table[index - 1], piece, out=self.table[index])
+
+    def _row(self, index: int) -> np.ndarray:
+        return self.values[index].astype(np.float64) - self.baseline_level
+
+    def _value_at(self, frame: float) -> np.ndarray:
+        x = self.x
+        if frame <= x[0]:
+            return self._row(0)
+        if frame >= x[-1]:
+            return self._row(len(x) - 1)
+        index = int(np.searchsorted(x, frame, side="right")) - 1
+        fraction = (frame - x[index]) / (x[index + 1] - x[index])
+        left = self._row(index)
+        return left + fraction * (self._row(index + 1) - left)
+
+    def area(self, f_left: float, f_right: float) -> np.ndarray:
+        if f_right < f_left:
+            f_left, f_right = f_right, f_left
+        x = self.x
+        first = int(np.searchsorted(x, f_left, side="left"))
+        last = int(np.searchsorted(x, f_right, side="right")) - 1
+        if first > last:
+            return np.zeros(self.values.shape[1], dtype=np.float64)
+
+        areas = self.table[last].astype(np.float64) - self.table[first]
+        if self.nan_prefix is not None:
+            areas[self.nan_prefix[last] != self.nan_prefix[first]] = np.nan
+        if f_left < x[first]:
+            areas += (x[first] - f_left) * (self._value_at(f_left) + self._row(first)) / 2
+        if f_right > x[last]:
+            areas += (f_right - x[last]) * (self._row(last) + self._value_at(f_right)) / 2
+        return areas
 
 
 def compute_area_from_mean_trace(
@@ -921,94 +1250,634 @@ def compute_area_from_mean_trace(
     baseline_level: float = 1.0,
 ) -> np.ndarray | float:
     """Integrate (mean - baseline) over relative frames. Supports 1D or 2D mean_values."""
-    if f_right < f_left:
-        f_left, f_right = f_right, f_left
-
     squeeze = mean_values.ndim == 1
     if squeeze:
         mean_values = mean_values[:, np.newaxis]
-
-    frames = rel_x.astype(float)
-    values = mean_values - baseline_level
-    overlap = (frames >= f_left) & (frames <= f_right)
-    if not np.any(overlap):
-        result = np.zeros(mean_values.shape[1], dtype=np.float64)
-        return float(result[0]) if squeeze else result
-
-    x = frames[overlap]
-    y = values[overlap, :]
-
-    if f_left < x[0]:
-        y0 = np.array([np.interp(f_left, frames, values[:, col]) for col in range(values.shape[1])])
-        x = np.concatenate([[f_left], x])
-        y = np.concatenate([y0[np.newaxis, :], y], axis=0)
-    if f_right > x[-1]:
-        y1 = np.array([np.interp(f_right, frames, values[:, col]) for col in range(values.shape[1])])
-        x = np.concatenate([x, [f_right]])
-        y = np.concatenate([y, y1[np.newaxis, :]], axis=0)
-
-    areas = trapezoid(y, x, axis=0)
+    areas = CumulativeArea(rel_x, mean_values, baseline_level).area(f_left, f_right)
     return float(areas[0]) if squeeze else areas
 
 
+def pixel_metric_maps(
+    rel_x: np.ndarray,
+    mean_values: np.ndarray,
+    f_left: int,
+    f_right: int,
+    onset: float = 0.0,
+    baseline_level: float = 1.0,
+    area_table: CumulativeArea | None = None,
+) -> dict[str, np.ndarray]:
+    """Per-column maps of every entry in ``HEATMAP_METRICS`` over relative frames ``[f_left, f_right]``.
+
+    One vectorized pass over the window of ``mean_values - baseline_level``:
+    "Peak" is its largest value, "Time to peak" the frame of that value minus
+    ``onset``, and "FWHM" the width in frames of the run around the peak that
+    stays at or above half of it (crossings interpolated linearly, cut at the
+    window edges; NaN unless the peak is positive). "Area" is
+    ``compute_area_from_mean_trace``, taken from ``area_table`` when given.
+    All-NaN columns are NaN in every map but "Area".
+    """
+    values = mean_values.reshape(mean_values.shape[0], -1)
+    if area_table is None:
+        area_table = CumulativeArea(rel_x, values, baseline_level)
+    if f_right < f_left:
+        f_left, f_right = f_right, f_left
+    n_pixels = values.shape[1]
+    maps = {"Area": area_table.area(f_left, f_right)}
+    x = np.asarray(rel_x, dtype=np.float64)
+    first = int(np.searchsorted(x, f_left, side="left"))
+    last = int(np.searchsorted(x, f_right, side="right")) - 1
+    if first > last:
+        maps.update({name: np.full(n_pixels, np.nan) for name in HEATMAP_METRICS if name != "Area"})
+        return maps
+
+    wx = x[first : last + 1]
+    y = values[first : last + 1] - np.asarray(baseline_level, dtype=values.dtype)
+    columns = np.arange(n_pixels)
+    valid = ~np.isnan(y)
+    has_value = valid.any(axis=0)
+    peak_index = np.argmax(np.where(valid, y, -np.inf), axis=0).astype(np.int32)
+    peak = np.where(has_value, y[peak_index, columns], np.nan).astype(np.float64)
+    half = (peak / 2).astype(y.dtype)
+
+    # Last frame below half before the peak and first one after it (NaN counts as below)
+    index = np.arange(len(wx), dtype=np.int32)[:, np.newaxis]
+    below = ~(y >= half)
+    left = np.where(below & (index < peak_index), index, -1).max(axis=0)
+    right = np.where(below & (index > peak_index), index, len(wx)).min(axis=0)
+    del below
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        k = np.clip(left, 0, len(wx) - 2) if len(wx) > 1 else np.zeros_like(left)
+        k1 = np.minimum(k + 1, len(wx) - 1)
+        y0, y1 = y[k, columns].astype(np.float64), y[k1, columns].astype(np.float64)
+        fraction = np.nan_to_num(np.clip((peak / 2 - y0) / (y1 - y0), 0, 1), nan=1.0)
+        left_x = np.where(left < 0, wx[0], wx[k] + fraction * (wx[k1] - wx[k]))
+
+        k = np.clip(right, 1, len(wx) - 1) if len(wx) > 1 else np.zeros_like(right)
+        k0 = np.maximum(k - 1, 0)
+        y0, y1 = y[k0, columns].astype(np.float64), y[k, columns].astype(np.float64)
+        fraction = np.nan_to_num(np.clip((y0 - peak / 2) / (y0 - y1), 0, 1), nan=0.0)
+        right_x = np.where(right >= len(wx), wx[-1], wx[k0] + fraction * (wx[k] - wx[k0]))
+
+    maps["Peak"] = peak
+    maps["Time to peak"] = np.where(has_value, wx[peak_index] - onset, np.nan)
+    maps["FWHM"] = np.where(peak > 0, right_x - left_x, np.nan)
+    return maps
+
+
+class HeatmapCancelled(Exception):
+    """Raised by ``compute_all_pixel_mean_traces`` when its ``cancel`` event is set."""
+
+
 def compute_all_pixel_mean_traces(
-    stack: np.ndarray,
+    stack,
     starts: list[int],
     extension: int,
     window: int,
     polyorder: int,
     baseline_fraction: float = 0.2,
     progress: Callable[[str, float], None] | None = None,
+    dtype=np.float32,
+    cancel: threading.Event | None = None,
+    workers: int = 1,
+    smoothed_cache: SmoothedFrameCache | None = None,
+    build_tiles: bool = False,
+    pool: BoxPool | None = None,
 ) -> tuple[np.ndarray, np.ndarray] | None:
-    """Return relative x axis and mean normalized traces with shape (total_len, H, W)."""
+    """Return relative x axis and mean normalized traces with shape (total_len, H, W).
+
+    The stack is processed in row bands so only one band of pixel time series is
+    held in memory at a time. Large lazy stacks are read through their time-major
+    pixel-tile sidecar when it exists, or after building it with ``build_tiles``. Only the frames around the
+    segment windows are read and smoothed (see ``savgol_chunks``); the result is
+    the same as smoothing every full pixel trace. Pixels are smoothed and
+    averaged in ``dtype`` (float32 by default, half the memory of float64).
+    Setting ``cancel`` aborts the computation with ``HeatmapCancelled`` at the
+    next progress report or chunk read. With a ``pool`` (or ``workers`` > 1, for
+    a pool closed afterwards), the tile-sized pixel boxes of jobs big enough to
+    gain from it are processed on worker processes (see pixel_engine.py) that
+    read the pixel-tile sidecar or a shared-memory copy of a small stack; the
+    result is identical to the single-process one. With ``smoothed_cache``, the smoothed
+    segment windows are kept per SG setting, so later calls that only change
+    starts, extension or baseline fraction smooth just the frames not yet
+    cached (when the windows fit the cache budget).
+    """
+    if pool is None and workers > 1:
+        pool = BoxPool(workers)
+        try:
+            return compute_all_pixel_mean_traces(
+                stack,
+                starts,
+                extension,
+                window,
+                polyorder,
+                baseline_fraction,
+                progress,
+                dtype,
+                cancel,
+                smoothed_cache=smoothed_cache,
+                build_tiles=build_tiles,
+                pool=pool,
+            )
+        finally:
+            pool.close()
     n_frames, height, width = stack.shape
-    n_pixels = height * width
-    pixels = stack.reshape(n_frames, -1).astype(np.float64)
 
     def report(stage: str, fraction: float) -> None:
+        if cancel is not None and cancel.is_set():
+            raise HeatmapCancelled
         if progress is not None:
             progress(stage, fraction)
 
-    report("Preparing stack", 0.0)
-    chunk_size = max(4096, n_pixels // 40)
-    smooth = np.empty_like(pixels)
-
-    for col_start in range(0, n_pixels, chunk_size):
-        col_end = min(col_start + chunk_size, n_pixels)
-        smooth[:, col_start:col_end] = apply_savgol(
-            pixels[:, col_start:col_end], window, polyorder, axis=0
-        )
-        report("Smoothing pixels", 0.05 + 0.50 * (col_end / n_pixels))
-
     baseline_len, total_len, rel_x = segment_geometry(extension, baseline_fraction)
     valid_starts = [start for start in starts if start + extension <= n_frames]
     if not valid_starts:
         return None
 
-    aligned_segments: list[np.ndarray] = []
-    n_starts = len(valid_starts)
-    for idx, start in enumerate(valid_starts):
-        seg_start = max(0, start - baseline_len)
-        raw = smooth[seg_start : start + extension, :]
-        available_baseline = start - seg_start
-        baseline_mean = raw[:available_baseline, :].mean(axis=0)
-        baseline_mean = np.where(baseline_mean == 0, 1.0, baseline_mean)
+    report("Preparing stack", 0.0)
+    tiles = cached_pixel_tiles(
+        stack, build=build_tiles, progress=lambda fraction: report("Building pixel tiles", fraction)
+    )
+    dtype = np.dtype(dtype)
+    # Smoothing parameters are clamped on the full recording length, as apply_savgol would
+    params = savgol_params(n_frames, window, polyorder)
+    sg_window = params[0] if params is not None else 1
+    intervals = [(max(0, start - baseline_len), start + extension) for start in valid_starts]
+    plan = {
+        "chunks": savgol_chunks(n_frames, intervals, sg_window),
+        "savgol": params,
+        "segments": [(start, lo, hi) for start, (lo, hi) in zip(valid_starts, intervals)],
+        "baseline_len": baseline_len,
+        "total_len": total_len,
+        "dtype": dtype,
+    }
+    windows = savgol_chunks(n_frames, intervals, 1)  # merged segment windows, no smoothing context
+    window_bytes = sum(hi - lo for lo, hi in windows) * height * width * dtype.itemsize
+    if smoothed_cache is None or window_bytes > smoothed_cache.budget_bytes:
+        mean_trace = _run_pixel_plan(stack, plan, tiles, pool, report, cancel)
+        report("Averaging segments", 0.95)
+        report("Pixel traces ready", 1.0)
+        return rel_x, mean_trace
+
+    setting = (params, dtype.str)
+    pieces = smoothed_cache.blocks(setting, windows)
+    missing = uncovered_ranges(windows, pieces)
+    if missing:
+        keep_plan = dict(plan, chunks=savgol_chunks(n_frames, missing, sg_window), keep=missing)
+        smoothed = _run_pixel_plan(stack, keep_plan, tiles, pool, report, cancel)
+        offset = 0
+        for lo, hi in missing:
+            block = smoothed[offset : offset + hi - lo]
+            offset += hi - lo
+            pieces.append((lo, block))
+            smoothed_cache.add(setting, lo, block)
+    report("Building segments", 0.92)
+    window_frames = [assemble_frames(lo, hi, pieces).reshape(hi - lo, -1) for lo, hi in windows]
+    mean_trace = segment_mean_traces(window_frames, dict(plan, chunks=windows))
+    report("Averaging segments", 0.95)
+    report("Pixel traces ready", 1.0)
+    return rel_x, mean_trace.reshape(total_len, height, width)
+
+
+def _run_pixel_plan(stack, plan: dict, tiles, pool: BoxPool | None, report, cancel) -> np.ndarray:
+    """Run the plan's box kernel over every pixel: (frames, H, W), on the pool when it pays off."""
+    height, width = stack.shape[1:]
+    dtype = plan["dtype"]
+    kernel = box_kernel(plan)
+    chunk_frames = sum(hi - lo for lo, hi in plan["chunks"])
+
+    def check() -> None:
+        if cancel is not None and cancel.is_set():
+            raise HeatmapCancelled
+
+    source = None
+    if pool is not None:
+        # Tile-sized boxes for the pool, each small enough that all workers together stay within one block
+        tile = tiles.tile if tiles is not None else PIXEL_TILE_SIZE
+        boxes = [
+            (row_start, row_end, col_start, min(col_start + tile, width))
+            for row_start, row_end in row_bands(
+                stack,
+                n_columns=tile,
+                block_bytes=DEFAULT_BLOCK_BYTES // pool.workers,
+                align=tile,
+                itemsize=dtype.itemsize,
+                n_frames=chunk_frames,
+            )
+            for col_start in range(0, width, tile)
+        ]
+        if pool.worth_using(len(boxes), chunk_frames * height * width):
+            source = pool.source_for(stack)
+    if source is not None:
+        output = SharedArray((plan_output_frames(plan), height, width), dtype)
+        try:
+            pool.run(
+                source,
+                output,
+                boxes,
+                plan,
+                on_done=lambda fraction: report("Smoothing pixels", 0.02 + 0.9 * fraction),
+            )
+            return output.array.copy()
+        finally:
+            output.close()
+            output.unlink()
+
+    result = np.empty((plan_output_frames(plan), height, width), dtype=dtype)
+    bands = row_bands(
+        stack,
+        align=tiles.tile if tiles is not None else 1,
+        itemsize=dtype.itemsize,
+        n_frames=chunk_frames,
+    )
+    for band_index, (row_start, row_end) in enumerate(bands):
+        result[:, row_start:row_end, :] = kernel(stack, row_start, row_end, 0, width, plan, check)
+        report("Smoothing pixels", 0.02 + 0.9 * (band_index + 1) / len(bands))
+    return result
+
+
+class SmoothedFrameCache:
+    """Byte-budgeted LRU of Savitzky-Golay smoothed frame blocks, per smoothing setting.
+
+    Smoothed frames depend only on the stack and the ``(window, polyorder)`` /
+    dtype setting, not on starts, extension or baseline fraction; edits to
+    those reuse the cached blocks and only redo segment alignment and
+    averaging. Blocks are ``(frames, H, W)`` arrays stored by first frame.
+    Safe to share between the GUI and a heatmap worker thread.
+    """
+
+    def __init__(self, budget_bytes: int = SMOOTHED_CACHE_BYTES) -> None:
+        self.budget_bytes = max(1, int(budget_bytes))
+        self._blocks: OrderedDict[tuple, np.ndarray] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def blocks(self, setting: tuple, intervals: list[tuple[int, int]]) -> list[tuple[int, np.ndarray]]:
+        """``(first frame, block)`` for the cached blocks of ``setting`` overlapping ``intervals``."""
+        found = []
+        with self._lock:
+            for key, block in list(self._blocks.items()):
+                block_setting, lo = key
+                hi = lo + len(block)
+                if block_setting == setting and any(lo < stop and start < hi for start, stop in intervals):
+                    self._blocks.move_to_end(key)
+                    found.append((lo, block))
+        return found
+
+    def has_setting(self, setting: tuple) -> bool:
+        with self._lock:
+            return any(block_setting == setting for block_setting, _lo in self._blocks)
+
+    def add(self, setting: tuple, lo: int, block: np.ndarray) -> None:
+        with self._lock:
+            key = (setting, int(lo))
+            if key in self._blocks:
+                self._bytes -= self._blocks.pop(key).nbytes
+            self._blocks[key] = block
+            self._bytes += block.nbytes
+            while self._bytes > self.budget_bytes and len(self._blocks) > 1:
+                _old_key, old = self._blocks.popitem(last=False)
+                self._bytes -= old.nbytes
 
-        aligned = np.full((total_len, raw.shape[1]), np.nan, dtype=np.float64)
-        offset = baseline_len - available_baseline
-        aligned[offset : offset + raw.shape[0], :] = raw / baseline_mean[np.newaxis, :]
-        aligned_segments.append(aligned)
-        report("Building segments", 0.55 + 0.35 * ((idx + 1) / n_starts))
+    def clear(self) -> None:
+        with self._lock:
+            self._blocks.clear()
+            self._bytes = 0
+
+
+def uncovered_ranges(
+    intervals: list[tuple[int, int]], pieces: list[tuple[int, np.ndarray]]
+) -> list[tuple[int, int]]:
+    """Frame ranges of ``intervals`` not covered by any ``(first frame, block)`` piece."""
+    ranges = []
+    for start, stop in intervals:
+        covered = np.zeros(stop - start, dtype=bool)
+        for lo, block in pieces:
+            covered[max(lo, start) - start : max(min(lo + len(block), stop) - start, 0)] = True
+        edges = np.flatnonzero(np.diff(np.concatenate(([True], covered, [True])).astype(np.int8)))
+        ranges.extend((start + int(a), start + int(b)) for a, b in zip(edges[::2], edges[1::2]))
+    return ranges
+
+
+def assemble_frames(start: int, stop: int, pieces: list[tuple[int, np.ndarray]]) -> np.ndarray:
+    """Frames ``[start, stop)`` from ``(first frame, block)`` pieces that together cover them."""
+    for lo, block in pieces:
+        if lo <= start and stop <= lo + len(block):
+            return block[start - lo : stop - lo]
+    first = pieces[0][1]
+    frames = np.empty((stop - start, *first.shape[1:]), dtype=first.dtype)
+    for lo, block in pieces:
+        a, b = max(lo, start), min(lo + len(block), stop)
+        if a < b:
+            frames[a - start : b - start] = block[a - lo : b - lo]
+    return frames
+
+
+class HeatmapJob:
+    """One background heatmap computation for a fixed parameter set.
+
+    The worker thread only writes ``progress``, ``preview``, ``result`` and
+    ``error``; the GUI polls them and sets ``cancel`` when the parameters change
+    underneath. With ``preview_bins``, ``metric`` maps of every factor-th pixel
+    (``PixelStridedStack``, which reads only those pixels) are published in turn
+    as ``preview`` = (factor, full-size map) before the full-resolution
+    computation; they are skipped when smoothed frames for the setting are
+    already cached (the full map is then quick anyway). With ``build_tiles``, a
+    missing pixel-tile sidecar is written by the full-resolution pass, after the
+    previews. With ``cache``, the job does the heatmap cache's disk work: it
+    writes pending spills, restores the entry for its parameters from disk
+    (skipping the computation) and stores its result.
+    """
 
-    report("Averaging segments", 0.92)
-    mean_trace = np.nanmean(np.stack(aligned_segments, axis=0), axis=0)
-    mean_trace = mean_trace.reshape(total_len, height, width)
-    report("Pixel traces ready", 1.0)
-    return rel_x, mean_trace
+    def __init__(
+        self,
+        stack,
+        params: tuple,
+        area_window: tuple[int, int],
+        dtype,
+        pool: BoxPool | None = None,
+        smoothed_cache: SmoothedFrameCache | None = None,
+        preview_bins: tuple[int, ...] = (),
+        metric: str = "Area",
+        build_tiles: bool = False,
+        cache: "HeatmapCache | None" = None,
+    ) -> None:
+        self.stack = stack
+        self.params = params
+        self.area_window = area_window
+        self.dtype = dtype
+        self.pool = pool
+        self.smoothed_cache = smoothed_cache
+        self.preview_bins = preview_bins
+        self.metric = metric
+        self.build_tiles = build_tiles
+        self.cache = cache
+        self.preview: tuple[int, np.ndarray] | None = None
+        self.cancel = threading.Event()
+        self.progress: tuple[str, float] = ("Starting", 0.0)
+        # (rel_x, mean_trace, area table, area map for area_window), or None without valid segments
+        self.result: tuple | None = None
+        self.error: Exception | None = None
+        self.thread = threading.Thread(target=self._run, name="heatmap", daemon=True)
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def done(self) -> bool:
+        return not self.thread.is_alive()
+
+    def _report(self, stage: str, fraction: float) -> None:
+        if self.cancel.is_set():
+            raise HeatmapCancelled
+        self.progress = (stage, fraction)
+
+    def _previews_wanted(self) -> bool:
+        if not self.preview_bins:
+            return False
+        if self.smoothed_cache is None:
+            return True
+        _starts, window, poly, _extension, _baseline_fraction = self.params
+        setting = (savgol_params(self.stack.shape[0], window, poly), np.dtype(self.dtype).str)
+        return not self.smoothed_cache.has_setting(setting)
+
+    def _run_preview(self, factor: int) -> None:
+        starts, window, poly, extension, baseline_fraction = self.params
+        height, width = self.stack.shape[1:]
+        if min(height, width) // factor < HEATMAP_PREVIEW_MIN_SIZE:
+            return
+        traces = compute_all_pixel_mean_traces(
+            PixelStridedStack(self.stack, factor),
+            list(starts),
+            extension,
+            window,
+            poly,
+            baseline_fraction,
+            progress=lambda stage, fraction: self._report(f"Preview {factor}×{factor}: {stage}", fraction),
+            dtype=self.dtype,
+            cancel=self.cancel,
+        )
+        if traces is None:
+            return
+        rel_x, mean_trace = traces
+        if self.metric == "Area":
+            small = CumulativeArea(rel_x, mean_trace).area(*self.area_window)
+        else:
+            onset = segment_geometry(extension, baseline_fraction)[0] + 1
+            small = pixel_metric_maps(rel_x, mean_trace, *self.area_window, onset=onset)[self.metric]
+        small = small.reshape(mean_trace.shape[1:])
+        full = np.repeat(np.repeat(small, factor, axis=0), factor, axis=1)
+        full = np.pad(full, ((0, height - full.shape[0]), (0, width - full.shape[1])), mode="edge")
+        self.preview = (factor, full)
+
+    def _run(self) -> None:
+        starts, window, poly, extension, baseline_fraction = self.params
+        key = heatmap_cache_key(self.params, self.dtype)
+        try:
+            if self.cache is not None:
+                self.cache.flush_spills()
+                self._report("Checking heatmap cache", 0.0)
+                cached = self.cache.get(key)
+                if cached is not None:
+                    rel_x, mean_trace, table = cached
+                    area_map = table.area(*self.area_window).reshape(mean_trace.shape[1:])
+                    self.result = (rel_x, mean_trace, table, area_map)
+                    return
+            if self._previews_wanted():
+                for factor in self.preview_bins:
+                    self._run_preview(factor)
+            traces = compute_all_pixel_mean_traces(
+                self.stack,
+                list(starts),
+                extension,
+                window,
+                poly,
+                baseline_fraction,
+                progress=self._report,
+                dtype=self.dtype,
+                cancel=self.cancel,
+                smoothed_cache=self.smoothed_cache,
+                pool=self.pool,
+                build_tiles=self.build_tiles,
+            )
+            if traces is None or self.cancel.is_set():
+                return
+            rel_x, mean_trace = traces
+            self._report("Integrating area map", 0.96)
+            table = CumulativeArea(rel_x, mean_trace)
+            area_map = table.area(*self.area_window).reshape(mean_trace.shape[1:])
+            self.result = (rel_x, mean_trace, table, area_map)
+            if self.cache is not None:
+                self.cache.put(key, rel_x, mean_trace, table)
+                self.cache.flush_spills()
+        except HeatmapCancelled:
+            pass
+        except Exception as exc:
+            self.error = exc
+
+
+def heatmap_cache_key(params: tuple, dtype) -> tuple:
+    """``HeatmapCache`` key: the compute parameters plus the working precision's name."""
+    return (*params, np.dtype(dtype).name)
+
+
+def heatmap_cache_dir_for_stack(stack_path: str | Path) -> Path:
+    path = Path(stack_path).resolve()
+    return path.with_name(f"{path.stem}{HEATMAP_CACHE_SUFFIX}")
+
+
+class HeatmapCache:
+    """Byte-budgeted LRU of pixel mean traces per heatmap parameter set, with a disk spill.
+
+    Entries are ``(rel_x, mean_trace, area table)`` keyed by the parameter tuple.
+    With ``spill``, entries evicted from memory are written uncompressed to
+    ``<stack>_heatmap_cache/`` and reloaded on a later miss; files are tagged
+    with the stack's file key, so a changed stack never matches, and the oldest
+    files are pruned beyond ``disk_budget_bytes``.
+
+    Disk work stays off the GUI thread: ``peek`` checks memory only, ``put``
+    queues evicted entries, and ``get`` (disk restore) and ``flush_spills`` are
+    called from ``HeatmapJob``. The entry lists are guarded by a lock.
+    """
+
+    def __init__(
+        self,
+        stack,
+        budget_bytes: int = HEATMAP_CACHE_BYTES,
+        spill: bool = True,
+        disk_budget_bytes: int = HEATMAP_DISK_CACHE_BYTES,
+    ) -> None:
+        self.budget_bytes = max(1, int(budget_bytes))
+        self.disk_budget_bytes = int(disk_budget_bytes)
+        self._entries: OrderedDict[tuple, tuple] = OrderedDict()
+        self._bytes = 0
+        # Evicted entries waiting for flush_spills
+        self._pending: OrderedDict[tuple, tuple] = OrderedDict()
+        self._lock = threading.Lock()
+        self.directory: Path | None = None
+        self._stack_key: dict | None = None
+        if spill and isinstance(stack, LazyStack):
+            try:
+                self._stack_key = {"file": stack.file_key(), "shape": [int(n) for n in stack.shape]}
+                self.directory = heatmap_cache_dir_for_stack(stack.path)
+            except OSError:
+                self.directory = None
+
+    @staticmethod
+    def _entry_bytes(entry: tuple) -> int:
+        _rel_x, mean_trace, table = entry
+        nan_bytes = table.nan_prefix.nbytes if table.nan_prefix is not None else 0
+        return mean_trace.nbytes + table.table.nbytes + nan_bytes
+
+    def _file_key(self, params: tuple) -> str:
+        return json.dumps({"version": HEATMAP_CACHE_VERSION, "stack": self._stack_key, "params": params})
+
+    def _file_path(self, params: tuple) -> Path:
+        digest = hashlib.sha1(self._file_key(params).encode("utf-8")).hexdigest()[:20]
+        return self.directory / f"{digest}.npz"
+
+    def peek(self, params: tuple) -> tuple | None:
+        """The in-memory entry for ``params``, without touching the disk."""
+        with self._lock:
+            entry = self._entries.get(params)
+            if entry is not None:
+                self._entries.move_to_end(params)
+            return entry
+
+    def get(self, params: tuple) -> tuple | None:
+        """Memory, then the spill queue, then disk; a restored entry moves back into memory."""
+        entry = self.peek(params)
+        if entry is not None:
+            return entry
+        with self._lock:
+            entry = self._pending.pop(params, None)
+        if entry is None:
+            entry = self._load(params)
+        return None if entry is None else self.put(params, *entry)
+
+    def put(
+        self,
+        params: tuple,
+        rel_x: np.ndarray,
+        mean_trace: np.ndarray,
+        table: CumulativeArea | None = None,
+    ) -> tuple:
+        """Store an entry (building its area table when not given) and return it."""
+        if table is None or table.source is not mean_trace:
+            table = CumulativeArea(rel_x, mean_trace)
+        entry = (rel_x, mean_trace, table)
+        with self._lock:
+            if params in self._entries:
+                self._bytes -= self._entry_bytes(self._entries.pop(params))
+            self._pending.pop(params, None)
+            self._entries[params] = entry
+            self._bytes += self._entry_bytes(entry)
+            while self._bytes > self.budget_bytes and len(self._entries) > 1:
+                old_params, old = self._entries.popitem(last=False)
+                self._bytes -= self._entry_bytes(old)
+                if self.directory is not None:
+                    self._pending[old_params] = old
+        return entry
+
+    def flush_spills(self) -> None:
+        """Write the entries evicted since the last call to disk."""
+        while True:
+            with self._lock:
+                if not self._pending:
+                    return
+                params, entry = self._pending.popitem(last=False)
+            self._spill(params, entry)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._pending.clear()
+            self._bytes = 0
+
+    def _load(self, params: tuple) -> tuple | None:
+        if self.directory is None:
+            return None
+        path = self._file_path(params)
+        if not path.is_file():
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if str(data["key"]) != self._file_key(params):
+                    return None
+                rel_x = np.array(data["rel_x"])
+                mean_trace = np.array(data["mean_trace"])
+        except (OSError, KeyError, ValueError):
+            return None
+        os.utime(path)
+        return rel_x, mean_trace, CumulativeArea(rel_x, mean_trace)
+
+    def _spill(self, params: tuple, entry: tuple) -> None:
+        if self.directory is None:
+            return
+        path = self._file_path(params)
+        if path.is_file():
+            return
+        rel_x, mean_trace, _table = entry
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(path.name + ".tmp")
+            with tmp_path.open("wb") as handle:
+                np.savez(handle, key=np.str_(self._file_key(params)), rel_x=rel_x, mean_trace=mean_trace)
+            os.replace(tmp_path, path)
+            self._prune()
+        except OSError:
+            pass
+
+    def _prune(self) -> None:
+        files = sorted(self.directory.glob("*.npz"), key=lambda f: f.stat().st_mtime)
+        total = sum(f.stat().st_size for f in files)
+        while files and total > self.disk_budget_bytes:
+            oldest = files.pop(0)
+            total -= oldest.stat().st_size
+            oldest.unlink()
 
 
 def compute_pixel_area_map(
-    stack: np.ndarray,
+    stack,
     starts: list[int],
     extension: int,
     window: int,
@@ -1016,10 +1885,11 @@ def compute_pixel_area_map(
     f_left: int,
     f_right: int,
     baseline_fraction: float = 0.2,
+    dtype=np.float32,
 ) -> np.ndarray | None:
     """Per-pixel area values using the same pipeline as the ROI mean trace."""
     result = compute_all_pixel_mean_traces(
-        stack, starts, extension, window, polyorder, baseline_fraction
+        stack, starts, extension, window, polyorder, baseline_fraction, dtype=dtype
     )
     if result is None:
         return None
@@ -1120,6 +1990,83 @@ def clip_vertices(vertices: np.ndarray, width: int, height: int) -> np.ndarray:
     return clipped
 
 
+def downsample_display_image(image: np.ndarray) -> np.ndarray:
+    """Halve both axes with NaN-aware 2x2 block means; odd edges are padded by repetition."""
+    height, width = image.shape
+    padded = np.pad(image, ((0, height % 2), (0, width % 2)), mode="edge")
+    blocks = padded.reshape(padded.shape[0] // 2, 2, padded.shape[1] // 2, 2)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN blocks stay NaN
+        return np.nanmean(blocks, axis=(1, 3)).astype(np.float32)
+
+
+def build_display_pyramid(image: np.ndarray, min_size: int = DISPLAY_PYRAMID_MIN_SIZE) -> list[np.ndarray]:
+    """Full-resolution float32 display image followed by successively halved levels."""
+    levels = [np.asarray(image, dtype=np.float32)]
+    while min(levels[-1].shape) >= 2 * min_size:
+        levels.append(downsample_display_image(levels[-1]))
+    return levels
+
+
+def display_pyramid_level(ax, n_levels: int) -> int:
+    """Coarsest level that still has at least one image pixel per screen pixel in ``ax``."""
+    bbox = ax.get_window_extent()
+    x0, x1 = ax.get_xlim()
+    y0, y1 = ax.get_ylim()
+    ratio = min(abs(x1 - x0) / max(bbox.width, 1.0), abs(y1 - y0) / max(bbox.height, 1.0))
+    if ratio < 2.0:
+        return 0
+    return max(0, min(int(np.floor(np.log2(ratio))), n_levels - 1))
+
+
+class PyramidImage:
+    """``imshow`` of a display pyramid that swaps to the level matching the axes' zoom.
+
+    Color limits always come from the full-resolution image, so switching levels
+    never changes contrast. Call ``update_level`` when the view limits or figure
+    size change.
+    """
+
+    def __init__(self, ax, levels: list[np.ndarray], **imshow_kwargs) -> None:
+        self.ax = ax
+        self.levels = levels
+        self.level = display_pyramid_level(ax, len(levels))
+        self.artist = ax.imshow(self.levels[self.level], extent=self._extent(self.level), **imshow_kwargs)
+        if "vmin" not in imshow_kwargs and "vmax" not in imshow_kwargs:
+            self.artist.set_clim(*self._full_range())
+
+    def _extent(self, level: int) -> list[float]:
+        factor = 2**level
+        rows, cols = self.levels[level].shape
+        return [0, cols * factor, rows * factor, 0]
+
+    def _full_range(self) -> tuple[float, float]:
+        full = self.levels[0]
+        if not np.any(np.isfinite(full)):
+            return 0.0, 1.0
+        return float(np.nanmin(full)), float(np.nanmax(full))
+
+    def set_levels(self, levels: list[np.ndarray]) -> None:
+        """Show a new image (same geometry) in the existing artist."""
+        self.levels = levels
+        self.level = min(self.level, len(levels) - 1)
+        self.artist.set_data(self.levels[self.level])
+        self.artist.set_extent(self._extent(self.level))
+
+    def update_level(self) -> bool:
+        """Switch to the level matching the current view; returns True if it changed."""
+        level = display_pyramid_level(self.ax, len(self.levels))
+        if level == self.level:
+            return False
+        self.level = level
+        self.artist.set_data(self.levels[level])
+        self.artist.set_extent(self._extent(level))
+        return True
+
+    def remove(self) -> None:
+        self.artist.remove()
+
+
 class MarkEventsWindow:
     """Secondary window for inspecting saved ROIs and adjusting BC baseline shift."""
 
@@ -1139,9 +2086,7 @@ class MarkEventsWindow:
             save_quant_store(app.quant_pickle_path, self.store)
 
         current_dir = os.path.dirname(os.path.abspath(app.file_path))
-        current_size = format_stack_size(
-            app.stack.shape[2], app.stack.shape[1], app.stack.shape[0]
-        )
+        current_size = app._stack_size_key()
         self.entries: list[tuple[int, dict]] = []
         for row_index, row in enumerate(self.store.get("rows", [])):
             if not directory_matches(row.get("directory"), current_dir):
@@ -1284,8 +2229,14 @@ class MarkEventsWindow:
             self.canvas.mpl_connect("button_press_event", self._on_canvas_press),
             self.canvas.mpl_connect("motion_notify_event", self._on_canvas_motion),
             self.canvas.mpl_connect("button_release_event", self._on_canvas_release),
+            self.canvas.mpl_connect("resize_event", self._on_canvas_resize),
         ]
 
+    def _on_canvas_resize(self, _event) -> None:
+        changed = [image.update_level() for image in getattr(self, "_pyramid_images", [])]
+        if any(changed):
+            self.canvas.draw_idle()
+
     def _reset_event_modes(self) -> None:
         self._add_event_active = False
         self._remove_event_active = False
@@ -1737,27 +2688,35 @@ class MarkEventsWindow:
         area_map = app._ensure_area_map_for_mark_events()
 
         self.ax_image.clear()
-        self.ax_image.imshow(
-            z_average,
-            cmap="gray",
-            extent=[0, width, height, 0],
-            aspect="equal",
-        )
-        if area_map is not None:
-            self.ax_image.imshow(
-                area_map,
-                cmap="inferno",
-                alpha=0.5,
-                extent=[0, width, height, 0],
+        self.ax_image.set_xlim(0, width)
+        self.ax_image.set_ylim(height, 0)
+        self._pyramid_images = [
+            PyramidImage(
+                self.ax_image,
+                app._display_pyramid("z_average", z_average),
+                cmap="gray",
                 aspect="equal",
             )
+        ]
+        if area_map is not None:
+            self._pyramid_images.append(
+                PyramidImage(
+                    self.ax_image,
+                    app._display_pyramid("area_map", area_map),
+                    cmap="inferno",
+                    alpha=0.5,
+                    aspect="equal",
+                )
+            )
+        self.ax_image.set_xlim(0, width)
+        self.ax_image.set_ylim(height, 0)
 
         active_row_index = self._current_row_index()
         for row_index, row in self.entries:
             vertices = row.get("ROI pixels")
             if vertices is None:
                 continue
-            verts = np.asarray(vertices, dtype=float)
+            verts = app._roi_from_full_frame(vertices)
             if verts.ndim != 2 or len(verts) < 3:
                 continue
             is_active = row_index == active_row_index
@@ -2191,9 +3150,21 @@ class EditableROI:
 
 
 class StackAnalyzerApp:
-    def __init__(self, initial_path: str | None = None):
-        self.stack: np.ndarray | None = None
+    def __init__(
+        self,
+        initial_path: str | None = None,
+        initial_channel: str | None = None,
+        precision: str = DEFAULT_PRECISION,
+        bin_factor: int = 1,
+        crop: tuple[int, int, int, int] | None = None,
+        frames: tuple[int, int] | None = None,
+        workers: int = POOL_WORKERS,
+        heatmap_preview: bool = True,
+        build_pixel_tiles: bool = False,
+    ):
+        self.stack: LazyStack | None = None
         self.z_average: np.ndarray | None = None
+        self.stack_stats: dict | None = None
         self.raw_trace: np.ndarray | None = None
         self.raw_bg_trace: np.ndarray | None = None
         self.smooth_trace: np.ndarray | None = None
@@ -2207,6 +3178,19 @@ class StackAnalyzerApp:
         self.starts_text = DEFAULT_STARTS
         self.acq_fps = DEFAULT_ACQ_FPS
         self.avr_factor = float(DEFAULT_AVR)
+        # Load-time temporal binning; folded into the averaging factor that is saved to
+        # the pickle, so saved rows describe the time base of the binned traces.
+        self.bin_factor = max(1, int(bin_factor))
+        # Partial loads show a crop of the frame; ROI / BG vertices in the pickle stay
+        # in full-frame pixels, shifted by ``crop_origin`` on the way in and out.
+        self.crop_origin = (0, 0)
+        self.full_frame_size = (0, 0)
+        # Source frames behind the loaded ones (start, stop, bin); saved starts are source frame numbers
+        self.source_frames = (0, 0, 1)
+        self.source_frame_count = 0
+        # Full-frame (x, y, w, h) box of the loaded frames, saved with each row
+        self.source_crop = (0, 0, 0, 0)
+        self._partial_load_text = ""
         self.convert_time_axis = False
         self.baseline_level = 1.0
         self.rel_x: np.ndarray | None = None
@@ -2215,17 +3199,31 @@ class StackAnalyzerApp:
         self.segment_baseline_len = 1
         self.computed_area = 0.0
         self.heatmap_enabled = False
+        self.precision = precision
+        self.heatmap_workers = max(1, int(workers))
+        self._box_pool: BoxPool | None = None
+        self.heatmap_preview = heatmap_preview
+        self.build_pixel_tiles = build_pixel_tiles
+        self.heatmap_metric = HEATMAP_METRICS[0]
+        # (mean traces, area window, {metric: map}) the non-area maps were computed for
+        self._metric_maps: tuple | None = None
         self.pixel_mean_trace: np.ndarray | None = None
+        self._pixel_area_table: CumulativeArea | None = None
         self.pixel_rel_x: np.ndarray | None = None
-        self.base_image = None
-        self.heatmap_overlay = None
+        self.base_image: PyramidImage | None = None
+        self.heatmap_overlay: PyramidImage | None = None
+        # (source image, display pyramid) per name, shared with the Mark Events window
+        self._display_pyramids: dict[str, tuple[np.ndarray, list[np.ndarray]]] = {}
         self.heatmap_colorbar = None
         self.area_map_cache: np.ndarray | None = None
         self._heatmap_progress_artists: list = []
         self._heatmap_traces_dirty = True
-        self._heatmap_busy = False
-        self._heatmap_pending = False
-        self._heatmap_pending_full = False
+        self._heatmap_job: HeatmapJob | None = None
+        self._heatmap_preview_shown: tuple | None = None
+        self._heatmap_cache: HeatmapCache | None = None
+        self._smoothed_cache: SmoothedFrameCache | None = None
+        self._heatmap_restart = False
+        self._heatmap_timer = None
         self._block_area_slider_callbacks = False
         self.quant_pickle_path: Path | None = None
         self.show_saved_rois = False
@@ -2238,6 +3236,7 @@ class StackAnalyzerApp:
 
         self.fig = plt.figure(figsize=(16, 9))
         self.fig.canvas.manager.set_window_title("Stack Analyzer")
+        self.fig.canvas.mpl_connect("close_event", self._on_figure_closed)
 
         gs = self.fig.add_gridspec(
             4,
@@ -2254,16 +3253,22 @@ class StackAnalyzerApp:
         self.ax_image = self.fig.add_subplot(image_row_gs[0, 0])
         self.ax_heatmap_cbar = self.fig.add_subplot(image_row_gs[0, 1])
         self.ax_heatmap_cbar.set_axis_off()
+        self.ax_image.callbacks.connect("xlim_changed", self._on_image_view_changed)
+        self.ax_image.callbacks.connect("ylim_changed", self._on_image_view_changed)
+        self.fig.canvas.mpl_connect("resize_event", self._on_image_view_changed)
         show_rois_ax = self.fig.add_subplot(left_gs[1, 0])
         show_rois_ax.set_axis_off()
         self.check_show_rois = widgets.CheckButtons(show_rois_ax, ["show ROIs"], [False])
         self.check_show_rois.on_clicked(self._on_show_rois_toggled)
-        heatmap_row_gs = left_gs[2, 0].subgridspec(1, 2, width_ratios=[0.32, 0.68], wspace=0.06)
+        heatmap_row_gs = left_gs[2, 0].subgridspec(1, 3, width_ratios=[0.3, 0.3, 0.4], wspace=0.06)
         toggle_ax = self.fig.add_subplot(heatmap_row_gs[0, 0])
         toggle_ax.set_axis_off()
         self.check_heatmap = widgets.CheckButtons(toggle_ax, ["Heatmap"], [False])
         self.check_heatmap.on_clicked(self._on_heatmap_toggled)
-        ax_update_heatmap = self.fig.add_subplot(heatmap_row_gs[0, 1])
+        ax_heatmap_metric = self.fig.add_subplot(heatmap_row_gs[0, 1])
+        self.btn_heatmap_metric = widgets.Button(ax_heatmap_metric, f"Map: {self.heatmap_metric}")
+        self.btn_heatmap_metric.on_clicked(self._on_heatmap_metric_clicked)
+        ax_update_heatmap = self.fig.add_subplot(heatmap_row_gs[0, 2])
         self.btn_update_heatmap = widgets.Button(ax_update_heatmap, "Update heatmap")
         self.btn_update_heatmap.on_clicked(self._on_update_heatmap_clicked)
         self._sync_heatmap_update_button()
@@ -2277,7 +3282,7 @@ class StackAnalyzerApp:
         self.bg_roi_tool: EditableROI | None = None
 
         if initial_path:
-            self.load_stack(initial_path)
+            self.load_stack(initial_path, channel=initial_channel, crop=crop, frames=frames)
 
     def _build_controls(self) -> None:
         self.file_text = self.fig.text(
@@ -2308,6 +3313,10 @@ class StackAnalyzerApp:
         self.btn_clear_bg = widgets.Button(ax_clear_bg, "Clear BG")
         self.btn_clear_bg.on_clicked(lambda _event: self._clear_bg_roi())
 
+        ax_browse_folder = self.fig.add_axes([0.23, 0.815, 0.10, 0.035])
+        self.btn_browse_folder = widgets.Button(ax_browse_folder, "Frame folder…")
+        self.btn_browse_folder.on_clicked(self._browse_frame_folder)
+
         ax_save_roi = self.fig.add_axes([0.05, 0.775, 0.08, 0.035])
         self.btn_save_roi = widgets.Button(ax_save_roi, "Save ROI")
         self.btn_save_roi.on_clicked(self._on_save_roi)
@@ -2320,6 +3329,10 @@ class StackAnalyzerApp:
         self.btn_mark_events = widgets.Button(ax_mark_events, "Mark Events")
         self.btn_mark_events.on_clicked(self._on_mark_events)
 
+        ax_export_bundle = self.fig.add_axes([0.34, 0.775, 0.09, 0.035])
+        self.btn_export_bundle = widgets.Button(ax_export_bundle, "Export .npz")
+        self.btn_export_bundle.on_clicked(self._on_export_bundle)
+
         ax_window = self.fig.add_axes([0.30, 0.905, 0.18, 0.025])
         self.slider_window = widgets.Slider(ax_window, "SG window", 3, 501, valinit=51, valstep=2)
         self.slider_window.on_changed(lambda _val: self._update_analysis())
@@ -2385,9 +3398,60 @@ class StackAnalyzerApp:
             title="Select TIFF stack",
             filetypes=[("TIFF files", "*.tif *.tiff *.TIFF *.TIF"), ("All files", "*.*")],
         )
+        if not path:
+            root.destroy()
+            return
+        partial = self._ask_partial_load(root)
         root.destroy()
-        if path:
-            self.load_stack(path)
+        if partial is not None:
+            self.load_stack(path, crop=partial[0], frames=partial[1])
+
+    def _browse_frame_folder(self, _event) -> None:
+        root = tk.Tk()
+        root.withdraw()
+        folder = filedialog.askdirectory(title="Select Thorlabs per-frame TIFF folder", mustexist=True)
+        if not folder:
+            root.destroy()
+            return
+        channels = thorlabs_channels(folder)
+        channel = None
+        if not channels:
+            messagebox.showinfo("Frame folder", f"No ChanA/ChanB frame files in:\n{folder}", parent=root)
+        elif len(channels) == 1:
+            channel = channels[0]
+        else:
+            channel = simpledialog.askstring(
+                "Frame folder",
+                f"Channel to load ({', '.join(channels)}):",
+                initialvalue=channels[0],
+                parent=root,
+            )
+            if channel is not None and channel.strip() not in channels:
+                messagebox.showinfo("Frame folder", f"Unknown channel: {channel}", parent=root)
+                channel = None
+        partial = self._ask_partial_load(root) if channel else None
+        root.destroy()
+        if partial is not None:
+            self.load_stack(folder, channel=channel.strip(), crop=partial[0], frames=partial[1])
+
+    def _ask_partial_load(self, root) -> tuple | None:
+        """Ask for an optional crop box / frame range; None when cancelled or invalid."""
+        text = simpledialog.askstring(
+            "Partial load",
+            "Crop x,y,w,h and/or frame range start:stop, separated by ';'\n"
+            "(e.g. 64,64,256,256; 100:500). Leave blank to load the full stack.",
+            initialvalue=self._partial_load_text,
+            parent=root,
+        )
+        if text is None:
+            return None
+        try:
+            partial = parse_partial_load(text)
+        except ValueError as exc:
+            messagebox.showinfo("Partial load", str(exc), parent=root)
+            return None
+        self._partial_load_text = text.strip()
+        return partial
 
     def _on_inspect_pickle(self, _event) -> None:
         path = self.quant_pickle_path
@@ -2417,6 +3481,24 @@ class StackAnalyzerApp:
             ),
         )
 
+    def _on_export_bundle(self, _event) -> None:
+        path = self.quant_pickle_path
+        if path is None or not path.exists():
+            messagebox.showinfo("Export .npz", "Load a TIFF stack with saved ROIs to export its pickle.")
+            return
+        area_map = self.area_map_cache if self.stack is not None else None
+        try:
+            out_path = export_quant_bundle(
+                path,
+                area_map=area_map,
+                area_map_size=self._stack_size_key() if area_map is not None else None,
+                area_map_origin=self.crop_origin,
+            )
+        except (OSError, ValueError) as exc:
+            messagebox.showinfo("Export .npz", f"Export failed: {exc}")
+            return
+        self._set_status_message(f"Exported {out_path}")
+
     def _toggle_draw_mode(self, _event) -> None:
         if self.roi_tool is None:
             return
@@ -2447,6 +3529,7 @@ class StackAnalyzerApp:
     def _on_heatmap_toggled(self, _label: str) -> None:
         self.heatmap_enabled = bool(self.check_heatmap.get_status()[0])
         if not self.heatmap_enabled:
+            self._cancel_heatmap_job()
             self._clear_heatmap_layers()
             self.ax_image.set_title("Z-average")
             self.fig.canvas.draw_idle()
@@ -2454,8 +3537,18 @@ class StackAnalyzerApp:
             self._show_heatmap_overlay()
         self._sync_heatmap_update_button()
 
+    def _on_heatmap_metric_clicked(self, _event) -> None:
+        index = HEATMAP_METRICS.index(self.heatmap_metric)
+        self.heatmap_metric = HEATMAP_METRICS[(index + 1) % len(HEATMAP_METRICS)]
+        self.btn_heatmap_metric.label.set_text(f"Map: {self.heatmap_metric}")
+        # Every metric comes from the same pixel traces: no recomputation, just redisplay
+        if self.heatmap_enabled and self.area_map_cache is not None and self._heatmap_job is None:
+            self._show_heatmap_overlay()
+        else:
+            self.fig.canvas.draw_idle()
+
     def _on_update_heatmap_clicked(self, _event) -> None:
-        if not self.heatmap_enabled or self.stack is None or self._heatmap_busy:
+        if not self.heatmap_enabled or self.stack is None or self._heatmap_job is not None:
             return
         if not self._heatmap_needs_update():
             self._sync_heatmap_update_button()
@@ -2485,9 +3578,7 @@ class StackAnalyzerApp:
             store = load_quant_store(self.quant_pickle_path)
 
         current_dir = os.path.dirname(os.path.abspath(self.file_path))
-        current_size = format_stack_size(
-            self.stack.shape[2], self.stack.shape[1], self.stack.shape[0]
-        )
+        current_size = self._stack_size_key()
         entries: list[tuple[int, dict]] = []
         for row_index, row in enumerate(store.get("rows", [])):
             if not directory_matches(row.get("directory"), current_dir):
@@ -2534,7 +3625,7 @@ class StackAnalyzerApp:
 
         ui_pixels = None
         if self.bg_roi_tool is not None and self.bg_roi_tool.vertices is not None:
-            ui_pixels = np.asarray(self.bg_roi_tool.vertices, dtype=np.float64).copy()
+            ui_pixels = self._roi_to_full_frame(self.bg_roi_tool.vertices)
         ui_trc = None
         if self.raw_bg_trace is not None:
             ui_trc = np.asarray(self.raw_bg_trace, dtype=np.float64).copy()
@@ -2571,10 +3662,11 @@ class StackAnalyzerApp:
         return False
 
     def _compute_bg_trace_from_pixels(self, bg_pixels) -> np.ndarray | None:
+        """BG trace for full-frame ``bg_pixels`` (as saved in the pickle)."""
         if self.stack is None or self.bg_roi_tool is None or bg_pixels is None:
             return None
         verts = clip_vertices(
-            np.asarray(bg_pixels, dtype=np.float64),
+            self._roi_from_full_frame(bg_pixels),
             self.bg_roi_tool.width,
             self.bg_roi_tool.height,
         )
@@ -2689,7 +3781,7 @@ class StackAnalyzerApp:
             vertices = row.get("ROI pixels")
             if vertices is None:
                 continue
-            verts = np.asarray(vertices, dtype=float)
+            verts = self._roi_from_full_frame(vertices)
             if verts.ndim != 2 or len(verts) < 3:
                 continue
             if MplPath(verts).contains_point((x, y), radius=2.0):
@@ -2728,9 +3820,9 @@ class StackAnalyzerApp:
         if f_right < f_left:
             f_left, f_right = f_right, f_left
         return {
-            "starts": format_start_frames(self.start_frames),
+            "starts": format_start_frames(self._starts_to_source(self.start_frames)),
             "acq_fps": self.acq_fps,
-            "avr_factor": self.avr_factor,
+            "avr_factor": self._stack_avr_factor(),
             "sg_window": int(self.slider_window.val),
             "sg_poly": int(self.slider_poly.val),
             "extension": int(self.slider_extension.val),
@@ -2797,9 +3889,7 @@ class StackAnalyzerApp:
             return None
 
         current_dir = os.path.dirname(os.path.abspath(self.file_path))
-        current_size = format_stack_size(
-            self.stack.shape[2], self.stack.shape[1], self.n_frames
-        )
+        current_size = self._stack_size_key()
         for row in store["rows"]:
             if not directory_matches(row.get("directory"), current_dir):
                 continue
@@ -2815,12 +3905,12 @@ class StackAnalyzerApp:
         self._applying_quant_settings = True
         try:
             self.acq_fps = settings["acq_fps"]
-            self.avr_factor = settings["avr_factor"]
+            self.avr_factor = settings["avr_factor"] / self.bin_factor
             self.text_freq.set_val(str(settings["acq_fps"]))
             self.text_avr.set_val(
-                str(int(settings["avr_factor"]))
-                if float(settings["avr_factor"]).is_integer()
-                else str(settings["avr_factor"])
+                str(int(self.avr_factor))
+                if float(self.avr_factor).is_integer()
+                else str(self.avr_factor)
             )
             self._update_effective_fps_display()
             sg_window = min(int(settings["sg_window"]), int(self.slider_window.valmax))
@@ -2828,7 +3918,7 @@ class StackAnalyzerApp:
             self.slider_window.set_val(sg_window)
             self.slider_poly.set_val(settings["sg_poly"])
             self.slider_extension.set_val(settings["extension"])
-            self.start_frames = parse_start_frames(settings["starts"], self.n_frames)
+            self.start_frames = self._starts_from_source(settings["starts"])
             self._sync_starts_textbox_from_frames(self.start_frames)
             self._block_area_slider_callbacks = True
             try:
@@ -2888,7 +3978,7 @@ class StackAnalyzerApp:
                 self.raw_bg_trace = None
                 return
             verts = clip_vertices(
-                np.asarray(bg_vertices, dtype=float),
+                self._roi_from_full_frame(bg_vertices),
                 self.bg_roi_tool.width,
                 self.bg_roi_tool.height,
             )
@@ -2917,7 +4007,7 @@ class StackAnalyzerApp:
         self._loading_saved_roi = True
         try:
             self._active_saved_roi_row_index = row_index
-            self._load_vertices_into_roi_tool(np.asarray(row["ROI pixels"], dtype=float))
+            self._load_vertices_into_roi_tool(self._roi_from_full_frame(row["ROI pixels"]))
             self._load_bg_from_row(row)
             self._on_roi_changed()
             self._update_saved_roi_display()
@@ -2967,7 +4057,7 @@ class StackAnalyzerApp:
             vertices = row.get("ROI pixels")
             if vertices is None:
                 continue
-            verts = np.asarray(vertices, dtype=float)
+            verts = self._roi_from_full_frame(vertices)
             if verts.ndim != 2 or len(verts) < 3:
                 continue
 
@@ -3134,8 +4224,6 @@ class StackAnalyzerApp:
         existing_row: dict | None = None,
         store: dict | None = None,
     ) -> dict:
-        width = self.stack.shape[2]
-        height = self.stack.shape[1]
         f_left = int(self.slider_area_left.val)
         f_right = int(self.slider_area_right.val)
         if f_right < f_left:
@@ -3149,7 +4237,7 @@ class StackAnalyzerApp:
 
         bg_pixels, bg_trc = self._resolve_bg_fields_for_quant_row(store)
 
-        roi_vertices = np.asarray(self.roi_tool.vertices, dtype=np.float64)
+        roi_vertices = self._roi_to_full_frame(self.roi_tool.vertices)
         max_vals: list[float] = []
         if self.normalized_segments and self.rel_x is not None:
             max_vals = compute_max_vals_per_segment(
@@ -3166,9 +4254,11 @@ class StackAnalyzerApp:
 
         row = {
             "directory": os.path.dirname(os.path.abspath(self.file_path)),
-            "size": format_stack_size(width, height, self.n_frames),
-            "starts": format_start_frames(self.start_frames),
-            "freq + avr": format_freq_avr_field(self.acq_fps, self.avr_factor),
+            "size": self._stack_size_key(),
+            "starts": format_start_frames(self._starts_to_source(self.start_frames)),
+            SOURCE_FRAMES_COLUMN: format_source_frames(*self.source_frames),
+            SOURCE_CROP_COLUMN: format_source_crop(*self.source_crop),
+            "freq + avr": format_freq_avr_field(self.acq_fps, self._stack_avr_factor()),
             "SG window and order": format_sg_field(
                 int(self.slider_window.val), int(self.slider_poly.val)
             ),
@@ -3232,14 +4322,19 @@ class StackAnalyzerApp:
         except ValueError:
             return default
 
+    def _stack_avr_factor(self) -> float:
+        """Averaging factor of the loaded frames: recording avr times load-time binning."""
+        return self.avr_factor * self.bin_factor
+
     def _effective_fps(self) -> float:
-        if self.avr_factor <= 0:
+        if self._stack_avr_factor() <= 0:
             return 0.0
-        return self.acq_fps / self.avr_factor
+        return self.acq_fps / self._stack_avr_factor()
 
     def _update_effective_fps_display(self) -> None:
         fps = self._effective_fps()
-        self.effective_fps_text.set_text(f"{fps:.3f} fps")
+        note = f" (bin {self.bin_factor}×)" if self.bin_factor > 1 else ""
+        self.effective_fps_text.set_text(f"{fps:.3f} fps{note}")
 
     def _on_timing_changed(self, _text: str) -> None:
         self.acq_fps = self._parse_positive_float(self.text_freq.text, DEFAULT_ACQ_FPS)
@@ -3304,20 +4399,51 @@ class StackAnalyzerApp:
         finally:
             self._block_area_slider_callbacks = False
 
-    def load_stack(self, path: str) -> None:
+    def load_stack(
+        self,
+        path: str,
+        channel: str | None = None,
+        crop: tuple[int, int, int, int] | None = None,
+        frames: tuple[int, int] | None = None,
+    ) -> None:
+        source = path
         try:
-            stack = load_tif_stack(path)
+            stack = load_tif_stack(path, channel, self.bin_factor, crop=crop, frames=frames)
         except (OSError, ValueError) as exc:
             self.file_text.set_text(f"Failed to load: {exc}")
             self.fig.canvas.draw_idle()
             return
 
+        if self.stack is not None:
+            # The heatmap worker may still be reading the old stack
+            self._stop_heatmap_job()
+            if self._box_pool is not None:
+                self._box_pool.release_source()
+            self.stack.close()
+        # The file behind crop / frame-range / bin views is the one shown and the one the
+        # pickle lives next to; virtual folder stacks report the DATA/<chan>/<chan>_stk.tif
+        # path the generator would write. Crop and bin are saved with each row instead.
+        path = str(base_stack(stack).path)
         self.stack = stack
+        inner = getattr(stack, "source", stack) if self.bin_factor > 1 else stack
+        self.crop_origin = getattr(inner, "origin", (0, 0))
+        self.source_crop = (*self.crop_origin, stack.shape[2], stack.shape[1])
+        self.full_frame_size = tuple(getattr(inner, "full_shape", inner.shape)[2:0:-1])
+        first_frame = getattr(inner, "frame_offset", 0)
+        self.source_frames = (first_frame, first_frame + stack.shape[0] * self.bin_factor, self.bin_factor)
+        self.source_frame_count = getattr(inner, "full_shape", inner.shape)[0]
         self.file_path = path
         self.quant_pickle_path = ensure_quant_pickle(path)
         self.n_frames = stack.shape[0]
-        self.z_average = compute_z_average(stack)
+        # Z-average and per-frame stats come from the sidecar cache when the file is unchanged.
+        self.stack_stats = cached_stack_statistics(stack)
+        self.z_average = self.stack_stats["z_average"]
+        # Reuse an existing time-major pixel-tile sidecar; the heatmap builds one with --pixel-tiles.
+        cached_pixel_tiles(stack)
+        self._heatmap_cache = None
         self._mark_heatmap_dirty()
+        self._heatmap_cache = HeatmapCache(stack)
+        self._smoothed_cache = SmoothedFrameCache()
 
         height, width = self.z_average.shape
         self._active_saved_roi_row_index = None
@@ -3364,24 +4490,88 @@ class StackAnalyzerApp:
         if pickle_settings is not None:
             self._apply_quant_settings_to_gui(pickle_settings)
         else:
-            self.start_frames = parse_start_frames(DEFAULT_STARTS, self.n_frames)
+            # Default starts are source frame numbers, like saved ones
+            self.start_frames = self._starts_from_source(DEFAULT_STARTS)
             self._sync_starts_textbox_from_frames(self.start_frames)
             self._update_area_slider_limits()
             self._update_analysis()
 
-        name = path if len(path) <= 120 else "…" + path[-117:]
-        self.file_text.set_text(f"{name}  |  {self.n_frames} frames, {height}×{width}")
+        name = source if os.path.isfile(source) else f"{source} [{getattr(stack, 'channel', '')}]"
+        name = name if len(name) <= 120 else "…" + name[-117:]
+        frames_note = f" [{frames[0]}:{frames[1]}]" if frames is not None else ""
+        bin_note = f" (binned {self.bin_factor}×)" if self.bin_factor > 1 else ""
+        crop_note = f" crop at ({crop[0]}, {crop[1]})" if crop is not None else ""
+        self.file_text.set_text(
+            f"{name}  |  {self.n_frames} frames{frames_note}{bin_note}, {height}×{width}{crop_note}"
+        )
 
         if self.show_saved_rois:
             self._update_saved_roi_display()
 
+    def _starts_to_source(self, frames: list[int]) -> list[int]:
+        start, _stop, bin_factor = self.source_frames
+        return starts_to_source(frames, start, bin_factor)
+
+    def _starts_from_source(self, text: str) -> list[int]:
+        """Loaded frame numbers of the comma-separated source frame numbers in ``text``."""
+        start, _stop, bin_factor = self.source_frames
+        source_starts = parse_start_frames(text, self.source_frame_count)
+        return starts_from_source(source_starts, start, bin_factor, self.n_frames)
+
+    def _stack_size_key(self) -> str:
+        """Row ``size`` of the loaded stack: full-frame width x height, loaded frame count."""
+        if self.stack is None:
+            return ""
+        full_width, full_height = self.full_frame_size
+        return format_stack_size(full_width, full_height, self.stack.shape[0])
+
+    def _roi_to_full_frame(self, vertices) -> np.ndarray:
+        """Displayed (cropped) vertex coordinates -> full-frame pixels saved in the pickle."""
+        verts = np.asarray(vertices, dtype=np.float64).copy()
+        if verts.ndim == 2 and len(verts):
+            verts += self.crop_origin
+        return verts
+
+    def _roi_from_full_frame(self, vertices) -> np.ndarray:
+        """Full-frame vertex coordinates from the pickle -> displayed (cropped) pixels."""
+        verts = np.asarray(vertices, dtype=np.float64).copy()
+        if verts.ndim == 2 and len(verts):
+            verts -= self.crop_origin
+        return verts
+
     def _mark_heatmap_dirty(self) -> None:
         self._heatmap_traces_dirty = True
         self.pixel_mean_trace = None
         self.pixel_rel_x = None
+        self._pixel_area_table = None
         self.area_map_cache = None
+        restored = self._restore_cached_heatmap()
+        if self._heatmap_job is not None and not self._heatmap_job.cancel.is_set():
+            # Latest parameters win: drop the stale computation and rerun once it has stopped.
+            self._cancel_heatmap_job(restart=not restored)
+        elif restored and self.heatmap_enabled and self._heatmap_job is None:
+            self._update_heatmap_display()
         self._sync_heatmap_update_button()
 
+    def _restore_cached_heatmap(self, from_disk: bool = False) -> bool:
+        """Take the pixel traces for the current parameters from the heatmap cache, if there.
+
+        Only the in-memory tier is checked unless ``from_disk``: disk restores
+        belong in the heatmap job, off the GUI thread.
+        """
+        if self._heatmap_cache is None:
+            return False
+        key = self._heatmap_cache_key()
+        cached = self._heatmap_cache.get(key) if from_disk else self._heatmap_cache.peek(key)
+        if cached is None:
+            return False
+        self.pixel_rel_x, self.pixel_mean_trace, self._pixel_area_table = cached
+        self._heatmap_traces_dirty = False
+        return True
+
+    def _heatmap_cache_key(self, params: tuple | None = None) -> tuple:
+        return heatmap_cache_key(params or self._heatmap_compute_params(), PRECISION_DTYPES[self.precision])
+
     def _heatmap_compute_params(self) -> tuple:
         return (
             tuple(int(s) for s in self.start_frames),
@@ -3407,7 +4597,7 @@ class StackAnalyzerApp:
         enabled = (
             self.heatmap_enabled
             and self.stack is not None
-            and not self._heatmap_busy
+            and self._heatmap_job is None
             and self._heatmap_needs_update()
         )
         button.set_active(enabled)
@@ -3430,10 +4620,12 @@ class StackAnalyzerApp:
             except (ValueError, AttributeError):
                 pass
             self.base_image = None
-        self.base_image = self.ax_image.imshow(
-            self.z_average,
+        self.ax_image.set_xlim(0, width)
+        self.ax_image.set_ylim(height, 0)
+        self.base_image = PyramidImage(
+            self.ax_image,
+            self._display_pyramid("z_average", self.z_average),
             cmap="gray",
-            extent=[0, width, height, 0],
             aspect="equal",
             zorder=1,
         )
@@ -3444,6 +4636,20 @@ class StackAnalyzerApp:
         if self.show_saved_rois:
             self._update_saved_roi_display()
 
+    def _display_pyramid(self, name: str, image: np.ndarray) -> list[np.ndarray]:
+        """Display pyramid for ``image``, rebuilt only when a different array is passed."""
+        cached = self._display_pyramids.get(name)
+        if cached is not None and cached[0] is image:
+            return cached[1]
+        levels = build_display_pyramid(image)
+        self._display_pyramids[name] = (image, levels)
+        return levels
+
+    def _on_image_view_changed(self, _arg=None) -> None:
+        changed = [image.update_level() for image in (self.base_image, self.heatmap_overlay) if image is not None]
+        if any(changed):
+            self.fig.canvas.draw_idle()
+
     def _redraw_rois(self) -> None:
         for tool in (self.roi_tool, self.bg_roi_tool):
             if tool is not None:
@@ -3494,6 +4700,10 @@ class StackAnalyzerApp:
             return False
         if not self._heatmap_traces_dirty and self.pixel_mean_trace is not None:
             return True
+        self._stop_heatmap_job()
+        # This path blocks on the computation anyway, so a disk restore is cheaper
+        if self._restore_cached_heatmap(from_disk=True):
+            return True
 
         params = self._heatmap_compute_params()
         starts = list(params[0])
@@ -3517,6 +4727,9 @@ class StackAnalyzerApp:
                 poly,
                 baseline_fraction,
                 progress=report_progress,
+                dtype=PRECISION_DTYPES[self.precision],
+                smoothed_cache=self._smoothed_cache,
+                pool=self._heatmap_pool(),
             )
         finally:
             self._block_area_slider_callbacks = False
@@ -3537,9 +4750,12 @@ class StackAnalyzerApp:
 
         self.pixel_rel_x, self.pixel_mean_trace = result
         self._heatmap_traces_dirty = False
+        if self._heatmap_cache is not None:
+            self._pixel_area_table = self._heatmap_cache.put(self._heatmap_cache_key(params), *result)[2]
+            self._heatmap_cache.flush_spills()
         return True
 
-    def _set_heatmap_progress(self, stage: str, fraction: float) -> None:
+    def _set_heatmap_progress(self, stage: str, fraction: float, flush: bool = True) -> None:
         fraction = max(0.0, min(1.0, fraction))
         pct = int(round(fraction * 100))
         self._clear_heatmap_progress()
@@ -3600,11 +4816,17 @@ class StackAnalyzerApp:
         )
         self.ax_image.set_title(f"Z-average — heatmap {stage} ({pct}%)")
         self.fig.canvas.draw_idle()
-        self.fig.canvas.flush_events()
+        if flush:
+            # Only needed when computing on the GUI thread (see _ensure_pixel_mean_traces).
+            self.fig.canvas.flush_events()
+
+    def _heatmap_title(self, metric: str | None = None) -> str:
+        metric = self.heatmap_metric if metric is None else metric
+        return f"Z-average + {metric if metric.isupper() else metric.lower()} heatmap"
 
-    def _finalize_heatmap_render(self) -> None:
+    def _finalize_heatmap_render(self, title: str | None = None) -> None:
         self._clear_heatmap_progress()
-        self.ax_image.set_title("Z-average + area heatmap")
+        self.ax_image.set_title(self._heatmap_title() if title is None else title)
         self.fig.canvas.draw_idle()
 
     def _compute_area_map_cache(self) -> bool:
@@ -3614,33 +4836,56 @@ class StackAnalyzerApp:
         height, width = self.stack.shape[1], self.stack.shape[2]
         f_left = int(self.slider_area_left.val)
         f_right = int(self.slider_area_right.val)
-        area_map = compute_area_from_mean_trace(
-            self.pixel_rel_x,
-            self.pixel_mean_trace.reshape(self.pixel_mean_trace.shape[0], -1),
-            f_left,
-            f_right,
-        )
+        table = self._pixel_area_table
+        if table is None or table.source is not self.pixel_mean_trace:
+            table = CumulativeArea(self.pixel_rel_x, self.pixel_mean_trace)
+            self._pixel_area_table = table
+        area_map = table.area(f_left, f_right)
         if f_left != int(self.slider_area_left.val) or f_right != int(self.slider_area_right.val):
             self.area_map_cache = None
             return False
         self.area_map_cache = np.asarray(area_map, dtype=np.float64).reshape(height, width)
         return True
 
-    def _update_heatmap_overlay_inplace(self) -> bool:
-        if self.area_map_cache is None or self.heatmap_overlay is None:
+    def _current_heatmap_map(self) -> np.ndarray | None:
+        """Map of the selected heatmap metric for the current traces and Area L/R window.
+
+        The area map is ``area_map_cache``; the other metrics are computed
+        together from the pixel mean traces on first use and kept until the
+        traces or the window change.
+        """
+        if self.heatmap_metric == "Area" or self.area_map_cache is None or self.pixel_mean_trace is None:
+            return self.area_map_cache
+        area_window = (int(self.slider_area_left.val), int(self.slider_area_right.val))
+        cached = self._metric_maps
+        if cached is None or cached[0] is not self.pixel_mean_trace or cached[1] != area_window:
+            _starts, _window, _poly, extension, baseline_fraction = self._heatmap_compute_params()
+            maps = pixel_metric_maps(
+                self.pixel_rel_x,
+                self.pixel_mean_trace,
+                *area_window,
+                onset=segment_geometry(extension, baseline_fraction)[0] + 1,
+                area_table=self._pixel_area_table,
+            )
+            shape = self.area_map_cache.shape
+            self._metric_maps = (self.pixel_mean_trace, area_window, {k: v.reshape(shape) for k, v in maps.items()})
+        return self._metric_maps[2][self.heatmap_metric]
+
+    def _update_heatmap_overlay_inplace(self, data: np.ndarray | None = None) -> bool:
+        data = self._current_heatmap_map() if data is None else data
+        if data is None or self.heatmap_overlay is None:
             return False
 
         self._clear_heatmap_progress()
-        data = self.area_map_cache
-        self.heatmap_overlay.set_data(data)
+        self.heatmap_overlay.set_levels(self._display_pyramid("area_map", data))
         vmin = float(np.nanmin(data))
         vmax = float(np.nanmax(data))
         if vmin >= vmax:
             vmax = vmin + 1.0
-        self.heatmap_overlay.set_clim(vmin, vmax)
+        self.heatmap_overlay.artist.set_clim(vmin, vmax)
         if self.heatmap_colorbar is not None:
-            self.heatmap_colorbar.update_normal(self.heatmap_overlay)
-        self.ax_image.set_title("Z-average + area heatmap")
+            self.heatmap_colorbar.update_normal(self.heatmap_overlay.artist)
+        self.ax_image.set_title(self._heatmap_title())
         if self.roi_tool is not None:
             self.roi_tool._update_patch()
         if self.bg_roi_tool is not None:
@@ -3648,63 +4893,154 @@ class StackAnalyzerApp:
         self.fig.canvas.draw_idle()
         return True
 
-    def _show_heatmap_overlay(self) -> None:
-        if self.area_map_cache is None or self.z_average is None:
+    def _show_heatmap_overlay(self, data: np.ndarray | None = None, title: str | None = None) -> None:
+        """Show ``data`` (default: the selected metric's map) as the heatmap overlay."""
+        data = self._current_heatmap_map() if data is None else data
+        if data is None or self.z_average is None:
             return
 
-        if self.heatmap_overlay is not None and self._update_heatmap_overlay_inplace():
-            self._finalize_heatmap_render()
+        if self.heatmap_overlay is not None and self._update_heatmap_overlay_inplace(data):
+            self._finalize_heatmap_render(title)
             return
 
-        height, width = self.z_average.shape
         self._safe_remove_heatmap_overlay()
         self._safe_remove_heatmap_colorbar()
 
         if self.base_image is None:
             self._refresh_base_image()
 
-        self.heatmap_overlay = self.ax_image.imshow(
-            self.area_map_cache,
+        self.heatmap_overlay = PyramidImage(
+            self.ax_image,
+            self._display_pyramid("area_map", data),
             cmap="inferno",
             alpha=0.5,
-            extent=[0, width, height, 0],
             aspect="equal",
             zorder=2,
         )
         self._prepare_heatmap_colorbar_axis()
         self.heatmap_colorbar = self.fig.colorbar(
-            self.heatmap_overlay, cax=self.ax_heatmap_cbar
+            self.heatmap_overlay.artist, cax=self.ax_heatmap_cbar
         )
         if self.roi_tool is not None:
             self.roi_tool._update_patch()
         if self.bg_roi_tool is not None:
             self.bg_roi_tool._update_patch()
-        self._finalize_heatmap_render()
+        self._finalize_heatmap_render(title)
 
     def _update_heatmap_display(self, integrate_only: bool = False) -> None:
-        if self._heatmap_busy:
-            self._heatmap_pending = True
-            if not integrate_only:
-                self._heatmap_pending_full = True
+        job = self._heatmap_job
+        if job is not None:
+            if job.params != self._heatmap_compute_params():
+                self._cancel_heatmap_job(restart=True)
             return
-        self._heatmap_busy = True
+        self._update_heatmap_display_impl(integrate_only)
+        self._sync_heatmap_update_button()
+
+    def _start_heatmap_job(self) -> None:
+        """Compute pixel traces and the area map for the current parameters off the GUI thread."""
+        job = HeatmapJob(
+            self.stack,
+            self._heatmap_compute_params(),
+            (int(self.slider_area_left.val), int(self.slider_area_right.val)),
+            PRECISION_DTYPES[self.precision],
+            self._heatmap_pool(),
+            self._smoothed_cache,
+            HEATMAP_PREVIEW_BINS if self.heatmap_preview else (),
+            self.heatmap_metric,
+            self.build_pixel_tiles,
+            self._heatmap_cache,
+        )
+        self._heatmap_job = job
+        self._heatmap_restart = False
+        self._set_heatmap_progress(*job.progress, flush=False)
+        job.start()
+        if self._heatmap_timer is None:
+            self._heatmap_timer = self.fig.canvas.new_timer(interval=HEATMAP_POLL_MS)
+            self._heatmap_timer.add_callback(self._poll_heatmap_job)
+        self._heatmap_timer.start()
         self._sync_heatmap_update_button()
-        try:
-            self._update_heatmap_display_impl(integrate_only)
-        finally:
-            self._heatmap_busy = False
-            if self._heatmap_pending:
-                pending_full = self._heatmap_pending_full
-                self._heatmap_pending = False
-                self._heatmap_pending_full = False
-                # Only auto-rerun if an Update was requested while busy and
-                # there is still work to do with the latest parameters.
-                if self.heatmap_enabled and self._heatmap_needs_update():
-                    self._update_heatmap_display(integrate_only=not pending_full)
-                else:
-                    self._sync_heatmap_update_button()
-            else:
-                self._sync_heatmap_update_button()
+
+    def _cancel_heatmap_job(self, restart: bool = False) -> None:
+        """Signal the running job to stop; with ``restart``, rerun with the latest parameters afterwards."""
+        if self._heatmap_job is None:
+            return
+        self._heatmap_job.cancel.set()
+        self._heatmap_restart = restart and self.heatmap_enabled
+
+    def _heatmap_pool(self) -> BoxPool | None:
+        """The session's worker pool (started on first use), or None with one worker."""
+        if self._box_pool is None and self.heatmap_workers > 1:
+            self._box_pool = BoxPool(self.heatmap_workers)
+        return self._box_pool
+
+    def _on_figure_closed(self, _event) -> None:
+        self._stop_heatmap_job()
+        if self._box_pool is not None:
+            self._box_pool.close()
+            self._box_pool = None
+
+    def _stop_heatmap_job(self) -> None:
+        """Cancel the running job and wait until its thread has stopped reading the stack."""
+        job = self._heatmap_job
+        if job is None:
+            return
+        job.cancel.set()
+        job.thread.join()
+        self._heatmap_job = None
+        self._heatmap_restart = False
+        if self._heatmap_timer is not None:
+            self._heatmap_timer.stop()
+        self._clear_heatmap_progress()
+
+    def _poll_heatmap_job(self) -> None:
+        job = self._heatmap_job
+        if job is not None and not job.done():
+            if not job.cancel.is_set():
+                preview = job.preview
+                if preview is not None and preview is not self._heatmap_preview_shown and self.heatmap_enabled:
+                    self._heatmap_preview_shown = preview
+                    factor, area_map = preview
+                    title = f"{self._heatmap_title(job.metric)} (preview {factor}×{factor})"
+                    self._show_heatmap_overlay(area_map, title)
+                self._set_heatmap_progress(*job.progress, flush=False)
+            return
+        if self._heatmap_timer is not None:
+            self._heatmap_timer.stop()
+        if job is None:
+            return
+        self._heatmap_job = None
+        restart = self._heatmap_restart
+        self._heatmap_restart = False
+
+        if job.cancel.is_set() or job.params != self._heatmap_compute_params():
+            self._clear_heatmap_progress()
+            # Rerun with the latest parameters, or show the map they restored from the cache
+            rerun = restart or not self._heatmap_traces_dirty
+            if rerun and self.heatmap_enabled and self._heatmap_needs_update():
+                self._update_heatmap_display()
+                return
+            if self.heatmap_enabled and self.heatmap_overlay is None:
+                self.ax_image.set_title("Z-average — heatmap outdated (click Update)")
+            self._sync_heatmap_update_button()
+            return
+
+        if job.error is not None:
+            self._clear_heatmap_layers()
+            self.ax_image.set_title(f"Z-average (heatmap failed: {job.error})")
+            self._sync_heatmap_update_button()
+            return
+
+        self._heatmap_traces_dirty = False
+        if job.result is None:
+            self.pixel_mean_trace = None
+            self.pixel_rel_x = None
+        else:
+            # The job has stored its result in the heatmap cache
+            self.pixel_rel_x, self.pixel_mean_trace, self._pixel_area_table, area_map = job.result
+            area_window = (int(self.slider_area_left.val), int(self.slider_area_right.val))
+            if area_window == job.area_window:
+                self.area_map_cache = np.asarray(area_map, dtype=np.float64)
+        self._update_heatmap_display()
 
     def _update_heatmap_display_impl(self, integrate_only: bool = False) -> None:
         if not self.heatmap_enabled or self.stack is None:
@@ -3716,25 +5052,11 @@ class StackAnalyzerApp:
         if self.base_image is None:
             self._refresh_base_image()
 
-        need_traces = (
-            not integrate_only
-            and (self._heatmap_traces_dirty or self.pixel_mean_trace is None)
-        )
-        if integrate_only and self.pixel_mean_trace is None:
-            need_traces = True
-
-        if need_traces:
-            if not self._ensure_pixel_mean_traces():
-                self._clear_heatmap_progress()
-                if self._heatmap_traces_dirty:
-                    # Aborted because parameters changed mid-compute.
-                    self.ax_image.set_title("Z-average — heatmap outdated (click Update)")
-                    self.fig.canvas.draw_idle()
-                    return
-                self._clear_heatmap_layers()
-                self.ax_image.set_title("Z-average (heatmap: no valid segments)")
-                self.fig.canvas.draw_idle()
-                return
+        # Clean traces that are None mean "no valid segments" for these parameters.
+        if self._heatmap_traces_dirty and not self._restore_cached_heatmap():
+            # The job's completion re-enters here with the traces in place.
+            self._start_heatmap_job()
+            return
 
         if self.pixel_mean_trace is None or self.pixel_rel_x is None:
             self._clear_heatmap_layers()
@@ -3802,10 +5124,11 @@ class StackAnalyzerApp:
         canonical_pixels = None if bg_row is None else bg_row.get("BG pixels")
 
         mask = self.bg_roi_tool.mask
+        # Compared with and saved to the pickle, so in full-frame coordinates
         new_vertices = (
             None
             if self.bg_roi_tool.vertices is None
-            else np.asarray(self.bg_roi_tool.vertices, dtype=np.float64)
+            else self._roi_to_full_frame(self.bg_roi_tool.vertices)
         )
         has_bg = (
             new_vertices is not None
@@ -4066,10 +5389,83 @@ class StackAnalyzerApp:
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="Interactive TIFF stack ROI analyzer")
-    parser.add_argument("stack", nargs="?", help="Optional path to a .tif stack")
+    parser.add_argument(
+        "stack",
+        nargs="?",
+        help="Optional path to a .tif stack or a Thorlabs per-frame TIFF folder",
+    )
+    parser.add_argument(
+        "--channel",
+        default=None,
+        help="Channel to load when STACK is a per-frame folder (e.g. ChanA)",
+    )
+    parser.add_argument(
+        "--precision",
+        choices=sorted(PRECISION_DTYPES),
+        default=DEFAULT_PRECISION,
+        help="Working precision of the pixel heatmap (default: %(default)s; ROI traces and fits always use float64)",
+    )
+    parser.add_argument(
+        "--bin",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Temporally bin the stack on load, averaging every N frames (default: no binning)",
+    )
+    parser.add_argument(
+        "--crop",
+        type=parse_crop,
+        default=None,
+        metavar="X,Y,W,H",
+        help="Load only this box of each frame; saved ROIs keep full-frame coordinates",
+    )
+    parser.add_argument(
+        "--frames",
+        type=parse_frame_range,
+        default=None,
+        metavar="START:STOP",
+        help="Load only source frames START to STOP (exclusive), before binning",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=POOL_WORKERS,
+        metavar="N",
+        help="Processes for the pixel heatmap (default: one per core; 1 computes in the GUI process)",
+    )
+    parser.add_argument(
+        "--no-preview",
+        action="store_true",
+        help="Compute the heatmap at full resolution only, without the quick binned previews",
+    )
+    parser.add_argument(
+        "--pixel-tiles",
+        action="store_true",
+        help="Let the heatmap write a time-major copy of stacks over 256 MB next to them (as much disk space as the stack)",
+    )
+    parser.add_argument(
+        "--export-bundle",
+        metavar="PICKLE",
+        default=None,
+        help=f"Write PICKLE's rows to '{QUANT_BUNDLE_NAME}' next to it and exit (no GUI)",
+    )
     args = parser.parse_args()
 
-    app = StackAnalyzerApp(initial_path=args.stack)
+    if args.export_bundle:
+        print(f"Wrote {export_quant_bundle(args.export_bundle)}")
+        return
+
+    app = StackAnalyzerApp(
+        initial_path=args.stack,
+        initial_channel=args.channel,
+        precision=args.precision,
+        bin_factor=args.bin,
+        crop=args.crop,
+        frames=args.frames,
+        workers=args.workers,
+        heatmap_preview=not args.no_preview,
+        build_pixel_tiles=args.pixel_tiles,
+    )
     plt.show()
 
 
@@ -0,0 +1,1350 @@
+"""Lazy (frames, height, width) access to TIFF stacks shared by the analysis GUIs.
+
+Uncompressed, contiguous stacks are memory-mapped; everything else is read one
+page at a time on demand, so opening a multi-GB recording does not pull it
+into RAM. Folders of Thorlabs per-frame TIFFs open as virtual stacks without
+writing an intermediate ChanX_stk.tif. A crop box and frame range can be
+applied at open time so only the covering strips / tiles are decoded. Page
+offsets of large stacks are kept in a ``<stem>_page_index.npz`` sidecar, so
+reopening them skips the walk over every IFD.
+Per-pixel analyses can use a time-major copy of the stack
+(``<stem>_pixel_tiles`` sidecar) so that reading full pixel time series is
+sequential instead of striding through every frame."""
+
+from __future__ import annotations
+
+import errno
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+import numpy as np
+import tifffile
+
+DEFAULT_BLOCK_BYTES = 64 * 1024 * 1024
+STATS_CACHE_SUFFIX = "_stack_stats.npz"
+STATS_CACHE_VERSION = 1
+PAGE_INDEX_SUFFIX = "_page_index.npz"
+PAGE_INDEX_VERSION = 1
+PAGE_INDEX_MIN_PAGES = 2000
+HEADER_FINGERPRINT_BYTES = 64 * 1024
+THORLABS_CHANNELS = ("ChanA", "ChanB", "ChanC", "ChanD")
+THORLABS_FRAME_SUFFIXES = (".tif", ".tiff", ".ti")
+DEFAULT_CACHE_FRAMES = 64
+DEFAULT_FRAME_CACHE_BYTES = 256 * 1024 * 1024
+DEFAULT_READ_AHEAD = 16
+PIXEL_TILES_SUFFIX = "_pixel_tiles"
+PIXEL_TILES_VERSION = 1
+PIXEL_TILE_SIZE = 64
+PIXEL_TILES_MIN_BYTES = 256 * 1024 * 1024
+# Free space left on the sidecar's drive after a pixel-tile build, or it is not started
+PIXEL_TILES_FREE_MARGIN_BYTES = 1024 * 1024 * 1024
+STACK_CODECS = ("none", "zlib", "lzma")
+DEFAULT_CODEC = "none"
+
+logger = logging.getLogger(__name__)
+
+
+class LazyStack:
+    """Read-only (frames, height, width) array interface over a frame source."""
+
+    path: Path
+    shape: tuple[int, int, int]
+    dtype: np.dtype
+    pixel_tiles: "PixelTileStore | None" = None
+    # Why the last pixel-tile build failed, if it did (see cached_pixel_tiles)
+    pixel_tiles_error: str | None = None
+
+    @property
+    def ndim(self) -> int:
+        return 3
+
+    @property
+    def size(self) -> int:
+        return int(np.prod(self.shape))
+
+    @property
+    def nbytes(self) -> int:
+        return self.size * self.dtype.itemsize
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        for index in range(self.shape[0]):
+            yield self.read_frame(index)
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        data = self[:]
+        return data if dtype is None else data.astype(dtype, copy=False)
+
+    def __getitem__(self, key) -> np.ndarray:
+        if not isinstance(key, tuple):
+            key = (key,)
+        frame_key, rest = key[0], key[1:]
+        if isinstance(frame_key, (int, np.integer)):
+            frame = self.read_frame(int(frame_key))
+            return frame[rest] if rest else frame
+        indices = np.arange(self.shape[0])[frame_key]
+        spatial = (slice(None), slice(None)) if not rest else rest
+        probe = np.empty(self.shape[1:], dtype=self.dtype)[spatial]
+        out = np.empty((len(indices), *probe.shape), dtype=self.dtype)
+        if all(isinstance(k, slice) for k in spatial):
+            # Slices go through read_region, so subclasses can skip data outside them
+            rows, cols = (*spatial, slice(None))[:2]
+            for out_index, frame_index in enumerate(indices):
+                out[out_index] = self.read_region(int(frame_index), rows, cols)
+            return out
+        for out_index, frame_index in enumerate(indices):
+            out[out_index] = self.read_frame(int(frame_index))[spatial]
+        return out
+
+    def _check_index(self, index: int) -> int:
+        n_frames = self.shape[0]
+        if index < 0:
+            index += n_frames
+        if not 0 <= index < n_frames:
+            raise IndexError(f"Frame {index} out of range for {n_frames} frames")
+        return index
+
+    def read_frame(self, index: int) -> np.ndarray:
+        """Return one frame as a (height, width) array."""
+        raise NotImplementedError
+
+    def read_region(self, index: int, rows: slice, cols: slice) -> np.ndarray:
+        """Return ``frame[rows, cols]``; subclasses may decode only the covering data."""
+        return self.read_frame(index)[rows, cols]
+
+    def file_key(self) -> dict:
+        """Size / mtime / fingerprint identifying the data on disk."""
+        raise NotImplementedError
+
+    def mapped_file(self) -> "MappedStackFile | None":
+        """Where the stack lies uncompressed in one file, or None when it is not memory-mapped."""
+        return None
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "LazyStack":
+        return self
+
+    def __exit__(self, *_exc) -> None:
+        self.close()
+
+
+class TifStack(LazyStack):
+    """Multi-page TIFF stack; memory-mapped when uncompressed and contiguous.
+
+    Stacks with at least ``PAGE_INDEX_MIN_PAGES`` pages get a ``<stem>_page_index.npz``
+    sidecar holding every page's strip / tile offsets. Later opens of the unchanged
+    file (same size / mtime / header) read frames straight from those offsets,
+    decoded with the first page's settings, instead of walking the IFD chain.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self._tif = tifffile.TiffFile(self.path)
+        try:
+            # tifffile's file handle is not safe for concurrent page reads
+            self._read_lock = threading.Lock()
+            self._memmap: np.ndarray | None = None
+            # File offset of self._memmap[0, 0, 0]
+            self._memmap_offset = 0
+            self._page_index: dict | None = None
+            index_path = page_index_path_for_stack(self.path)
+            key = self.file_key()
+            index = load_page_index(index_path, key)
+            if index is not None:
+                self.shape = index["shape"]  # type: ignore[assignment]
+                self.dtype = np.dtype(index["dtype"])
+                self._page_index = index
+                self._memmap = self._memmap_from_index(index)
+            else:
+                self._init_from_series()
+                if self.shape[0] >= PAGE_INDEX_MIN_PAGES:
+                    self._page_index = self._build_page_index()
+                    if self._page_index is not None:
+                        try:
+                            save_page_index(index_path, key, self._page_index)
+                        except OSError:
+                            pass
+        except Exception:
+            self._tif.close()
+            raise
+
+    def _init_from_series(self) -> None:
+        # Appended stacks (see the incremental stack generator) hold one series per
+        # append; consecutive series with the same frame shape form one stack.
+        frame_shape = None
+        counts: list[int] = []
+        for series in self._tif.series:
+            shape = tuple(int(n) for n in series.shape)
+            if len(shape) == 2:
+                shape = (1, *shape)
+            elif len(shape) != 3:
+                if not counts:
+                    raise ValueError(f"Expected 2D or 3D stack, got shape {shape}")
+                break
+            if frame_shape is None:
+                frame_shape = shape[1:]
+                self.dtype = np.dtype(series.dtype)
+            elif shape[1:] != frame_shape or np.dtype(series.dtype) != self.dtype:
+                break
+            counts.append(shape[0])
+        if frame_shape is None:
+            raise ValueError(f"No image series in {self.path}")
+        self.shape = (sum(counts), *frame_shape)  # type: ignore[assignment]
+        self._series_starts = np.cumsum([0] + counts[:-1])
+        if len(counts) == 1:
+            try:
+                mapped = tifffile.memmap(self.path, mode="r")
+                self._memmap = mapped.reshape(self.shape)
+                self._memmap_offset = int(mapped.offset)
+            except (ValueError, OSError):
+                self._memmap = None
+
+    def _build_page_index(self) -> dict | None:
+        """Segment offsets of every page, if all pages decode like the first one."""
+        keyframe = self._tif.pages[0]
+        if keyframe.samplesperpixel != 1 or keyframe.shape != self.shape[1:]:
+            return None
+        layout = _page_layout(keyframe)
+        offsets = []
+        bytecounts = []
+        for series_index in range(len(self._series_starts)):
+            series = self._tif.series[series_index]
+            if _page_layout(series.keyframe) != layout:
+                return None
+            for page in series.pages:
+                if page is None or len(page.dataoffsets) != len(keyframe.dataoffsets):
+                    return None
+                offsets.append(page.dataoffsets)
+                bytecounts.append(page.databytecounts)
+        if len(offsets) != self.shape[0]:
+            return None
+        return {
+            "shape": tuple(self.shape),
+            "dtype": str(self.dtype),
+            "offsets": np.asarray(offsets, dtype=np.int64),
+            "bytecounts": np.asarray(bytecounts, dtype=np.int64),
+        }
+
+    def _memmap_from_index(self, index: dict) -> np.ndarray | None:
+        """Strided memmap when every page is one uncompressed block at a constant stride."""
+        keyframe = self._tif.pages[0]
+        offsets, bytecounts = index["offsets"], index["bytecounts"]
+        frame_bytes = int(np.prod(self.shape[1:])) * self.dtype.itemsize
+        if keyframe.compression != 1 or keyframe.predictor not in (None, 1):
+            return None
+        if keyframe.fillorder != 1 or keyframe.bitspersample != self.dtype.itemsize * 8:
+            return None
+        if offsets.shape[1] != 1 or np.any(bytecounts[:, 0] < frame_bytes):
+            return None
+        strides = np.diff(offsets[:, 0])
+        stride = int(strides[0]) if strides.size else frame_bytes
+        if strides.size and (stride < frame_bytes or np.any(strides != stride)):
+            return None
+        start = int(offsets[0, 0])
+        dtype = self.dtype.newbyteorder(self._tif.byteorder)
+        strides = (stride, self.shape[2] * dtype.itemsize, dtype.itemsize)
+        self._memmap_offset = start
+        return MappedStackFile(self.path, start, self.shape, strides, dtype).open()
+
+    @property
+    def is_memmap(self) -> bool:
+        return self._memmap is not None
+
+    def mapped_file(self) -> "MappedStackFile | None":
+        if self._memmap is None:
+            return None
+        return MappedStackFile(self.path, self._memmap_offset, self.shape, self._memmap.strides, self._memmap.dtype)
+
+    def __getitem__(self, key) -> np.ndarray:
+        if self._memmap is not None:
+            return self._memmap[key]
+        return super().__getitem__(key)
+
+    def _locate(self, index: int) -> tuple[int, int]:
+        series = int(np.searchsorted(self._series_starts, index, side="right")) - 1
+        return series, index - int(self._series_starts[series])
+
+    def read_frame(self, index: int) -> np.ndarray:
+        index = self._check_index(index)
+        if self._memmap is not None:
+            return np.asarray(self._memmap[index], dtype=self.dtype)
+        if self._page_index is not None:
+            height, width = self.shape[1:]
+            return self._read_indexed_box(index, 0, height, 0, width)
+        series, key = self._locate(index)
+        with self._read_lock:
+            frame = self._tif.asarray(key=key, series=series)
+        return np.asarray(frame).reshape(self.shape[1:])
+
+    def read_region(self, index: int, rows: slice, cols: slice) -> np.ndarray:
+        """Decode only the strips / tiles of one page that hold pixels of ``rows`` x ``cols``.
+
+        Positive slice steps are supported; segments between the sampled rows and
+        columns are not read.
+        """
+        index = self._check_index(index)
+        if self._memmap is not None:
+            return np.array(self._memmap[index, rows, cols], dtype=self.dtype)
+        height, width = self.shape[1:]
+        r0, r1, row_step = rows.indices(height)
+        c0, c1, col_step = cols.indices(width)
+        if row_step < 1 or col_step < 1 or r1 <= r0 or c1 <= c0:
+            return super().read_region(index, rows, cols)
+        steps = (row_step, col_step)
+        if self._page_index is not None:
+            return self._read_indexed_box(index, r0, r1, c0, c1, steps)
+        series, key = self._locate(index)
+        with self._read_lock:
+            page = self._tif.series[series].pages[key]
+            if not isinstance(page, tifffile.TiffPage):
+                page = page.aspage()
+            if page.samplesperpixel != 1 or len(page.dataoffsets) < 2:
+                out = None
+            else:
+                out = self._decode_box(page, page.dataoffsets, page.databytecounts, r0, r1, c0, c1, steps)
+        if out is None:
+            return super().read_region(index, rows, cols)
+        return out
+
+    def _read_indexed_box(
+        self, index: int, r0: int, r1: int, c0: int, c1: int, steps: tuple[int, int] = (1, 1)
+    ) -> np.ndarray:
+        offsets = self._page_index["offsets"][index]
+        bytecounts = self._page_index["bytecounts"][index]
+        with self._read_lock:
+            return self._decode_box(self._tif.pages[0], offsets, bytecounts, r0, r1, c0, c1, steps)
+
+    def _decode_box(
+        self, page, offsets, bytecounts, r0: int, r1: int, c0: int, c1: int, steps: tuple[int, int] = (1, 1)
+    ) -> np.ndarray:
+        """Read and decode the segments holding pixels of ``[r0:r1:step, c0:c1:step]``.
+
+        Segments without a sampled row or column are skipped; caller holds ``_read_lock``.
+        """
+        width = self.shape[2]
+        if page.is_tiled:
+            seg_height, seg_width = int(page.tilelength), int(page.tilewidth)
+        else:
+            seg_height, seg_width = int(page.rowsperstrip), width
+        row_step, col_step = steps
+        segs_across = -(-width // seg_width)
+        out = np.zeros((len(range(r0, r1, row_step)), len(range(c0, c1, col_step))), dtype=self.dtype)
+        handle = self._tif.filehandle
+        for seg_row in range(r0 // seg_height, (r1 - 1) // seg_height + 1):
+            y0 = seg_row * seg_height
+            ya = r0 + -(-max(0, y0 - r0) // row_step) * row_step  # first sampled row in the segment
+            yb = min(r1, y0 + seg_height)
+            if ya >= yb:
+                continue
+            for seg_col in range(c0 // seg_width, (c1 - 1) // seg_width + 1):
+                x0 = seg_col * seg_width
+                xa = c0 + -(-max(0, x0 - c0) // col_step) * col_step
+                xb = min(c1, x0 + seg_width)
+                if xa >= xb:
+                    continue
+                seg_index = seg_row * segs_across + seg_col
+                if not bytecounts[seg_index]:
+                    continue  # sparse segment: zeros
+                handle.seek(int(offsets[seg_index]))
+                data = handle.read(int(bytecounts[seg_index]))
+                segment = page.decode(data, seg_index)[0][0, :, :, 0]
+                yb, xb = min(yb, y0 + segment.shape[0]), min(xb, x0 + segment.shape[1])
+                part = segment[ya - y0 : yb - y0 : row_step, xa - x0 : xb - x0 : col_step]
+                out_row, out_col = (ya - r0) // row_step, (xa - c0) // col_step
+                out[out_row : out_row + part.shape[0], out_col : out_col + part.shape[1]] = part
+        return out
+
+    def file_key(self) -> dict:
+        return stack_file_key(self.path)
+
+    def close(self) -> None:
+        self._memmap = None
+        self._tif.close()
+
+
+def _page_layout(page) -> tuple:
+    """Settings that must match for pages to be decoded with the first page."""
+    return (
+        tuple(page.shape),
+        str(page.dtype),
+        int(page.compression),
+        int(page.predictor or 1),
+        bool(page.is_tiled),
+        int(page.tilelength or 0),
+        int(page.tilewidth or 0),
+        int(page.rowsperstrip or 0),
+    )
+
+
+def page_index_path_for_stack(stack_path: str | Path) -> Path:
+    path = Path(stack_path).resolve()
+    return path.with_name(f"{path.stem}{PAGE_INDEX_SUFFIX}")
+
+
+def load_page_index(index_path: Path, key: dict) -> dict | None:
+    """Return the page index when the sidecar matches ``key``, else None."""
+    if not index_path.is_file():
+        return None
+    try:
+        with np.load(index_path, allow_pickle=False) as data:
+            if int(data["version"]) != PAGE_INDEX_VERSION:
+                return None
+            if int(data["file_size"]) != key["size"] or int(data["file_mtime_ns"]) != key["mtime_ns"]:
+                return None
+            if str(data["fingerprint"]) != key["fingerprint"]:
+                return None
+            return {
+                "shape": tuple(int(n) for n in data["shape"]),
+                "dtype": str(data["dtype"]),
+                "offsets": np.array(data["offsets"]),
+                "bytecounts": np.array(data["bytecounts"]),
+            }
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def save_page_index(index_path: Path, key: dict, index: dict) -> None:
+    tmp_path = index_path.with_name(index_path.name + ".tmp")
+    with tmp_path.open("wb") as handle:
+        np.savez(
+            handle,
+            version=np.int64(PAGE_INDEX_VERSION),
+            file_size=np.int64(key["size"]),
+            file_mtime_ns=np.int64(key["mtime_ns"]),
+            fingerprint=np.str_(key["fingerprint"]),
+            shape=np.asarray(index["shape"], dtype=np.int64),
+            dtype=np.str_(index["dtype"]),
+            offsets=index["offsets"],
+            bytecounts=index["bytecounts"],
+        )
+    os.replace(tmp_path, index_path)
+
+
+def natural_sort_key(name: str) -> list:
+    """Sort key that orders embedded numbers numerically (frame 2 before frame 10)."""
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", name)]
+
+
+def thorlabs_frame_files(folder: str | Path, channel: str) -> list[Path]:
+    """Per-frame TIFFs of one channel in acquisition order, Preview files excluded."""
+    folder = Path(folder)
+    names = [
+        name
+        for name in os.listdir(folder)
+        if name.startswith(channel)
+        and name.lower().endswith(THORLABS_FRAME_SUFFIXES)
+        and "Preview" not in name
+    ]
+    return [folder / name for name in sorted(names, key=natural_sort_key)]
+
+
+def thorlabs_channels(folder: str | Path) -> list[str]:
+    """Channels with per-frame TIFFs in ``folder``."""
+    return [channel for channel in THORLABS_CHANNELS if thorlabs_frame_files(folder, channel)]
+
+
+def thorlabs_stack_path(folder: str | Path, channel: str) -> Path:
+    """Where the generator would write the materialized stack for this channel."""
+    return Path(folder).resolve() / "DATA" / channel / f"{channel}_stk.tif"
+
+
+class ThorlabsFolderStack(LazyStack):
+    """Virtual stack over a folder of Thorlabs per-frame TIFFs (ChanA_001_001_001_NNN.tif).
+
+    Files are indexed once and decoded on demand; recently used frames are kept
+    in a small LRU cache. ``path`` points at the ``DATA/<chan>/<chan>_stk.tif``
+    location the stack generator would write, so sidecars and ROI pickles land
+    where they would for a materialized stack.
+    """
+
+    def __init__(
+        self,
+        folder: str | Path,
+        channel: str,
+        cache_frames: int = DEFAULT_CACHE_FRAMES,
+    ) -> None:
+        self.folder = Path(folder).resolve()
+        self.channel = channel
+        self.files = thorlabs_frame_files(self.folder, channel)
+        if not self.files:
+            raise ValueError(f"No {channel} frame files in {self.folder}")
+        first = tifffile.imread(self.files[0], key=0)
+        if first.ndim != 2:
+            raise ValueError(f"Expected 2D frames, got shape {first.shape} in {self.files[0].name}")
+        self.shape = (len(self.files), *first.shape)  # type: ignore[assignment]
+        self.dtype = np.dtype(first.dtype)
+        self.path = thorlabs_stack_path(self.folder, channel)
+        self.cache_frames = max(1, int(cache_frames))
+        self._cache: OrderedDict[int, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self._file_key: dict | None = None
+
+    def read_frame(self, index: int) -> np.ndarray:
+        index = self._check_index(index)
+        with self._lock:
+            frame = self._cache.get(index)
+            if frame is not None:
+                self._cache.move_to_end(index)
+                return frame
+        frame = tifffile.imread(self.files[index], key=0)
+        self._check_frame_shape(index, frame.shape)
+        with self._lock:
+            self._cache[index] = frame
+            while len(self._cache) > self.cache_frames:
+                self._cache.popitem(last=False)
+        return frame
+
+    def read_region(self, index: int, rows: slice, cols: slice) -> np.ndarray:
+        """Slice of a cached frame, else only the covering rows of an uncompressed frame file.
+
+        Region reads (the row bands of per-pixel analyses) do not enter the frame
+        cache, so sweeping bands does not evict the frames kept for scrubbing.
+        """
+        index = self._check_index(index)
+        with self._lock:
+            frame = self._cache.get(index)
+        if frame is not None:
+            return np.array(frame[rows, cols])
+        height, width = self.shape[1:]
+        r0, r1, row_step = rows.indices(height)
+        with tifffile.TiffFile(self.files[index]) as tif:
+            page = tif.pages[0]
+            self._check_frame_shape(index, tuple(page.shape))
+            if (
+                row_step >= 1
+                and r1 > r0
+                and page.is_contiguous
+                and page.compression == 1
+                and page.predictor in (None, 1)
+                and page.fillorder == 1
+                and page.samplesperpixel == 1
+                and page.bitspersample == self.dtype.itemsize * 8
+            ):
+                stop = r0 + (len(range(r0, r1, row_step)) - 1) * row_step + 1
+                row_bytes = width * self.dtype.itemsize
+                handle = tif.filehandle
+                handle.seek(int(page.dataoffsets[0]) + r0 * row_bytes)
+                data = handle.read((stop - r0) * row_bytes)
+                block = np.frombuffer(data, dtype=self.dtype.newbyteorder(tif.byteorder))
+                return block.reshape(stop - r0, width)[::row_step, cols].astype(self.dtype)
+            frame = page.asarray()
+        return np.array(frame.reshape(self.shape[1:])[rows, cols])
+
+    def _check_frame_shape(self, index: int, shape: tuple) -> None:
+        if shape != self.shape[1:]:
+            raise ValueError(f"Frame shape mismatch in {self.files[index].name}: {shape} != {self.shape[1:]}")
+
+    def file_key(self) -> dict:
+        """Key from the folder's mtime, the file names and the first / last file's stat.
+
+        Computed once per instance: stat-ing every frame file is slow on network
+        drives, and a folder that changes while it is open is not supported anyway.
+        """
+        if self._file_key is None:
+            first, last = self.files[0].stat(), self.files[-1].stat()
+            digest = hashlib.sha1()
+            for file_path in self.files:
+                digest.update(file_path.name.encode("utf-8"))
+            digest.update(f"{len(self.files)}:{first.st_size}:{last.st_size}".encode("utf-8"))
+            with self.files[0].open("rb") as handle:
+                digest.update(handle.read(HEADER_FINGERPRINT_BYTES))
+            self._file_key = {
+                "size": int(first.st_size) * len(self.files),
+                "mtime_ns": max(int(self.folder.stat().st_mtime_ns), int(first.st_mtime_ns), int(last.st_mtime_ns)),
+                "fingerprint": digest.hexdigest(),
+            }
+        return dict(self._file_key)
+
+    def close(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+
+class BinnedStack(LazyStack):
+    """Temporal binning view: frame ``i`` is the float32 mean of source frames ``[i*N, (i+1)*N)``.
+
+    A trailing partial bin is dropped. ``path`` is ``<stem>_bin<N>`` next to the
+    source, so sidecar caches of binned and unbinned analyses do not collide.
+    """
+
+    def __init__(self, source: LazyStack, factor: int) -> None:
+        self.source = source
+        self.factor = int(factor)
+        if self.factor < 1:
+            raise ValueError(f"Bin factor must be >= 1, got {factor}")
+        n_frames = source.shape[0] // self.factor
+        if n_frames == 0:
+            raise ValueError(f"Stack has fewer than {self.factor} frames; cannot bin")
+        self.shape = (n_frames, *source.shape[1:])  # type: ignore[assignment]
+        self.dtype = np.dtype(np.float32)
+        self.path = source.path.with_name(f"{source.path.stem}_bin{self.factor}{source.path.suffix}")
+        self.channel = getattr(source, "channel", None)
+
+    def read_frame(self, index: int) -> np.ndarray:
+        index = self._check_index(index)
+        start = index * self.factor
+        block = np.asarray(self.source[start : start + self.factor])
+        return block.mean(axis=0, dtype=np.float64).astype(np.float32)
+
+    def read_region(self, index: int, rows: slice, cols: slice) -> np.ndarray:
+        """Mean of ``source.read_region`` over the bin's source frames, as ``SubStack`` delegates."""
+        index = self._check_index(index)
+        start = index * self.factor
+        block = np.stack(
+            [self.source.read_region(frame, rows, cols) for frame in range(start, start + self.factor)]
+        )
+        return block.mean(axis=0, dtype=np.float64).astype(np.float32)
+
+    def file_key(self) -> dict:
+        key = dict(self.source.file_key())
+        key["fingerprint"] = f"{key['fingerprint']}:bin{self.factor}"
+        return key
+
+    def close(self) -> None:
+        self.source.close()
+
+
+def bin_stack(stack: LazyStack, factor: int) -> LazyStack:
+    """Wrap ``stack`` in a ``BinnedStack`` when ``factor`` > 1."""
+    return stack if int(factor) <= 1 else BinnedStack(stack, factor)
+
+
+class PixelStridedStack:
+    """Strided pixel view: pixel ``(r, c)`` is pixel ``(r * step + step // 2, c * step + step // 2)`` of ``stack``.
+
+    Trailing rows / columns that do not fill a step are dropped. Pixel boxes are
+    read with ``read_pixel_box(..., step=step)`` on the source, so only the sampled
+    pixels' tile series, TIFF strips / tiles or memory-mapped rows are read.
+    Meant for quick previews; it is not a ``LazyStack`` and gets no sidecars of
+    its own.
+    """
+
+    pixel_tiles = None
+
+    def __init__(self, stack, step: int) -> None:
+        self.source = stack
+        self.step = int(step)
+        n_frames, height, width = stack.shape
+        if self.step < 1 or height < self.step or width < self.step:
+            raise ValueError(f"Cannot sample {height}x{width} pixels every {step}")
+        self.shape = (n_frames, height // self.step, width // self.step)
+        self.dtype = np.dtype(stack.dtype)
+
+    def __getitem__(self, key) -> np.ndarray:
+        if not isinstance(key, tuple):
+            key = (key,)
+        frames, rows, cols = (*key, slice(None), slice(None))[:3]
+        if not all(isinstance(k, slice) and k.step in (None, 1) for k in (frames, rows, cols)):
+            raise TypeError("PixelStridedStack supports only contiguous slices")
+        step, offset = self.step, self.step // 2
+        r0, r1, _ = rows.indices(self.shape[1])
+        c0, c1, _ = cols.indices(self.shape[2])
+        return read_pixel_box(
+            self.source,
+            r0 * step + offset,
+            (r1 - 1) * step + offset + 1,
+            c0 * step + offset,
+            (c1 - 1) * step + offset + 1,
+            frames,
+            step,
+        )
+
+
+class SubStack(LazyStack):
+    """Crop / frame-range view: frames ``[start, stop)`` of ``source`` inside an (x, y, w, h) box.
+
+    Frames come from ``source.read_region``, so a TIFF source decodes only the
+    strips or tiles that overlap the crop. ``origin`` is the (x, y) of the crop's
+    top-left pixel and ``frame_offset`` the first source frame, for mapping back
+    to full-frame coordinates. ``path`` is ``<stem>_<tag>`` next to the source,
+    so sidecar caches of partial and full loads do not collide.
+    """
+
+    def __init__(
+        self,
+        source: LazyStack,
+        frames: tuple[int, int] | None = None,
+        crop: tuple[int, int, int, int] | None = None,
+    ) -> None:
+        self.source = source
+        n_frames, height, width = source.shape
+        start, stop = (0, n_frames) if frames is None else (int(frames[0]), int(frames[1]))
+        if not 0 <= start < stop <= n_frames:
+            raise ValueError(f"Frame range {start}:{stop} outside 0:{n_frames}")
+        x0, y0, crop_w, crop_h = (0, 0, width, height) if crop is None else (int(v) for v in crop)
+        if crop_w < 1 or crop_h < 1 or x0 < 0 or y0 < 0 or x0 + crop_w > width or y0 + crop_h > height:
+            raise ValueError(f"Crop {x0},{y0},{crop_w},{crop_h} outside {width}x{height} frame")
+        self.frame_offset = start
+        self.origin = (x0, y0)
+        self.full_shape = tuple(source.shape)
+        self._rows = slice(y0, y0 + crop_h)
+        self._cols = slice(x0, x0 + crop_w)
+        self.shape = (stop - start, crop_h, crop_w)  # type: ignore[assignment]
+        self.dtype = source.dtype
+        parts = []
+        if crop is not None:
+            parts.append(f"crop{x0}-{y0}-{crop_w}x{crop_h}")
+        if frames is not None:
+            parts.append(f"f{start}-{stop}")
+        self.tag = "_".join(parts) or "full"
+        self.path = source.path.with_name(f"{source.path.stem}_{self.tag}{source.path.suffix}")
+        self.channel = getattr(source, "channel", None)
+
+    def read_frame(self, index: int) -> np.ndarray:
+        index = self._check_index(index)
+        return self.source.read_region(self.frame_offset + index, self._rows, self._cols)
+
+    def read_region(self, index: int, rows: slice, cols: slice) -> np.ndarray:
+        index = self._check_index(index)
+        r0, r1, row_step = rows.indices(self.shape[1])
+        c0, c1, col_step = cols.indices(self.shape[2])
+        if row_step < 1 or col_step < 1:
+            return super().read_region(index, rows, cols)
+        y0, x0 = self._rows.start, self._cols.start
+        return self.source.read_region(
+            self.frame_offset + index,
+            slice(y0 + r0, y0 + r1, row_step),
+            slice(x0 + c0, x0 + c1, col_step),
+        )
+
+    def file_key(self) -> dict:
+        key = dict(self.source.file_key())
+        key["fingerprint"] = f"{key['fingerprint']}:{self.tag}"
+        return key
+
+    def mapped_file(self) -> "MappedStackFile | None":
+        mapped = self.source.mapped_file()
+        if mapped is None:
+            return None
+        corner = (self.frame_offset, self._rows.start, self._cols.start)
+        offset = mapped.offset + sum(i * stride for i, stride in zip(corner, mapped.strides))
+        return MappedStackFile(mapped.path, offset, self.shape, mapped.strides, mapped.dtype)
+
+    def close(self) -> None:
+        self.source.close()
+
+
+def sub_stack(
+    stack: LazyStack,
+    frames: tuple[int, int] | None = None,
+    crop: tuple[int, int, int, int] | None = None,
+) -> LazyStack:
+    """Wrap ``stack`` in a ``SubStack`` when a frame range or crop is given."""
+    return stack if frames is None and crop is None else SubStack(stack, frames, crop)
+
+
+def base_stack(stack):
+    """The stack on disk behind ``SubStack`` / ``BinnedStack`` views (their ``source`` chain)."""
+    while isinstance(stack, (SubStack, BinnedStack)):
+        stack = stack.source
+    return stack
+
+
+def parse_crop(text: str) -> tuple[int, int, int, int] | None:
+    """``"x,y,w,h"`` -> (x, y, w, h); blank -> None (full frame)."""
+    parts = [p.strip() for p in str(text).split(",") if p.strip()]
+    if not parts:
+        return None
+    if len(parts) != 4:
+        raise ValueError(f"Crop must be x,y,w,h, got {text!r}")
+    return tuple(int(float(p)) for p in parts)  # type: ignore[return-value]
+
+
+def parse_frame_range(text: str) -> tuple[int, int] | None:
+    """``"start:stop"`` (or ``start-stop``, stop exclusive) -> (start, stop); blank -> None."""
+    text = str(text).strip()
+    if not text:
+        return None
+    parts = re.split(r"\s*[:-]\s*", text)
+    if len(parts) != 2 or not all(parts):
+        raise ValueError(f"Frame range must be start:stop, got {text!r}")
+    return int(parts[0]), int(parts[1])
+
+
+class FrameCache:
+    """Byte-budgeted LRU of decoded frames with read-ahead in the scrub direction.
+
+    ``get`` serves frames for display; after each request a background thread
+    prefetches the next ``read_ahead`` frames in the direction the index last
+    moved, so slider scrubbing mostly hits memory even on slow drives.
+    """
+
+    def __init__(
+        self,
+        stack: LazyStack,
+        budget_bytes: int = DEFAULT_FRAME_CACHE_BYTES,
+        read_ahead: int = DEFAULT_READ_AHEAD,
+    ) -> None:
+        self.stack = stack
+        self.budget_bytes = max(1, int(budget_bytes))
+        frame_bytes = int(np.prod(stack.shape[1:])) * np.dtype(stack.dtype).itemsize
+        # Never prefetch more than half the budget, so read-ahead cannot evict the frame on screen
+        self.read_ahead = max(0, min(int(read_ahead), self.budget_bytes // (2 * max(1, frame_bytes))))
+        self._frames: OrderedDict[int, np.ndarray] = OrderedDict()
+        self._bytes = 0
+        self._wake = threading.Condition()
+        self._wanted: list[int] = []
+        self._last_index: int | None = None
+        self._direction = 1
+        self._closed = False
+        self._thread: threading.Thread | None = None
+
+    def get(self, index: int) -> np.ndarray:
+        """Return frame ``index``, from memory when cached or prefetched."""
+        index = self.stack._check_index(index)
+        with self._wake:
+            frame = self._frames.get(index)
+            if frame is not None:
+                self._frames.move_to_end(index)
+        if frame is None:
+            frame = self.stack.read_frame(index)
+            self._store(index, frame)
+        self._schedule_read_ahead(index)
+        return frame
+
+    def _store(self, index: int, frame: np.ndarray) -> None:
+        with self._wake:
+            if self._closed or index in self._frames:
+                return
+            self._frames[index] = frame
+            self._bytes += frame.nbytes
+            while self._bytes > self.budget_bytes and len(self._frames) > 1:
+                _old_index, old = self._frames.popitem(last=False)
+                self._bytes -= old.nbytes
+
+    def _schedule_read_ahead(self, index: int) -> None:
+        if self.read_ahead == 0:
+            return
+        with self._wake:
+            if self._last_index is not None and index != self._last_index:
+                self._direction = 1 if index > self._last_index else -1
+            self._last_index = index
+            n_frames = self.stack.shape[0]
+            candidates = (index + self._direction * step for step in range(1, self.read_ahead + 1))
+            self._wanted = [i for i in candidates if 0 <= i < n_frames and i not in self._frames]
+            if self._wanted and self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._read_ahead_loop, name="frame-read-ahead", daemon=True)
+                self._thread.start()
+            self._wake.notify()
+
+    def _read_ahead_loop(self) -> None:
+        while True:
+            with self._wake:
+                while not self._closed and not self._wanted:
+                    self._wake.wait()
+                if self._closed:
+                    return
+                index = self._wanted.pop(0)
+                if index in self._frames:
+                    continue
+            try:
+                frame = self.stack.read_frame(index)
+            except Exception:
+                continue  # the foreground read reports real errors
+            self._store(index, frame)
+
+    def close(self) -> None:
+        with self._wake:
+            self._closed = True
+            self._wanted = []
+            self._frames.clear()
+            self._bytes = 0
+            self._wake.notify_all()
+
+
+def open_tif_stack(path: str | Path, channel: str | None = None) -> LazyStack:
+    """Open a TIFF stack file, or a Thorlabs per-frame folder, lazily as (frames, height, width)."""
+    path = Path(path)
+    if path.is_dir():
+        if channel is None:
+            channels = thorlabs_channels(path)
+            if not channels:
+                raise ValueError(f"No Thorlabs channel frames found in {path}")
+            channel = channels[0]
+        return ThorlabsFolderStack(path, channel)
+    return TifStack(path)
+
+
+def frames_per_block(stack, block_bytes: int = DEFAULT_BLOCK_BYTES) -> int:
+    """Number of whole frames that fit into ``block_bytes``."""
+    frame_bytes = int(np.prod(stack.shape[1:])) * np.dtype(stack.dtype).itemsize
+    return max(1, int(block_bytes) // max(1, frame_bytes))
+
+
+def iter_frame_blocks(
+    stack,
+    block_bytes: int = DEFAULT_BLOCK_BYTES,
+) -> Iterator[tuple[int, np.ndarray]]:
+    """Yield ``(first_frame, block)`` with consecutive frame blocks of bounded size."""
+    n_frames = stack.shape[0]
+    step = frames_per_block(stack, block_bytes)
+    for start in range(0, n_frames, step):
+        yield start, np.asarray(stack[start : min(start + step, n_frames)])
+
+
+def row_bands(
+    stack,
+    n_columns: int | None = None,
+    block_bytes: int = DEFAULT_BLOCK_BYTES,
+    align: int = 1,
+    itemsize: int = 8,
+    n_frames: int | None = None,
+) -> list[tuple[int, int]]:
+    """Split the row axis into bands whose full-length time series fit ``block_bytes``.
+
+    ``itemsize`` is the bytes per value of the working copy (8 for float64) and
+    ``n_frames`` the time series length held per pixel (default: every frame).
+    Band heights are rounded down to a multiple of ``align`` (when possible) so bands
+    follow the tile rows of a pixel-tile sidecar.
+    """
+    height, width = stack.shape[1:]
+    n_frames = stack.shape[0] if n_frames is None else int(n_frames)
+    columns = width if n_columns is None else int(n_columns)
+    row_bytes = max(1, n_frames * columns * int(itemsize))
+    step = max(1, min(height, int(block_bytes) // row_bytes))
+    if align > 1 and step >= align:
+        step -= step % align
+    return [(start, min(start + step, height)) for start in range(0, height, step)]
+
+
+def read_pixel_box(
+    stack, r0: int, r1: int, c0: int, c1: int, frames: slice = slice(None), step: int = 1
+) -> np.ndarray:
+    """Time series of a pixel box as (frames, rows, columns), from pixel tiles when present.
+
+    ``stack`` may also be a ``PixelTileStore`` itself. With ``step`` > 1 only every
+    ``step``-th row and column of the box is returned (and read).
+    """
+    tiles = stack if isinstance(stack, PixelTileStore) else getattr(stack, "pixel_tiles", None)
+    if tiles is not None:
+        return tiles.read_pixels(r0, r1, c0, c1, frames, step)
+    return np.asarray(stack[frames, r0:r1:step, c0:c1:step])
+
+
+def stack_mean_image(stack, block_bytes: int = DEFAULT_BLOCK_BYTES) -> np.ndarray:
+    """Mean over the frame axis, streamed in frame blocks."""
+    total = np.zeros(stack.shape[1:], dtype=np.float64)
+    for _start, block in iter_frame_blocks(stack, block_bytes):
+        total += block.sum(axis=0, dtype=np.float64)
+    return total / max(1, stack.shape[0])
+
+
+def stack_masked_mean_trace(
+    stack,
+    mask: np.ndarray,
+    block_bytes: int = DEFAULT_BLOCK_BYTES,
+) -> np.ndarray:
+    """Per-frame mean over ``mask`` pixels, reading only the mask's bounding box."""
+    rows = np.flatnonzero(mask.any(axis=1))
+    cols = np.flatnonzero(mask.any(axis=0))
+    r0, r1 = int(rows[0]), int(rows[-1]) + 1
+    c0, c1 = int(cols[0]), int(cols[-1]) + 1
+    sub_mask = mask[r0:r1, c0:c1]
+    n_frames = stack.shape[0]
+    if getattr(stack, "pixel_tiles", None) is not None:
+        # Time-major tiles: read the box in row bands and accumulate per-frame sums
+        total = np.zeros(n_frames, dtype=np.float64)
+        itemsize = np.dtype(stack.dtype).itemsize
+        band_rows = max(1, int(block_bytes) // max(1, n_frames * (c1 - c0) * itemsize))
+        for band_start in range(r0, r1, band_rows):
+            band_stop = min(band_start + band_rows, r1)
+            band_mask = sub_mask[band_start - r0 : band_stop - r0]
+            if not band_mask.any():
+                continue
+            box = read_pixel_box(stack, band_start, band_stop, c0, c1)
+            total += box[:, band_mask].sum(axis=1, dtype=np.float64)
+        return total / int(sub_mask.sum())
+    trace = np.empty(n_frames, dtype=np.float64)
+    box_bytes = (r1 - r0) * (c1 - c0) * np.dtype(stack.dtype).itemsize
+    step = max(1, int(block_bytes) // max(1, box_bytes))
+    for start in range(0, n_frames, step):
+        stop = min(start + step, n_frames)
+        block = np.asarray(stack[start:stop, r0:r1, c0:c1])
+        trace[start:stop] = block[:, sub_mask].mean(axis=1, dtype=np.float64)
+    return trace
+
+
+STATS_ARRAY_FIELDS = ("z_average", "frame_mean", "frame_min", "frame_max")
+
+
+def compute_stack_statistics(
+    stack,
+    block_bytes: int = DEFAULT_BLOCK_BYTES,
+    progress=None,
+) -> dict:
+    """Z-average plus per-frame mean, min and max (and dtype/shape) in one read of the stack.
+
+    ``progress`` is called with the fraction of frames read after each block.
+    """
+    n_frames = stack.shape[0]
+    total = np.zeros(stack.shape[1:], dtype=np.float64)
+    frame_mean = np.empty(n_frames, dtype=np.float64)
+    frame_min = np.empty(n_frames, dtype=np.float64)
+    frame_max = np.empty(n_frames, dtype=np.float64)
+    for start, block in iter_frame_blocks(stack, block_bytes):
+        stop = start + block.shape[0]
+        total += block.sum(axis=0, dtype=np.float64)
+        flat = block.reshape(block.shape[0], -1)
+        frame_mean[start:stop] = flat.mean(axis=1, dtype=np.float64)
+        frame_min[start:stop] = flat.min(axis=1)
+        frame_max[start:stop] = flat.max(axis=1)
+        if progress is not None:
+            progress(stop / max(1, n_frames))
+    return {
+        "z_average": total / max(1, n_frames),
+        "frame_mean": frame_mean,
+        "frame_min": frame_min,
+        "frame_max": frame_max,
+        "dtype": np.dtype(stack.dtype).str,
+        "shape": tuple(int(n) for n in stack.shape),
+    }
+
+
+def stats_cache_path_for_stack(stack_path: str | Path) -> Path:
+    path = Path(stack_path).resolve()
+    return path.with_name(f"{path.stem}{STATS_CACHE_SUFFIX}")
+
+
+def stack_file_key(path: str | Path) -> dict:
+    """Identify a stack file by size, mtime and a hash of its leading header bytes."""
+    path = Path(path)
+    stat = path.stat()
+    with path.open("rb") as handle:
+        fingerprint = hashlib.sha1(handle.read(HEADER_FINGERPRINT_BYTES)).hexdigest()
+    return {"size": int(stat.st_size), "mtime_ns": int(stat.st_mtime_ns), "fingerprint": fingerprint}
+
+
+def load_stack_statistics(cache_path: Path, key: dict) -> dict | None:
+    """Return cached statistics when the sidecar matches ``key``, else None."""
+    if not cache_path.is_file():
+        return None
+    try:
+        with np.load(cache_path, allow_pickle=False) as data:
+            if int(data["version"]) != STATS_CACHE_VERSION:
+                return None
+            if int(data["file_size"]) != key["size"] or int(data["file_mtime_ns"]) != key["mtime_ns"]:
+                return None
+            if str(data["fingerprint"]) != key["fingerprint"]:
+                return None
+            stats = {field: np.array(data[field]) for field in STATS_ARRAY_FIELDS}
+            stats["dtype"] = str(data["dtype"])
+            stats["shape"] = tuple(int(n) for n in data["shape"])
+            return stats
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def save_stack_statistics(cache_path: Path, key: dict, stats: dict) -> None:
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_name(cache_path.name + ".tmp")
+    with tmp_path.open("wb") as handle:
+        np.savez(
+            handle,
+            version=np.int64(STATS_CACHE_VERSION),
+            file_size=np.int64(key["size"]),
+            file_mtime_ns=np.int64(key["mtime_ns"]),
+            fingerprint=np.str_(key["fingerprint"]),
+            dtype=np.str_(stats["dtype"]),
+            shape=np.asarray(stats["shape"], dtype=np.int64),
+            **{field: stats[field] for field in STATS_ARRAY_FIELDS},
+        )
+    os.replace(tmp_path, cache_path)
+
+
+def cached_stack_statistics(stack: LazyStack, progress=None) -> dict:
+    """Load statistics from the sidecar cache next to the stack, computing them on a miss."""
+    cache_path = stats_cache_path_for_stack(stack.path)
+    key = stack.file_key()
+    stats = load_stack_statistics(cache_path, key)
+    if stats is not None and stats["shape"] == tuple(stack.shape):
+        return stats
+    stats = compute_stack_statistics(stack, progress=progress)
+    try:
+        save_stack_statistics(cache_path, key, stats)
+    except OSError:
+        pass
+    return stats
+
+
+class MappedStackFile:
+    """An uncompressed (frames, height, width) array at ``offset`` in a file, with byte ``strides``.
+
+    Pickles as the path and layout, so another process (a heatmap pool worker)
+    can ``open`` its own memory map of the stack instead of receiving a copy.
+    """
+
+    def __init__(self, path: str | Path, offset: int, shape: tuple, strides: tuple, dtype) -> None:
+        self.path = Path(path)
+        self.offset = int(offset)
+        self.shape = tuple(int(n) for n in shape)
+        self.strides = tuple(int(n) for n in strides)
+        self.dtype = np.dtype(dtype)
+
+    def open(self) -> np.ndarray:
+        """A read-only memory-mapped view of the array."""
+        span = sum((n - 1) * stride for n, stride in zip(self.shape, self.strides)) + self.dtype.itemsize
+        raw = np.memmap(self.path, dtype=np.uint8, mode="r", offset=self.offset, shape=(span,))
+        return np.ndarray(self.shape, dtype=self.dtype, buffer=raw, strides=self.strides)
+
+
+class PixelTileStore:
+    """Time-major copy of a stack: ``(rows, columns, frames)`` ``.npy`` tiles in a sidecar directory.
+
+    Each tile holds the full time series of a ``tile`` x ``tile`` pixel block
+    contiguously, so per-pixel reads are sequential. Tiles are memory-mapped
+    on demand.
+    """
+
+    def __init__(self, directory: str | Path, meta: dict) -> None:
+        self.directory = Path(directory)
+        self.shape = tuple(int(n) for n in meta["shape"])
+        self.dtype = np.dtype(meta["dtype"])
+        self.tile = int(meta["tile"])
+
+    def tile_path(self, tile_row: int, tile_col: int) -> Path:
+        return self.directory / f"tile_{tile_row:04d}_{tile_col:04d}.npy"
+
+    def read_pixels(
+        self, r0: int, r1: int, c0: int, c1: int, frames: slice = slice(None), step: int = 1
+    ) -> np.ndarray:
+        """Return pixels ``[r0:r1:step, c0:c1:step]`` over ``frames`` as a (frames, rows, columns) array."""
+        n_frames = len(range(*frames.indices(self.shape[0])))
+        tile = self.tile
+        out = np.empty((len(range(r0, r1, step)), len(range(c0, c1, step)), n_frames), dtype=self.dtype)
+        for tile_row in range(r0 // tile, (r1 - 1) // tile + 1):
+            tr0 = r0 + -(-max(0, tile_row * tile - r0) // step) * step  # first sampled row in the tile
+            tr1 = min(r1, (tile_row + 1) * tile)
+            if tr0 >= tr1:
+                continue
+            for tile_col in range(c0 // tile, (c1 - 1) // tile + 1):
+                tc0 = c0 + -(-max(0, tile_col * tile - c0) // step) * step
+                tc1 = min(c1, (tile_col + 1) * tile)
+                if tc0 >= tc1:
+                    continue
+                data = np.load(self.tile_path(tile_row, tile_col), mmap_mode="r")
+                part = data[
+                    tr0 - tile_row * tile : tr1 - tile_row * tile : step,
+                    tc0 - tile_col * tile : tc1 - tile_col * tile : step,
+                    frames,
+                ]
+                out_row, out_col = (tr0 - r0) // step, (tc0 - c0) // step
+                out[out_row : out_row + part.shape[0], out_col : out_col + part.shape[1]] = part
+        return out.transpose(2, 0, 1)
+
+
+def pixel_tiles_dir_for_stack(stack_path: str | Path) -> Path:
+    path = Path(stack_path).resolve()
+    return path.with_name(f"{path.stem}{PIXEL_TILES_SUFFIX}")
+
+
+def load_pixel_tiles(directory: Path, key: dict, shape: tuple) -> PixelTileStore | None:
+    """Return the tile store when its metadata matches ``key`` and ``shape``, else None."""
+    meta_path = directory / "meta.json"
+    if not meta_path.is_file():
+        return None
+    try:
+        with meta_path.open("r", encoding="utf-8") as handle:
+            meta = json.load(handle)
+        if int(meta["version"]) != PIXEL_TILES_VERSION:
+            return None
+        if meta["key"] != key or tuple(meta["shape"]) != tuple(shape):
+            return None
+        return PixelTileStore(directory, meta)
+    except (OSError, KeyError, ValueError, TypeError):
+        return None
+
+
+def build_pixel_tiles(
+    stack,
+    directory: Path,
+    key: dict,
+    tile: int = PIXEL_TILE_SIZE,
+    block_bytes: int = DEFAULT_BLOCK_BYTES,
+    progress=None,
+    free_margin_bytes: int = PIXEL_TILES_FREE_MARGIN_BYTES,
+) -> PixelTileStore:
+    """Write the time-major tile sidecar for ``stack`` in one streamed pass over its frames.
+
+    Raises ``OSError`` (ENOSPC) without writing anything when the drive would keep
+    less than ``free_margin_bytes`` free; a failed build leaves no partial files.
+    Tiles are memory-mapped one at a time while a block of frames is distributed.
+    """
+    n_frames, height, width = stack.shape
+    needed = int(np.prod(stack.shape)) * np.dtype(stack.dtype).itemsize
+    directory.parent.mkdir(parents=True, exist_ok=True)
+    free = shutil.disk_usage(directory.parent).free
+    if free - needed < free_margin_bytes:
+        raise OSError(
+            errno.ENOSPC,
+            f"pixel tiles need {needed / 1e9:.1f} GB, {free / 1e9:.1f} GB free on the drive",
+            str(directory),
+        )
+    tmp_dir = directory.with_name(directory.name + ".tmp")
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+    meta = {
+        "version": PIXEL_TILES_VERSION,
+        "key": key,
+        "shape": [int(n) for n in stack.shape],
+        "dtype": np.dtype(stack.dtype).str,
+        "tile": int(tile),
+    }
+    store = PixelTileStore(tmp_dir, meta)
+    try:
+        tmp_dir.mkdir(parents=True)
+        tiles = {}
+        for tile_row in range(0, (height + tile - 1) // tile):
+            for tile_col in range(0, (width + tile - 1) // tile):
+                rows = min(tile, height - tile_row * tile)
+                cols = min(tile, width - tile_col * tile)
+                path = store.tile_path(tile_row, tile_col)
+                np.lib.format.open_memmap(path, mode="w+", dtype=stack.dtype, shape=(rows, cols, n_frames))
+                tiles[tile_row, tile_col] = path
+        for start, block in iter_frame_blocks(stack, block_bytes):
+            stop = start + block.shape[0]
+            for (tile_row, tile_col), path in tiles.items():
+                data = np.load(path, mmap_mode="r+")
+                r0, c0 = tile_row * tile, tile_col * tile
+                data[:, :, start:stop] = block[:, r0 : r0 + data.shape[0], c0 : c0 + data.shape[1]].transpose(1, 2, 0)
+                del data
+            if progress is not None:
+                progress(stop / max(1, n_frames))
+        with (tmp_dir / "meta.json").open("w", encoding="utf-8") as handle:
+            json.dump(meta, handle)
+        if directory.exists():
+            shutil.rmtree(directory)
+        os.replace(tmp_dir, directory)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return PixelTileStore(directory, meta)
+
+
+def cached_pixel_tiles(
+    stack,
+    build: bool = False,
+    min_bytes: int = PIXEL_TILES_MIN_BYTES,
+    progress=None,
+) -> PixelTileStore | None:
+    """Attach the pixel-tile sidecar to ``stack`` (``stack.pixel_tiles``); with ``build``, write it if missing.
+
+    Building writes a second copy of the stack next to it, so it is only done
+    when asked for. Stacks smaller than ``min_bytes`` are read directly and get
+    no sidecar. Returns None when no tiles are available (plain arrays, small
+    stacks, no sidecar yet, or a failed build); a failed build is logged and its
+    reason kept in ``stack.pixel_tiles_error``, and is not retried for the stack.
+    """
+    if not isinstance(stack, LazyStack):
+        return None
+    if stack.pixel_tiles is not None:
+        return stack.pixel_tiles
+    if stack.nbytes < min_bytes:
+        return None
+    directory = pixel_tiles_dir_for_stack(stack.path)
+    key = stack.file_key()
+    tiles = load_pixel_tiles(directory, key, stack.shape)
+    if tiles is None and build and stack.pixel_tiles_error is None:
+        try:
+            tiles = build_pixel_tiles(stack, directory, key, progress=progress)
+        except OSError as exc:
+            stack.pixel_tiles_error = str(exc)
+            logger.warning("Pixel-tile sidecar for %s not built, reading frames directly: %s", stack.path, exc)
+    stack.pixel_tiles = tiles
+    return tiles
+
+
+def stack_write_options(
+    dtype,
+    codec: str = DEFAULT_CODEC,
+    level: int | None = None,
+    predictor: bool = True,
+    tile: int | None = None,
+    rowsperstrip: int | None = None,
+) -> dict:
+    """``TiffWriter.write`` keyword arguments for a lossless codec.
+
+    ``codec`` is "none", "zlib" (deflate) or "lzma". Integer data is compressed
+    with the horizontal-differencing predictor unless ``predictor`` is False.
+    ``tile`` writes square tiles of that size (a multiple of 16, as TIFF requires)
+    instead of strips.
+    """
+    if codec not in STACK_CODECS:
+        raise ValueError(f"Unknown codec {codec!r}; expected one of {', '.join(STACK_CODECS)}")
+    if tile and int(tile) % 16:
+        raise ValueError(f"Tile size must be a multiple of 16, got {tile}")
+    options: dict = {"photometric": "minisblack"}
+    if codec != "none":
+        options["compression"] = codec
+        if level is not None:
+            options["compressionargs"] = {"level": int(level)}
+        if predictor and np.issubdtype(np.dtype(dtype), np.integer):
+            options["predictor"] = True
+    if tile:
+        options["tile"] = (int(tile), int(tile))
+    elif rowsperstrip:
+        options["rowsperstrip"] = int(rowsperstrip)
+    return options
+
+
+def iter_write_segments(frames: Iterable[np.ndarray], tile: tuple[int, int] | None = None) -> Iterator[np.ndarray]:
+    """Frames in the order ``TiffWriter`` expects: whole pages, or zero-padded tiles row by row."""
+    if not tile:
+        yield from frames
+        return
+    tile_rows, tile_cols = tile
+    for frame in frames:
+        height, width = frame.shape
+        for r0 in range(0, height, tile_rows):
+            for c0 in range(0, width, tile_cols):
+                segment = frame[r0 : r0 + tile_rows, c0 : c0 + tile_cols]
+                if segment.shape != (tile_rows, tile_cols):
+                    padded = np.zeros((tile_rows, tile_cols), dtype=frame.dtype)
+                    padded[: segment.shape[0], : segment.shape[1]] = segment
+                    segment = padded
+                yield segment
+
+
+def write_stack_frames(writer, frames: Iterable[np.ndarray], shape: tuple, dtype, options: dict | None = None) -> None:
+    """Stream ``frames`` as one (frames, height, width) series with ``stack_write_options``."""
+    options = dict(options) if options else {"photometric": "minisblack"}
+    writer.write(
+        iter_write_segments(frames, options.get("tile")),
+        shape=tuple(shape),
+        dtype=dtype,
+        **options,
+    )
+
+
+def add_codec_arguments(parser) -> None:
+    """Add --compression / --level / --tile / --rowsperstrip options to an argparse parser."""
+    parser.add_argument(
+        "--compression",
+        choices=STACK_CODECS,
+        default=DEFAULT_CODEC,
+        help="Lossless codec for written stacks; zlib (deflate) uses the horizontal predictor (default: %(default)s)",
+    )
+    parser.add_argument("--level", type=int, default=None, help="Compression level for zlib / lzma")
+    parser.add_argument("--tile", type=int, default=None, help="Write square tiles of this size (multiple of 16) instead of strips")
+    parser.add_argument("--rowsperstrip", type=int, default=None, help="Rows per strip for strip-based output")
+
+
+def codec_options_from_args(args) -> dict:
+    """Codec settings from ``add_codec_arguments`` options, for ``stack_write_options(dtype, **...)``."""
+    return {
+        "codec": args.compression,
+        "level": args.level,
+        "tile": args.tile,
+        "rowsperstrip": args.rowsperstrip,
+    }
@@ -0,0 +1,23 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+import tifffile
+
+# The scripts live at the repository root and are imported as top-level modules
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+@pytest.fixture
+def frame_folder(tmp_path):
+    """Write ``n`` Thorlabs-style per-frame TIFFs of one channel; returns (folder, frames)."""
+
+    def make(n_frames, shape=(16, 12), channel="ChanA", seed=0):
+        rng = np.random.default_rng(seed)
+        frames = rng.integers(0, 4000, (n_frames, *shape), dtype=np.uint16)
+        for index, frame in enumerate(frames, start=1):
+            tifffile.imwrite(tmp_path / f"{channel}_001_001_001_{index:03d}.tif", frame)
+        return tmp_path, frames
+
+    return make
@@ -0,0 +1,146 @@
+import numpy as np
+import pytest
+import tifffile
+
+import stack_analyzer as sa
+from stack_io import TifStack
+
+PARAMS = ((5, 40), 7, 2, 30, 0.2)
+
+
+@pytest.fixture
+def stack(tmp_path):
+    frames = np.random.default_rng(4).integers(100, 2000, (80, 12, 10), dtype=np.uint16)
+    path = tmp_path / "stack.tif"
+    tifffile.imwrite(path, frames, photometric="minisblack")
+    with TifStack(path) as stack:
+        yield stack
+
+
+def _entry(seed, n=36, shape=(12, 10)):
+    rng = np.random.default_rng(seed)
+    return np.arange(1, n + 1), rng.standard_normal((n, *shape))
+
+
+def _key(seed):
+    return sa.heatmap_cache_key((*PARAMS[:-1], 0.1 * seed), np.float64)
+
+
+def _small_cache(stack):
+    # Room for one entry in memory, so every second put evicts the older one
+    return sa.HeatmapCache(stack, budget_bytes=sa.HeatmapCache._entry_bytes((None, *_one_entry())) + 1)
+
+
+def _one_entry():
+    rel_x, mean_trace = _entry(0)
+    return mean_trace, sa.CumulativeArea(rel_x, mean_trace)
+
+
+def test_evictions_wait_for_flush_then_restore_from_disk(stack):
+    cache = _small_cache(stack)
+    first = _entry(1)
+    cache.put(_key(1), *first)
+    cache.put(_key(2), *_entry(2))
+    assert cache.peek(_key(1)) is None
+    assert not cache.directory.exists()
+
+    cache.flush_spills()
+    assert len(list(cache.directory.glob("*.npz"))) == 1
+
+    reopened = _small_cache(stack)
+    assert reopened.peek(_key(1)) is None
+    rel_x, mean_trace, table = reopened.get(_key(1))
+    np.testing.assert_array_equal(rel_x, first[0])
+    np.testing.assert_array_equal(mean_trace, first[1])
+    np.testing.assert_array_equal(table.area(3, 20), sa.CumulativeArea(*first).area(3, 20))
+    assert reopened.peek(_key(1)) is not None
+
+
+def test_get_takes_back_an_unflushed_eviction(stack, monkeypatch):
+    cache = _small_cache(stack)
+    first = _entry(1)
+    cache.put(_key(1), *first)
+    cache.put(_key(2), *_entry(2))
+    monkeypatch.setattr(sa.HeatmapCache, "_load", lambda self, params: pytest.fail("read the disk"))
+    assert cache.get(_key(1))[1] is first[1]
+
+
+def test_peek_and_put_do_no_disk_io(stack, monkeypatch):
+    cache = _small_cache(stack)
+    cache.put(_key(1), *_entry(1))
+    cache.flush_spills()
+    cache.clear()
+    monkeypatch.setattr(sa.HeatmapCache, "_load", lambda self, params: pytest.fail("read the disk"))
+    monkeypatch.setattr(sa.HeatmapCache, "_spill", lambda self, params, entry: pytest.fail("wrote the disk"))
+    assert cache.peek(_key(1)) is None
+    for seed in range(2, 5):
+        cache.put(_key(seed), *_entry(seed))
+
+
+def test_job_restores_from_disk_without_computing(stack, monkeypatch):
+    key = sa.heatmap_cache_key(PARAMS, np.float64)
+    rel_x, mean_trace = _entry(3)
+    writer = _small_cache(stack)
+    writer.put(key, rel_x, mean_trace)
+    writer.put(_key(9), *_entry(9))
+    writer.flush_spills()
+
+    def no_compute(*args, **kwargs):
+        raise AssertionError("recomputed a cached heatmap")
+
+    monkeypatch.setattr(sa, "compute_all_pixel_mean_traces", no_compute)
+    cache = _small_cache(stack)
+    job = sa.HeatmapJob(stack, PARAMS, (3, 20), np.float64, preview_bins=(2,), cache=cache)
+    job.start()
+    job.thread.join()
+    assert job.error is None
+    np.testing.assert_array_equal(job.result[1], mean_trace)
+    assert job.result[3].shape == stack.shape[1:]
+    assert cache.peek(key) is not None
+
+
+def test_job_stores_and_spills_its_result(stack):
+    cache = _small_cache(stack)
+    cache.put(_key(1), *_entry(1))
+    job = sa.HeatmapJob(stack, PARAMS, (3, 20), np.float64, cache=cache)
+    job.start()
+    job.thread.join()
+    assert job.error is None
+    assert cache.peek(sa.heatmap_cache_key(PARAMS, np.float64))[1] is job.result[1]
+    # The evicted entry went to disk on the worker
+    assert len(list(cache.directory.glob("*.npz"))) == 1
+
+
+@pytest.mark.parametrize("preview_bins", [(), (2,)], ids=["full", "preview"])
+def test_cancelled_job_publishes_nothing(stack, preview_bins):
+    cache = sa.HeatmapCache(stack, spill=False)
+    job = sa.HeatmapJob(stack, PARAMS, (3, 20), np.float64, preview_bins=preview_bins, cache=cache)
+    stages = []
+    report = job._report
+
+    def cancel_on_second_report(stage, fraction):
+        stages.append(stage)
+        if len(stages) == 2:
+            job.cancel.set()
+        report(stage, fraction)
+
+    job._report = cancel_on_second_report
+    job.start()
+    job.thread.join(timeout=30)
+    assert job.done()
+    assert job.error is None and job.result is None and job.preview is None
+    assert len(stages) == 2
+    assert cache.peek(sa.heatmap_cache_key(PARAMS, np.float64)) is None
+
+
+def test_job_cancelled_before_start_does_no_work(stack, monkeypatch):
+    def no_read(*args):
+        raise AssertionError("read the stack")  # lands in job.error
+
+    for name in ("__getitem__", "read_frame", "read_region"):
+        monkeypatch.setattr(TifStack, name, no_read)
+    job = sa.HeatmapJob(stack, PARAMS, (3, 20), np.float64, preview_bins=(2,))
+    job.cancel.set()
+    job.start()
+    job.thread.join(timeout=30)
+    assert job.error is None and job.result is None and job.preview is None
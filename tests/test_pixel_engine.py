@@ -0,0 +1,97 @@
+import pickle
+
+import numpy as np
+import pytest
+import tifffile
+
+import pixel_engine
+import stack_analyzer as sa
+from pixel_engine import POOL_MIN_WORK, BoxPool, SharedArray, pool_source
+from stack_io import MappedStackFile, TifStack, sub_stack
+
+STARTS = [5, 60, 110]
+
+
+@pytest.fixture
+def frames():
+    return np.random.default_rng(8).integers(100, 3000, (160, 90, 70), dtype=np.uint16)
+
+
+@pytest.fixture
+def tif_path(tmp_path, frames):
+    path = tmp_path / "stack.tif"
+    tifffile.imwrite(path, frames, photometric="minisblack")
+    return path
+
+
+@pytest.fixture
+def compressed_path(tmp_path, frames):
+    path = tmp_path / "stack_zlib.tif"
+    tifffile.imwrite(path, frames, photometric="minisblack", compression="zlib")
+    return path
+
+
+def test_memmapped_tif_is_reopened_by_path(tif_path, frames):
+    with TifStack(tif_path) as stack:
+        for view, expected in (
+            (stack, frames),
+            (sub_stack(stack, frames=(10, 90), crop=(3, 5, 20, 17)), frames[10:90, 5:22, 3:23]),
+        ):
+            source = pool_source(view)
+            assert isinstance(source, MappedStackFile)
+            # Pickled as the path and layout, not the pixels
+            payload = pickle.dumps(source)
+            assert len(payload) < 1024
+            np.testing.assert_array_equal(pickle.loads(payload).open(), expected)
+
+
+def test_compressed_stack_is_copied_up_to_the_sample_limit(compressed_path, frames):
+    with TifStack(compressed_path) as stack:
+        assert stack.mapped_file() is None
+        assert pool_source(stack, max_copy_samples=frames.size - 1) is None
+        source = pool_source(stack, max_copy_samples=frames.size)
+        try:
+            assert isinstance(source, SharedArray)
+            np.testing.assert_array_equal(source.array, frames)
+        finally:
+            source.close()
+            source.unlink()
+
+
+def test_default_sized_uint16_stack_goes_to_the_pool(monkeypatch):
+    # A 640 MB uint16 stack that is not memory-mapped: its segments cover more than POOL_MIN_WORK samples
+    shape = (POOL_MIN_WORK // (256 * 256) * 5 // 4, 256, 256)
+    stack = np.broadcast_to(np.uint16(1), shape)
+    copied, runs = [], []
+
+    def fake_copy(data):
+        copied.append(data.shape)
+        return SharedArray((1,), np.uint16)
+
+    monkeypatch.setattr(pixel_engine.os, "cpu_count", lambda: 8)
+    monkeypatch.setattr(SharedArray, "from_array", staticmethod(fake_copy))
+    monkeypatch.setattr(BoxPool, "run", lambda self, source, output, boxes, plan, on_done=None: runs.append(len(boxes)))
+    pool = BoxPool(8)
+    try:
+        starts = list(range(20, shape[0] - 200, 200))
+        sa.compute_all_pixel_mean_traces(stack, starts, 200, 1, 0, baseline_fraction=0.1, pool=pool)
+    finally:
+        pool.close()
+    assert copied == [shape]
+    assert len(runs) == 1 and runs[0] > 1
+
+
+@pytest.mark.parametrize("compressed", [False, True], ids=["memmap", "shared-copy"])
+def test_pool_matches_single_core(tif_path, compressed_path, monkeypatch, compressed):
+    monkeypatch.setattr(pixel_engine.os, "cpu_count", lambda: 2)
+    path = compressed_path if compressed else tif_path
+    with TifStack(path) as stack:
+        serial = sa.compute_all_pixel_mean_traces(stack, STARTS, 40, 9, 2)
+        pool = BoxPool(2, min_work=0)
+        try:
+            pooled = sa.compute_all_pixel_mean_traces(stack, STARTS, 40, 9, 2, pool=pool)
+            assert pool._pool is not None
+        finally:
+            pool.close()
+    np.testing.assert_array_equal(pooled[0], serial[0])
+    np.testing.assert_array_equal(pooled[1], serial[1])
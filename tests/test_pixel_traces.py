@@ -0,0 +1,208 @@
+import numpy as np
+import pytest
+import tifffile
+from scipy.integrate import trapezoid
+from scipy.signal import savgol_filter
+
+import stack_analyzer as sa
+from stack_io import TifStack, build_pixel_tiles
+
+
+def _reference_apply_savgol(trace, window, polyorder):
+    window = int(window)
+    if window % 2 == 0:
+        window += 1
+    length = trace.shape[0]
+    max_window = length - 1 if length % 2 == 0 else length
+    window = max(3, min(window, max_window))
+    polyorder = min(int(polyorder), window - 1)
+    if window < 3 or polyorder < 1:
+        return trace.copy()
+    return savgol_filter(trace, window_length=window, polyorder=polyorder, axis=0)
+
+
+def _reference_pixel_mean_traces(stack, starts, extension, window, polyorder, baseline_fraction=0.2):
+    # Whole-stack pipeline the band / chunk engine replaced: smooth every pixel over
+    # the full recording, normalize each segment to its baseline, nanmean the segments.
+    n_frames, height, width = stack.shape
+    smooth = _reference_apply_savgol(stack.reshape(n_frames, -1).astype(np.float64), window, polyorder)
+    baseline_len = max(1, int(round(baseline_fraction * extension)))
+    total_len = baseline_len + extension
+    rel_x = np.arange(1, total_len + 1)
+    aligned_segments = []
+    for start in [start for start in starts if start + extension <= n_frames]:
+        seg_start = max(0, start - baseline_len)
+        raw = smooth[seg_start : start + extension, :]
+        available_baseline = start - seg_start
+        baseline_mean = raw[:available_baseline, :].mean(axis=0)
+        baseline_mean = np.where(baseline_mean == 0, 1.0, baseline_mean)
+        aligned = np.full((total_len, raw.shape[1]), np.nan, dtype=np.float64)
+        offset = baseline_len - available_baseline
+        aligned[offset : offset + raw.shape[0], :] = raw / baseline_mean[np.newaxis, :]
+        aligned_segments.append(aligned)
+    mean_trace = np.nanmean(np.stack(aligned_segments, axis=0), axis=0)
+    return rel_x, mean_trace.reshape(total_len, height, width)
+
+
+def _reference_area(rel_x, mean_values, f_left, f_right, baseline_level=1.0):
+    if f_right < f_left:
+        f_left, f_right = f_right, f_left
+    frames = rel_x.astype(float)
+    values = mean_values - baseline_level
+    overlap = (frames >= f_left) & (frames <= f_right)
+    if not np.any(overlap):
+        return np.zeros(mean_values.shape[1], dtype=np.float64)
+    x = frames[overlap]
+    y = values[overlap, :]
+    if f_left < x[0]:
+        y0 = np.array([np.interp(f_left, frames, values[:, col]) for col in range(values.shape[1])])
+        x = np.concatenate([[f_left], x])
+        y = np.concatenate([y0[np.newaxis, :], y], axis=0)
+    if f_right > x[-1]:
+        y1 = np.array([np.interp(f_right, frames, values[:, col]) for col in range(values.shape[1])])
+        x = np.concatenate([x, [f_right]])
+        y = np.concatenate([y, y1[np.newaxis, :]], axis=0)
+    return trapezoid(y, x, axis=0)
+
+
+@pytest.fixture
+def recording():
+    rng = np.random.default_rng(3)
+    frames = rng.normal(1000, 50, (400, 24, 20))
+    frames[150:190] += 300  # a response after the second start
+    return np.clip(frames, 0, None).astype(np.uint16)
+
+
+# Starts near the recording edges exercise a short baseline and a dropped segment
+STARTS = [5, 140, 260, 380]
+
+
+@pytest.mark.parametrize("window, polyorder", [(11, 3), (2, 1), (51, 2)])
+def test_pixel_mean_traces_match_whole_stack_pipeline(recording, window, polyorder):
+    expected_x, expected = _reference_pixel_mean_traces(recording, STARTS, 60, window, polyorder)
+    rel_x, mean_trace = sa.compute_all_pixel_mean_traces(
+        recording, STARTS, 60, window, polyorder, dtype=np.float64
+    )
+    np.testing.assert_array_equal(rel_x, expected_x)
+    assert mean_trace.dtype == np.float64
+    np.testing.assert_array_equal(mean_trace, expected)
+
+
+def test_pixel_mean_traces_from_tif_and_pixel_tiles(recording, tmp_path):
+    path = tmp_path / "stack.tif"
+    tifffile.imwrite(path, recording, photometric="minisblack")
+    _x, expected = _reference_pixel_mean_traces(recording, STARTS, 60, 11, 3)
+    with TifStack(path) as stack:
+        _x, from_tif = sa.compute_all_pixel_mean_traces(stack, STARTS, 60, 11, 3, dtype=np.float64)
+        stack.pixel_tiles = build_pixel_tiles(stack, tmp_path / "tiles", stack.file_key(), tile=8)
+        _x, from_tiles = sa.compute_all_pixel_mean_traces(stack, STARTS, 60, 11, 3, dtype=np.float64)
+    np.testing.assert_array_equal(from_tif, expected)
+    np.testing.assert_array_equal(from_tiles, expected)
+
+
+def test_pixel_mean_traces_without_valid_starts(recording):
+    assert sa.compute_all_pixel_mean_traces(recording, [390], 60, 11, 3) is None
+
+
+@pytest.mark.parametrize("window", [(1, 72), (10.5, 40.25), (30, 12), (0, 100), (75, 90)])
+def test_cumulative_area_matches_trapezoid(recording, window):
+    rel_x, mean_trace = _reference_pixel_mean_traces(recording, STARTS, 60, 11, 3)
+    values = mean_trace.reshape(mean_trace.shape[0], -1)
+    areas = sa.CumulativeArea(rel_x, mean_trace).area(*window)
+    np.testing.assert_allclose(areas, _reference_area(rel_x, values, *window), rtol=0, atol=1e-13)
+
+
+def test_cumulative_area_propagates_nan():
+    rel_x = np.arange(1, 11)
+    values = np.ones((10, 3)) * 1.5
+    values[6, 1] = np.nan
+    areas = sa.CumulativeArea(rel_x, values).area(2, 5)
+    np.testing.assert_allclose(areas, [1.5, 1.5, 1.5])
+    areas = sa.CumulativeArea(rel_x, values).area(2, 9)
+    assert np.isnan(areas[1]) and not np.isnan(areas[[0, 2]]).any()
+
+
+@pytest.mark.parametrize("window, polyorder", [(11, 3), (51, 2)])
+def test_smoothed_cache_reuse_matches_whole_stack_pipeline(recording, window, polyorder):
+    cache = sa.SmoothedFrameCache()
+    # Later settings overlap the cached frames partly, fully, and not at all
+    settings = [
+        (STARTS, 60, 0.2),
+        ([20, 150], 40, 0.5),
+        ([140, 260], 60, 0.2),
+        ([5, 300, 330], 45, 0.1),
+    ]
+    for starts, extension, baseline_fraction in settings:
+        expected_x, expected = _reference_pixel_mean_traces(
+            recording, starts, extension, window, polyorder, baseline_fraction
+        )
+        rel_x, mean_trace = sa.compute_all_pixel_mean_traces(
+            recording,
+            starts,
+            extension,
+            window,
+            polyorder,
+            baseline_fraction,
+            dtype=np.float64,
+            smoothed_cache=cache,
+        )
+        np.testing.assert_array_equal(rel_x, expected_x)
+        np.testing.assert_array_equal(mean_trace, expected)
+    assert cache.has_setting((sa.savgol_params(recording.shape[0], window, polyorder), np.dtype(np.float64).str))
+
+
+def _reference_metrics(rel_x, values, f_left, f_right, onset):
+    # One pixel at a time: walk out from the peak to the half-maximum crossings
+    x = rel_x.astype(float)
+    inside = (x >= f_left) & (x <= f_right)
+    wx = x[inside]
+    peaks, times, widths = [], [], []
+    for y in (values[inside] - 1.0).T:
+        if np.isnan(y).all():
+            peaks.append(np.nan), times.append(np.nan), widths.append(np.nan)
+            continue
+        p = int(np.nanargmax(y))
+        peak, half = y[p], y[p] / 2
+        peaks.append(peak)
+        times.append(wx[p] - onset)
+        if not peak > 0:
+            widths.append(np.nan)
+            continue
+        i = p
+        while i > 0 and y[i - 1] >= half:
+            i -= 1
+        left = wx[0] if i == 0 else wx[i - 1] + (half - y[i - 1]) / (y[i] - y[i - 1]) * (wx[i] - wx[i - 1])
+        j = p
+        while j < len(y) - 1 and y[j + 1] >= half:
+            j += 1
+        right = wx[-1] if j == len(y) - 1 else wx[j] + (y[j] - half) / (y[j] - y[j + 1]) * (wx[j + 1] - wx[j])
+        widths.append(right - left)
+    return {"Peak": np.array(peaks), "Time to peak": np.array(times), "FWHM": np.array(widths)}
+
+
+def test_pixel_metric_maps_of_a_triangle():
+    rel_x = np.arange(1, 22)
+    triangle = 1 + np.maximum(0, 4 - np.abs(rel_x - 11.0))
+    values = np.stack([triangle, 2 - triangle, np.full(21, np.nan)], axis=1)
+    maps = sa.pixel_metric_maps(rel_x, values, 1, 21, onset=5)
+    np.testing.assert_allclose(maps["Peak"][:2], [4, 0])
+    np.testing.assert_allclose(maps["Time to peak"][0], 6)
+    np.testing.assert_allclose(maps["FWHM"][0], 4)
+    assert np.isnan(maps["FWHM"][1])
+    for name in ("Peak", "Time to peak", "FWHM"):
+        assert np.isnan(maps[name][2])
+    # A window edge inside the half-maximum run cuts the width there
+    np.testing.assert_allclose(sa.pixel_metric_maps(rel_x, values, 10, 21)["FWHM"][0], 3)
+
+
+@pytest.mark.parametrize("window", [(1, 72), (15, 40), (30, 12), (75, 90)])
+def test_pixel_metric_maps_match_per_pixel_reference(recording, window):
+    rel_x, mean_trace = _reference_pixel_mean_traces(recording, STARTS, 60, 11, 3)
+    values = mean_trace.reshape(mean_trace.shape[0], -1)
+    table = sa.CumulativeArea(rel_x, mean_trace)
+    maps = sa.pixel_metric_maps(rel_x, mean_trace, *window, onset=13, area_table=table)
+    assert sorted(maps) == sorted(sa.HEATMAP_METRICS)
+    np.testing.assert_array_equal(maps["Area"], table.area(*window))
+    expected = _reference_metrics(rel_x, values, min(window), max(window), 13)
+    for name, reference in expected.items():
+        np.testing.assert_allclose(maps[name], reference, rtol=1e-12, atol=1e-12, err_msg=name)
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from quant_bundle import QUANT_BUNDLE_VERSION, load_quant_bundle, pad_rows, save_quant_bundle
+
+
+@pytest.fixture
+def arrays():
+    traces, n_traces = pad_rows([[1.0, 2.0, 3.0], None, [4.0]])
+    return {
+        "traces": traces,
+        "n_traces": n_traces,
+        "centers": np.asfortranarray(np.arange(12, dtype=np.float32).reshape(3, 4)),
+        "labels": np.array([3, -1, 7], dtype=np.int16),
+        "empty": np.zeros((0, 5)),
+    }
+
+
+def test_pad_rows_pads_and_counts():
+    padded, lengths = pad_rows([[1, 2], None, [[3]]], fill=-1, dtype=np.int64, inner_shape=(1,))
+    np.testing.assert_array_equal(lengths, [2, 0, 1])
+    assert padded.shape == (3, 2, 1)
+    np.testing.assert_array_equal(padded[:, :, 0], [[1, 2], [-1, -1], [3, -1]])
+
+
+@pytest.mark.parametrize("mmap_mode", [None, "r"])
+def test_bundle_round_trip(tmp_path, arrays, mmap_mode):
+    path = tmp_path / "bundle.npz"
+    save_quant_bundle(path, arrays)
+    loaded = load_quant_bundle(path, mmap_mode=mmap_mode)
+    assert int(loaded.pop("bundle_version")) == QUANT_BUNDLE_VERSION
+    assert sorted(loaded) == sorted(arrays)
+    for name, expected in arrays.items():
+        assert loaded[name].dtype == expected.dtype
+        np.testing.assert_array_equal(loaded[name], expected)
+    if mmap_mode is not None:
+        for name in ("traces", "centers", "labels"):
+            assert isinstance(loaded[name], np.memmap)
+            assert not loaded[name].flags.writeable
+
+
+def test_compressed_members_are_read_into_memory(tmp_path, arrays):
+    path = tmp_path / "compressed.npz"
+    np.savez_compressed(path, **arrays)
+    loaded = load_quant_bundle(path, mmap_mode="r")
+    for name, expected in arrays.items():
+        assert not isinstance(loaded[name], np.memmap)
+        np.testing.assert_array_equal(loaded[name], expected)
+
+
+def test_object_fields_are_rejected(tmp_path):
+    path = tmp_path / "bundle.npz"
+    with pytest.raises(ValueError, match="names"):
+        save_quant_bundle(path, {"names": np.array(["a", None], dtype=object)})
+    assert not path.exists()
@@ -0,0 +1,56 @@
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+import tifffile
+
+import stack_analyzer as sa
+
+
+@pytest.mark.parametrize(
+    "start, bin_factor, n_frames, loaded",
+    [
+        (0, 1, 2000, [96, 250, 1200]),
+        (0, 4, 500, [24, 62, 300]),
+        (800, 1, 1000, [0, 96, 250]),
+        (800, 2, 500, [0, 48, 125]),
+    ],
+)
+def test_starts_round_trip_through_source_frames(start, bin_factor, n_frames, loaded):
+    source = sa.starts_to_source(loaded, start, bin_factor)
+    assert source == [start + frame * bin_factor for frame in loaded]
+    assert sa.starts_from_source(source, start, bin_factor, n_frames) == loaded
+
+
+def test_binned_starts_round_down_and_drop_frames_outside_the_load():
+    assert sa.starts_from_source([801, 803, 1000], 800, 4, 50) == [0, 0]
+    assert sa.starts_from_source([100, 5000], 800, 2, 100) == [0]
+
+
+def test_row_trace_starts_follow_the_rows_source_frames():
+    row = {"starts": "896, 1050", sa.SOURCE_FRAMES_COLUMN: sa.format_source_frames(800, 1800, 2)}
+    assert sa.row_trace_starts(row, 500) == [48, 125]
+    # Rows saved before the field existed map 1:1 from frame 0
+    assert sa.row_trace_starts({"starts": "96, 250"}, 500) == [96, 250]
+
+
+def test_partial_binned_load_keeps_the_source_path(tmp_path):
+    frames = np.random.default_rng(0).integers(0, 1000, (400, 32, 24), dtype=np.uint16)
+    path = tmp_path / "stack.tif"
+    tifffile.imwrite(path, frames, photometric="minisblack")
+    app = sa.StackAnalyzerApp(str(path), crop=(4, 6, 16, 20), frames=(100, 380), bin_factor=2)
+    try:
+        assert app.file_path == str(path.resolve())
+        assert app.quant_pickle_path == tmp_path.resolve() / sa.ROI_QUANT_PICKLE_NAME
+        assert app.source_frames == (100, 380, 2)
+        assert app.source_crop == (4, 6, 16, 20)
+    finally:
+        plt.close(app.fig)
+
+
+def test_bundle_exports_source_crop():
+    rows = [
+        {sa.SOURCE_CROP_COLUMN: sa.format_source_crop(4, 6, 16, 20)},
+        {sa.SOURCE_CROP_COLUMN: None},
+    ]
+    arrays = sa.quant_bundle_arrays({"rows": rows})
+    np.testing.assert_array_equal(arrays["source_crop"], [[4, 6, 16, 20], [-1, -1, -1, -1]])
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+import tifffile
+
+import RH_TifStk_generator_for_Thorlabs_data as generator
+from benchmark_stack_codecs import benchmark_codec, synthetic_stack
+from stack_io import STACK_CODECS, TifStack, stack_write_options, write_stack_frames
+
+
+@pytest.mark.parametrize("codec", STACK_CODECS)
+@pytest.mark.parametrize("layout", [{}, {"rowsperstrip": 5}, {"tile": 16}])
+@pytest.mark.parametrize("dtype", [np.uint16, np.float32])
+def test_written_stack_round_trips(tmp_path, codec, layout, dtype):
+    frames = (np.random.default_rng(4).random((6, 37, 29)) * 4000).astype(dtype)
+    path = tmp_path / "stack.tif"
+    options = stack_write_options(dtype, codec, level=1 if codec != "none" else None, **layout)
+    with tifffile.TiffWriter(path, bigtiff=True) as writer:
+        write_stack_frames(writer, iter(frames), frames.shape, dtype, options)
+    with TifStack(path) as stack:
+        assert stack.is_memmap == (codec == "none" and not layout.get("tile"))
+        np.testing.assert_array_equal(stack[:], frames)
+        np.testing.assert_array_equal(stack.read_region(3, slice(10, 30), slice(17, 29)), frames[3, 10:30, 17:29])
+
+
+def test_invalid_codec_options_are_rejected():
+    with pytest.raises(ValueError):
+        stack_write_options(np.uint16, "jpeg")
+    with pytest.raises(ValueError):
+        stack_write_options(np.uint16, "zlib", tile=8)
+
+
+@pytest.mark.parametrize("codec", STACK_CODECS)
+def test_generator_writes_compressed_stacks(frame_folder, codec):
+    folder, frames = frame_folder(5)
+    generator.stack_tif_images(folder, "ChanA", workers=2, codec={"codec": codec, "tile": 16})
+    with TifStack(folder / "DATA" / "ChanA" / "ChanA_stk.tif") as stack:
+        np.testing.assert_array_equal(stack[:], frames)
+
+
+def test_benchmark_reports_lossless_round_trip(tmp_path):
+    sample = synthetic_stack(3, 64, 48)
+    result = benchmark_codec(sample, tmp_path / "zlib.tif", {"codec": "zlib"})
+    assert result["lossless"] and result["ratio"] > 1
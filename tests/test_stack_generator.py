@@ -0,0 +1,150 @@
+import json
+import os
+
+import numpy as np
+import pytest
+import tifffile
+
+import RH_TifStk_generator_for_Thorlabs_data as generator
+from stack_io import TifStack
+
+
+def _stack_path(folder, channel="ChanA"):
+    return os.path.join(folder, "DATA", channel, f"{channel}_stk.tif")
+
+
+def _crash_mid_batch(stack_path, frames):
+    # What an interrupted append leaves behind: part of a batch past the manifest's end
+    with tifffile.TiffWriter(stack_path, append=True) as writer:
+        writer.write(frames, metadata=None, photometric="minisblack")
+    size = os.path.getsize(stack_path)
+    with open(stack_path, "r+b") as f:
+        f.truncate(size - frames[0].nbytes // 2)
+
+
+def _read_all(stack_path):
+    with TifStack(stack_path) as stack:
+        return np.asarray(stack[:])
+
+
+@pytest.mark.parametrize("bigtiff", [True, False])
+def test_last_ifd_pointer_matches_file_layout(tmp_path, bigtiff):
+    path = tmp_path / "stk.tif"
+    tifffile.imwrite(path, np.zeros((3, 8, 8), np.uint16), bigtiff=bigtiff, photometric="minisblack")
+    pointer = generator.last_ifd_pointer(path)
+    with open(path, "rb") as f:
+        f.seek(pointer)
+        # The last page's "next IFD" offset is zero
+        assert f.read(8 if bigtiff else 4) == bytes(8 if bigtiff else 4)
+    with tifffile.TiffFile(path) as tif:
+        entry = 20 if bigtiff else 12
+        count = 8 if bigtiff else 2
+        assert pointer == tif.pages[-1].offset + count + entry * len(tif.pages[-1].tags)
+
+
+def _hide_frames_from(folder, first):
+    for name in sorted(name for name in os.listdir(folder) if name.endswith(".tif"))[first:]:
+        os.rename(folder / name, folder / (name + ".later"))
+
+
+def _reveal_frames(folder):
+    for name in os.listdir(folder):
+        if name.endswith(".later"):
+            os.rename(folder / name, folder / name[: -len(".later")])
+
+
+def test_append_resumes_after_crashed_batch(frame_folder):
+    folder, frames = frame_folder(9)
+    _hide_frames_from(folder, 6)
+    assert generator.append_tif_images(folder, "ChanA", workers=2, batch_frames=4) == 6
+    stack_path = _stack_path(folder)
+    _crash_mid_batch(stack_path, frames[6:8])
+
+    _reveal_frames(folder)
+    assert generator.append_tif_images(folder, "ChanA", workers=2, batch_frames=4) == 3
+    np.testing.assert_array_equal(_read_all(stack_path), frames)
+
+
+@pytest.mark.parametrize("bigtiff", [True, False])
+def test_append_to_legacy_stack_after_crashed_batch(frame_folder, bigtiff):
+    # Stacks from before manifests: the original script's classic-TIFF imwrite, or a BigTIFF
+    folder, frames = frame_folder(9)
+    stack_path = _stack_path(folder)
+    os.makedirs(os.path.dirname(stack_path))
+    tifffile.imwrite(stack_path, frames[:3], bigtiff=bigtiff, metadata=None, photometric="minisblack")
+    _hide_frames_from(folder, 5)
+    assert generator.append_tif_images(folder, "ChanA", workers=2, batch_frames=2) == 2
+    _crash_mid_batch(stack_path, frames[5:7])
+
+    _reveal_frames(folder)
+    assert generator.append_tif_images(folder, "ChanA", workers=2, batch_frames=2) == 4
+    np.testing.assert_array_equal(_read_all(stack_path), frames)
+    with tifffile.TiffFile(stack_path) as tif:
+        assert tif.is_bigtiff == bigtiff
+
+
+def _frame_path(folder, number):
+    return folder / f"ChanA_001_001_001_{number:03d}.tif"
+
+
+def _truncate_frame(path):
+    # A frame file the acquisition has not finished writing
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) // 2)
+
+
+def _manifest(folder):
+    with open(generator.manifest_path(_stack_path(folder))) as f:
+        return json.load(f)
+
+
+def test_append_leaves_partly_written_last_frames_for_next_run(frame_folder):
+    folder, frames = frame_folder(7)
+    _truncate_frame(_frame_path(folder, 6))
+    _truncate_frame(_frame_path(folder, 7))
+    assert generator.append_tif_images(folder, "ChanA", workers=2) == 5
+    manifest = _manifest(folder)
+    assert len(manifest["frames"]) == 5 and manifest["replaced"] == {}
+
+    for number in (6, 7):
+        tifffile.imwrite(_frame_path(folder, number), frames[number - 1])
+    assert generator.append_tif_images(folder, "ChanA", workers=2) == 2
+    np.testing.assert_array_equal(_read_all(_stack_path(folder)), frames)
+    assert _manifest(folder)["replaced"] == {}
+
+
+def test_append_replaces_damaged_frames_followed_by_healthy_ones(frame_folder):
+    folder, frames = frame_folder(6)
+    _truncate_frame(_frame_path(folder, 3))
+    _truncate_frame(_frame_path(folder, 6))
+    assert generator.append_tif_images(folder, "ChanA", workers=2) == 5
+    expected = frames[:5].copy()
+    expected[2] = frames[1]
+    np.testing.assert_array_equal(_read_all(_stack_path(folder)), expected)
+    assert _manifest(folder)["replaced"] == {_frame_path(folder, 3).name: _frame_path(folder, 2).name}
+
+
+@pytest.mark.parametrize("incremental", [False, True])
+def test_leading_damaged_frames_become_zero_frames(frame_folder, incremental):
+    folder, frames = frame_folder(5)
+    _truncate_frame(_frame_path(folder, 1))
+    _truncate_frame(_frame_path(folder, 2))
+    if incremental:
+        generator.append_tif_images(folder, "ChanA", workers=2)
+    else:
+        generator.stack_tif_images(folder, "ChanA", workers=2)
+    expected = frames.copy()
+    expected[:2] = 0
+    np.testing.assert_array_equal(_read_all(_stack_path(folder)), expected)
+    assert _manifest(folder)["replaced"] == {
+        _frame_path(folder, 1).name: generator.ZERO_FRAME,
+        _frame_path(folder, 2).name: generator.ZERO_FRAME,
+    }
+
+
+def test_append_with_only_damaged_frames_writes_nothing(frame_folder):
+    folder, _frames = frame_folder(2)
+    _truncate_frame(_frame_path(folder, 1))
+    _truncate_frame(_frame_path(folder, 2))
+    assert generator.append_tif_images(folder, "ChanA", workers=2) == 0
+    assert not os.path.exists(_stack_path(folder))
@@ -0,0 +1,198 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+import tifffile
+
+import stack_io
+from stack_io import (
+    BinnedStack,
+    FrameCache,
+    LazyStack,
+    PixelStridedStack,
+    ThorlabsFolderStack,
+    TifStack,
+    build_pixel_tiles,
+    read_pixel_box,
+    sub_stack,
+)
+
+
+@pytest.fixture
+def frames():
+    rng = np.random.default_rng(1)
+    return rng.integers(0, 4000, (12, 37, 29), dtype=np.uint16)
+
+
+# Uncompressed contiguous pages are memory-mapped; compressed strips / tiles are decoded per page
+LAYOUTS = {
+    "memmap": {},
+    "strips": {"compression": "zlib", "rowsperstrip": 4},
+    "tiles": {"compression": "zlib", "tile": (16, 16)},
+}
+
+
+@pytest.fixture(params=sorted(LAYOUTS))
+def tif_stack(request, tmp_path, frames):
+    path = tmp_path / "stack.tif"
+    tifffile.imwrite(path, frames, photometric="minisblack", **LAYOUTS[request.param])
+    with TifStack(path) as stack:
+        assert stack.is_memmap == (request.param == "memmap")
+        yield stack
+
+
+def test_tif_stack_reads_frames(tif_stack, frames):
+    assert tif_stack.shape == frames.shape
+    assert tif_stack.dtype == frames.dtype
+    np.testing.assert_array_equal(tif_stack.read_frame(5), frames[5])
+    np.testing.assert_array_equal(tif_stack.read_frame(-1), frames[-1])
+    np.testing.assert_array_equal(tif_stack[2:9], frames[2:9])
+    np.testing.assert_array_equal(tif_stack[::3, 4:20, 1], frames[::3, 4:20, 1])
+    with pytest.raises(IndexError):
+        tif_stack.read_frame(len(frames))
+
+
+@pytest.mark.parametrize(
+    "rows, cols",
+    [
+        (slice(None), slice(None)),
+        (slice(3, 21), slice(15, 29)),
+        (slice(16, 17), slice(0, 1)),
+        (slice(1, 37, 8), slice(2, 29, 3)),
+        (slice(None, None, -2), slice(4, 9)),
+    ],
+)
+def test_tif_stack_read_region(tif_stack, frames, rows, cols):
+    np.testing.assert_array_equal(tif_stack.read_region(7, rows, cols), frames[7][rows, cols])
+
+
+def test_page_index_sidecar_is_reused(tmp_path, frames, monkeypatch):
+    monkeypatch.setattr(stack_io, "PAGE_INDEX_MIN_PAGES", 2)
+    path = tmp_path / "stack.tif"
+    tifffile.imwrite(path, frames, photometric="minisblack", compression="zlib", rowsperstrip=8)
+    with TifStack(path):
+        pass
+    assert stack_io.page_index_path_for_stack(path).is_file()
+    with TifStack(path) as stack:
+        assert stack._page_index is not None
+        np.testing.assert_array_equal(stack[:], frames)
+        np.testing.assert_array_equal(stack.read_region(3, slice(5, 30, 2), slice(9, 20)), frames[3, 5:30:2, 9:20])
+
+
+def test_sub_stack_maps_to_source(tif_stack, frames):
+    view = sub_stack(tif_stack, frames=(2, 10), crop=(3, 5, 20, 30))
+    assert view.shape == (8, 30, 20)
+    assert view.frame_offset == 2 and view.origin == (3, 5)
+    np.testing.assert_array_equal(view[:], frames[2:10, 5:35, 3:23])
+    np.testing.assert_array_equal(view[1, 2:25:4, 1:19:3], frames[3, 7:30:4, 4:22:3])
+
+
+def test_pixel_tiles_match_frames(tif_stack, frames, tmp_path):
+    tiles = build_pixel_tiles(tif_stack, tmp_path / "tiles", tif_stack.file_key(), tile=8)
+    np.testing.assert_array_equal(tiles.read_pixels(0, 37, 0, 29), frames)
+    np.testing.assert_array_equal(tiles.read_pixels(3, 30, 5, 26, slice(2, 11), step=3), frames[2:11, 3:30:3, 5:26:3])
+    assert not (tmp_path / "tiles.tmp").exists()
+
+
+@pytest.mark.parametrize("with_tiles", [False, True])
+def test_pixel_strided_stack_reads_sampled_pixels(tif_stack, frames, tmp_path, with_tiles):
+    if with_tiles:
+        tif_stack.pixel_tiles = build_pixel_tiles(tif_stack, tmp_path / "tiles", tif_stack.file_key(), tile=8)
+    view = PixelStridedStack(tif_stack, 4)
+    assert view.shape == (12, 9, 7)
+    np.testing.assert_array_equal(view[:], frames[:, 2:37:4, 2:29:4][:, :9, :7])
+    np.testing.assert_array_equal(view[3:6, 1:4, 2:5], frames[3:6, 6:15:4, 10:19:4])
+    np.testing.assert_array_equal(read_pixel_box(tif_stack, 1, 30, 2, 20, slice(4, 8), 5), frames[4:8, 1:30:5, 2:20:5])
+
+
+def test_folder_stack_reads_frame_files(frame_folder):
+    folder, frames = frame_folder(6)
+    stack = ThorlabsFolderStack(folder, "ChanA")
+    assert stack.shape == frames.shape
+    np.testing.assert_array_equal(stack[:], frames)
+    np.testing.assert_array_equal(stack.read_region(4, slice(2, 9), slice(3, 11)), frames[4, 2:9, 3:11])
+    assert stack.file_key() == ThorlabsFolderStack(folder, "ChanA").file_key()
+
+
+@pytest.mark.parametrize("compression", [None, "zlib"])
+def test_folder_stack_region_reads_bypass_frame_cache(tmp_path, compression):
+    frames = np.random.default_rng(2).integers(0, 4000, (5, 21, 17), dtype=np.uint16)
+    for index, frame in enumerate(frames, start=1):
+        tifffile.imwrite(tmp_path / f"ChanA_001_001_001_{index:03d}.tif", frame, compression=compression)
+    stack = ThorlabsFolderStack(tmp_path, "ChanA", cache_frames=2)
+    stack.read_frame(0)
+    for rows, cols in [(slice(3, 11), slice(2, 15)), (slice(1, 21, 4), slice(0, 17, 3)), (slice(None, None, -1), slice(5, 6))]:
+        for index in range(5):
+            np.testing.assert_array_equal(stack.read_region(index, rows, cols), frames[index][rows, cols])
+    assert list(stack._cache) == [0]
+    np.testing.assert_array_equal(stack[:, 4:9, 2:7], frames[:, 4:9, 2:7])
+
+
+def test_binned_stack_means_source_frames(tif_stack, frames):
+    binned = BinnedStack(tif_stack, 3)
+    expected = frames.reshape(4, 3, *frames.shape[1:]).mean(axis=1, dtype=np.float64).astype(np.float32)
+    assert binned.shape == expected.shape and binned.dtype == np.float32
+    np.testing.assert_array_equal(binned[:], expected)
+    np.testing.assert_array_equal(binned.read_region(2, slice(4, 30, 3), slice(7, 21)), expected[2, 4:30:3, 7:21])
+    np.testing.assert_array_equal(BinnedStack(tif_stack, 5)[:], frames[:10].reshape(2, 5, *frames.shape[1:]).mean(axis=1).astype(np.float32))
+
+
+def test_binned_stack_region_reads_only_the_region(tif_stack, monkeypatch):
+    regions = []
+    monkeypatch.setattr(tif_stack, "read_frame", lambda index: pytest.fail("full frame read"))
+    original = tif_stack.read_region
+    monkeypatch.setattr(tif_stack, "read_region", lambda index, rows, cols: regions.append(index) or original(index, rows, cols))
+    BinnedStack(tif_stack, 4)[1:3, 5:9, 2:6]
+    assert regions == list(range(4, 12))
+
+
+class CountingStack(LazyStack):
+    """In-memory stack recording which thread read each frame."""
+
+    def __init__(self, data):
+        self.data = data
+        self.shape = data.shape
+        self.dtype = data.dtype
+        self.reads = []
+
+    def read_frame(self, index):
+        self.reads.append((index, threading.current_thread() is threading.main_thread()))
+        return self.data[index]
+
+
+def _wait_cached(cache, indices, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not set(indices) <= set(cache._frames):
+        assert time.monotonic() < deadline, f"frames {sorted(set(indices) - set(cache._frames))} not prefetched"
+        time.sleep(0.01)
+
+
+def test_frame_cache_reads_ahead_in_scrub_direction(frames):
+    stack = CountingStack(frames)
+    cache = FrameCache(stack, read_ahead=3)
+    try:
+        np.testing.assert_array_equal(cache.get(4), frames[4])
+        _wait_cached(cache, [5, 6, 7])
+        for index in (5, 6):
+            np.testing.assert_array_equal(cache.get(index), frames[index])
+        assert [index for index, foreground in stack.reads if foreground] == [4]
+
+        # Scrubbing back turns the read-ahead around
+        cache.get(3)
+        _wait_cached(cache, [2, 1, 0])
+        assert [index for index, foreground in stack.reads if foreground] == [4, 3]
+    finally:
+        cache.close()
+
+
+def test_frame_cache_read_ahead_stays_within_half_the_budget(frames):
+    frame_bytes = frames[0].nbytes
+    cache = FrameCache(CountingStack(frames), budget_bytes=5 * frame_bytes, read_ahead=16)
+    try:
+        assert cache.read_ahead == 2
+        cache.get(0)
+        _wait_cached(cache, [1, 2])
+        assert 0 in cache._frames
+    finally:
+        cache.close()
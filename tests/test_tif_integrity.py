@@ -0,0 +1,117 @@
+import struct
+
+import numpy as np
+import pytest
+import tifffile
+
+import tif_integrity
+from tif_integrity import check_tif_file, scan_tif_files
+
+
+@pytest.fixture(params=[False, True], ids=["classic", "bigtiff"])
+def tif_path(request, tmp_path):
+    path = tmp_path / "frames.tif"
+    data = np.arange(4 * 32 * 24, dtype=np.uint16).reshape(4, 32, 24)
+    tifffile.imwrite(path, data, bigtiff=request.param, photometric="minisblack", rowsperstrip=8)
+    return path
+
+
+def _data_end(path):
+    with tifffile.TiffFile(path) as tif:
+        return max(offset + count for page in tif.pages for offset, count in zip(page.dataoffsets, page.databytecounts))
+
+
+def _truncate(path, n_bytes):
+    # Cut into the pixel data; the writer may pad the file past its last strip
+    with open(path, "r+b") as f:
+        f.truncate(_data_end(path) - n_bytes)
+
+
+def test_intact_file_passes(tif_path):
+    assert check_tif_file(tif_path) is None
+
+
+@pytest.mark.parametrize("n_bytes", [1, 32 * 24, 3 * 32 * 24 * 2])
+def test_truncated_file_is_reported(tif_path, n_bytes):
+    _truncate(tif_path, n_bytes)
+    problem = check_tif_file(tif_path)
+    assert problem is not None
+    assert "past end of file" in problem or "outside file" in problem or "does not fit" in problem
+
+
+def test_truncated_header_is_reported(tif_path):
+    with open(tif_path, "r+b") as f:
+        f.truncate(6)
+    assert "past end of file" in check_tif_file(tif_path)
+
+
+def test_zeroed_header_is_reported(tif_path):
+    with open(tif_path, "r+b") as f:
+        f.write(bytes(8))
+    assert check_tif_file(tif_path) == "not a TIFF (bad byte order mark)"
+
+
+def test_max_pages_limits_the_scan(tif_path):
+    _truncate(tif_path, 32 * 24)
+    assert check_tif_file(tif_path, max_pages=1) is None
+
+
+def _patch_tag(path, page_index, name, count=None, values=None):
+    """Overwrite a tag's count field or its (out-of-line) values in place."""
+    with tifffile.TiffFile(path) as tif:
+        tag = tif.pages[page_index].tags[name]
+        count_format = tif.tiff.offsetformat if tif.is_bigtiff else tif.byteorder + "I"
+        entry_offset, value_offset, dtype = tag.offset, tag.valueoffset, tif.byteorder + tifffile.TIFF.DATA_FORMATS[tag.dtype][-1]
+    with open(path, "r+b") as f:
+        if count is not None:
+            f.seek(entry_offset + 4)
+            f.write(struct.pack(count_format, count))
+        if values is not None:
+            f.seek(value_offset)
+            f.write(np.asarray(values, dtype=dtype).tobytes())
+
+
+def test_garbage_tag_count_is_reported(tif_path):
+    with tifffile.TiffFile(tif_path) as tif:
+        bigtiff = tif.is_bigtiff
+    _patch_tag(tif_path, 1, "StripByteCounts", count=2**40 if bigtiff else 2**31 - 1)
+    problem = check_tif_file(tif_path)
+    assert problem.startswith("page 1:") and "values outside file" in problem
+
+
+def test_zero_length_segment_is_not_damage(tif_path):
+    with tifffile.TiffFile(tif_path) as tif:
+        counts = list(tif.pages[2].databytecounts)
+    counts[1] = 0
+    _patch_tag(tif_path, 2, "StripByteCounts", values=counts)
+    assert check_tif_file(tif_path) is None
+
+
+def test_scan_reports_damaged_files_in_order(tmp_path):
+    data = np.zeros((2, 16, 16), dtype=np.uint16)
+    paths = []
+    for index in range(5):
+        path = tmp_path / f"frame_{index}.tif"
+        tifffile.imwrite(path, data, photometric="minisblack", rowsperstrip=4)
+        paths.append(path)
+    _patch_tag(paths[1], 0, "StripByteCounts", count=2**31 - 1)
+    with open(paths[3], "r+b") as f:
+        f.truncate(100)
+    fractions = []
+    report = scan_tif_files(paths, workers=2, progress=fractions.append)
+    assert list(report) == [paths[1], paths[3]]
+    assert "values outside file" in report[paths[1]]
+    assert fractions[-1] == 1.0
+
+
+def test_scan_reports_unexpected_errors_per_file(tmp_path, monkeypatch):
+    paths = [tmp_path / "a.tif", tmp_path / "b.tif"]
+    for path in paths:
+        tifffile.imwrite(path, np.zeros((8, 8), dtype=np.uint8))
+
+    def broken_check(tags, file_size):
+        raise ValueError("unexpected")
+
+    monkeypatch.setattr(tif_integrity, "_check_page", broken_check)
+    report = scan_tif_files(paths)
+    assert report == {path: "scan failed: ValueError: unexpected" for path in paths}
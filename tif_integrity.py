@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""Header-only integrity scan for folders of (Thorlabs per-frame) TIFF files.
+
+Each file's header, IFD chain and strip / tile tables are parsed with
+``struct`` and checked against the file size; pixel data is never decoded, so
+thousands of frames scan in seconds on a thread pool. Truncated copies,
+zero-filled headers and broken IFD chains (the usual damage on acquisition
+drives) are reported up front, before a transfer or stacking run trips over
+them hours in. Compressed data that is intact in size but wrong in content is
+not detected.
+
+    python tif_integrity.py path\\to\\acquisition --substring ChanA
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import struct
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+SCAN_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+TIFF_SUFFIXES = (".tif", ".tiff", ".ti")
+REPORT_NAME = "tif_integrity_report.json"
+REPORT_VERSION = 1
+
+# TIFF field type -> size in bytes; struct codes for the integer types used by offsets / counts
+TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8, 13: 4, 16: 8, 17: 8, 18: 8}
+INT_FORMATS = {1: "B", 3: "H", 4: "I", 6: "b", 8: "h", 9: "i", 13: "I", 16: "Q", 17: "q", 18: "Q"}
+TAG_IMAGE_WIDTH = 256
+TAG_IMAGE_LENGTH = 257
+TAG_BITS_PER_SAMPLE = 258
+TAG_COMPRESSION = 259
+TAG_STRIP_OFFSETS = 273
+TAG_SAMPLES_PER_PIXEL = 277
+TAG_ROWS_PER_STRIP = 278
+TAG_STRIP_BYTE_COUNTS = 279
+TAG_TILE_WIDTH = 322
+TAG_TILE_LENGTH = 323
+TAG_TILE_OFFSETS = 324
+TAG_TILE_BYTE_COUNTS = 325
+WANTED_TAGS = {
+    TAG_IMAGE_WIDTH,
+    TAG_IMAGE_LENGTH,
+    TAG_BITS_PER_SAMPLE,
+    TAG_COMPRESSION,
+    TAG_STRIP_OFFSETS,
+    TAG_SAMPLES_PER_PIXEL,
+    TAG_ROWS_PER_STRIP,
+    TAG_STRIP_BYTE_COUNTS,
+    TAG_TILE_WIDTH,
+    TAG_TILE_LENGTH,
+    TAG_TILE_OFFSETS,
+    TAG_TILE_BYTE_COUNTS,
+}
+
+
+class TiffDamage(Exception):
+    """Raised while walking a TIFF whose structure does not fit the file."""
+
+
+def _read_exact(handle, offset: int, size: int, what: str) -> bytes:
+    handle.seek(offset)
+    data = handle.read(size)
+    if len(data) != size:
+        raise TiffDamage(f"{what} at byte {offset} runs past end of file")
+    return data
+
+
+def _read_ifd(handle, offset: int, order: str, bigtiff: bool, file_size: int) -> tuple[dict, int]:
+    """Integer values of the tags in WANTED_TAGS and the next IFD offset."""
+    count_format, entry_size, offset_format = ("Q", 20, "Q") if bigtiff else ("H", 12, "I")
+    count_size = struct.calcsize(count_format)
+    offset_size = struct.calcsize(offset_format)
+    (n_entries,) = struct.unpack(order + count_format, _read_exact(handle, offset, count_size, "IFD"))
+    if n_entries == 0 or offset + count_size + n_entries * entry_size + offset_size > file_size:
+        raise TiffDamage(f"IFD at byte {offset} with {n_entries} entries does not fit the file")
+    table = _read_exact(handle, offset + count_size, n_entries * entry_size + offset_size, "IFD")
+    tags: dict[int, list[int]] = {}
+    for index in range(n_entries):
+        entry = table[index * entry_size : (index + 1) * entry_size]
+        tag, type_code = struct.unpack(order + "HH", entry[:4])
+        if tag not in WANTED_TAGS:
+            continue
+        if type_code not in INT_FORMATS:
+            raise TiffDamage(f"tag {tag} has non-integer type {type_code}")
+        inline_start = 12 if bigtiff else 8
+        (count,) = struct.unpack(order + offset_format, entry[4:inline_start])
+        value_size = TYPE_SIZES[type_code] * count
+        inline = entry[inline_start:]
+        if value_size <= len(inline):
+            data = inline[:value_size]
+        else:
+            (value_offset,) = struct.unpack(order + offset_format, inline)
+            if value_offset + value_size > file_size:
+                # A garbage count must not turn into a huge read
+                raise TiffDamage(f"tag {tag} values outside file ({count} values at byte {value_offset})")
+            data = _read_exact(handle, value_offset, value_size, f"tag {tag} values")
+        tags[tag] = list(struct.unpack(f"{order}{count}{INT_FORMATS[type_code]}", data))
+    (next_offset,) = struct.unpack(order + offset_format, table[-offset_size:])
+    return tags, next_offset
+
+
+def _check_page(tags: dict, file_size: int) -> None:
+    width = tags.get(TAG_IMAGE_WIDTH, [0])[0]
+    length = tags.get(TAG_IMAGE_LENGTH, [0])[0]
+    if width <= 0 or length <= 0:
+        raise TiffDamage(f"bad image size {width}x{length}")
+    if TAG_TILE_OFFSETS in tags:
+        offsets, counts = tags[TAG_TILE_OFFSETS], tags.get(TAG_TILE_BYTE_COUNTS)
+        tile_width = tags.get(TAG_TILE_WIDTH, [0])[0]
+        tile_length = tags.get(TAG_TILE_LENGTH, [0])[0]
+        if tile_width <= 0 or tile_length <= 0:
+            raise TiffDamage("tiled page without tile size")
+        n_segments = -(-width // tile_width) * -(-length // tile_length)
+        segment_pixels = tile_width * tile_length
+    else:
+        offsets, counts = tags.get(TAG_STRIP_OFFSETS), tags.get(TAG_STRIP_BYTE_COUNTS)
+        if offsets is None:
+            raise TiffDamage("no strip or tile offsets")
+        rows_per_strip = min(tags.get(TAG_ROWS_PER_STRIP, [length])[0], length)
+        n_segments = -(-length // max(rows_per_strip, 1))
+        segment_pixels = None
+    if counts is None or len(counts) != len(offsets):
+        raise TiffDamage("missing or mismatched strip / tile byte counts")
+    samples = tags.get(TAG_SAMPLES_PER_PIXEL, [1])[0]
+    if len(offsets) not in (n_segments, n_segments * samples):
+        raise TiffDamage(f"{len(offsets)} strips / tiles for {n_segments} expected")
+    for offset, count in zip(offsets, counts):
+        if offset + count > file_size:
+            raise TiffDamage(f"pixel data at byte {offset} (+{count}) outside file of {file_size} bytes")
+    # Zero-length (sparse) segments are legal and read as zeros, so the size check needs them all
+    if tags.get(TAG_COMPRESSION, [1])[0] == 1 and all(counts):
+        bits_per_sample = tags.get(TAG_BITS_PER_SAMPLE, [1])
+        bits = sum(bits_per_sample) if len(bits_per_sample) == samples else bits_per_sample[0] * samples
+        pixels = width * length if segment_pixels is None else segment_pixels * n_segments
+        expected = (pixels * bits + 7) // 8
+        if sum(counts) < expected:
+            raise TiffDamage(f"uncompressed data holds {sum(counts)} of {expected} bytes")
+
+
+def check_tif_file(path: str | Path, max_pages: int | None = None) -> str | None:
+    """Problem description for a damaged TIFF, or None if its structure is intact.
+
+    Walks the IFD chain (the first ``max_pages`` pages when given) and checks
+    every page's strip / tile table against the file size.
+    """
+    try:
+        with open(path, "rb") as handle:
+            file_size = os.fstat(handle.fileno()).st_size
+            header = _read_exact(handle, 0, 8, "header")
+            order = {b"II": "<", b"MM": ">"}.get(header[:2])
+            if order is None:
+                return "not a TIFF (bad byte order mark)"
+            (version,) = struct.unpack(order + "H", header[2:4])
+            if version == 42:
+                bigtiff = False
+                (offset,) = struct.unpack(order + "I", header[4:8])
+            elif version == 43:
+                bigtiff = True
+                (offset,) = struct.unpack(order + "Q", _read_exact(handle, 8, 8, "header"))
+            else:
+                return f"not a TIFF (version {version})"
+            seen: set[int] = set()
+            n_pages = 0
+            while offset and (max_pages is None or n_pages < max_pages):
+                if offset in seen:
+                    return f"IFD chain loops back at page {n_pages}"
+                seen.add(offset)
+                try:
+                    tags, offset = _read_ifd(handle, offset, order, bigtiff, file_size)
+                    _check_page(tags, file_size)
+                except TiffDamage as exc:
+                    return f"page {n_pages}: {exc}"
+                n_pages += 1
+            if n_pages == 0:
+                return "no image pages"
+    except TiffDamage as exc:
+        return str(exc)
+    except OSError as exc:
+        return f"unreadable: {exc}"
+    except Exception as exc:
+        # Anything else the walk trips over still marks just this file, not the scan
+        return f"scan failed: {type(exc).__name__}: {exc}"
+    return None
+
+
+def _check_tif_file_safe(path: str | Path, max_pages: int | None) -> str | None:
+    try:
+        return check_tif_file(path, max_pages)
+    except Exception as exc:
+        return f"scan failed: {type(exc).__name__}: {exc}"
+
+
+def scan_tif_files(
+    paths: Iterable[str | Path],
+    workers: int = SCAN_WORKERS,
+    max_pages: int | None = None,
+    progress=None,
+) -> dict:
+    """Check ``paths`` in parallel; returns ``{path: problem}`` for the damaged ones, in input order.
+
+    ``progress`` is called with the fraction of files checked.
+    """
+    paths = list(paths)
+    report = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = pool.map(lambda path: _check_tif_file_safe(path, max_pages), paths, chunksize=64)
+        for index, (path, problem) in enumerate(zip(paths, results), start=1):
+            if problem is not None:
+                report[path] = problem
+            if progress is not None and (index % 1000 == 0 or index == len(paths)):
+                progress(index / len(paths))
+    return report
+
+
+def folder_tif_files(folder: str | Path, substring: str = "") -> list[Path]:
+    """TIFF files in ``folder`` whose name contains ``substring``, sorted by name."""
+    folder = Path(folder)
+    return [
+        folder / name
+        for name in sorted(os.listdir(folder))
+        if substring in name and name.lower().endswith(TIFF_SUFFIXES)
+    ]
+
+
+def save_report(report_path: str | Path, folder: str | Path, n_scanned: int, report: dict) -> None:
+    """JSON report: scanned folder, file count and ``{file name: problem}`` for damaged files."""
+    payload = {
+        "version": REPORT_VERSION,
+        "folder": str(folder),
+        "scanned": n_scanned,
+        "corrupt": {Path(path).name: problem for path, problem in report.items()},
+    }
+    tmp_path = Path(str(report_path) + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(payload, f, indent=1)
+    os.replace(tmp_path, report_path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Header-only integrity scan of a folder of TIFF files")
+    parser.add_argument("folder", help="Folder with per-frame TIFFs")
+    parser.add_argument("--substring", default="", help="Only scan files whose name contains this (e.g. ChanA)")
+    parser.add_argument("--workers", type=int, default=SCAN_WORKERS, help="Parallel readers (default: %(default)s)")
+    parser.add_argument(
+        "--report",
+        default=None,
+        help=f"Where to write the JSON report (default: <folder>/{REPORT_NAME})",
+    )
+    args = parser.parse_args()
+
+    files = folder_tif_files(args.folder, args.substring)
+    report = scan_tif_files(files, args.workers, progress=lambda f: print(f"Scanned {f:.0%}"))
+    report_path = args.report or os.path.join(args.folder, REPORT_NAME)
+    save_report(report_path, args.folder, len(files), report)
+    for path, problem in report.items():
+        print(f"{path.name}: {problem}")
+    print(f"{len(report)} of {len(files)} files damaged; report written to {report_path}")
+
+
+if __name__ == "__main__":
+    main()